@@ -8,19 +8,13 @@ import sys
 import json
 import argparse
 from dotenv import load_dotenv
-import gspread
-from google.oauth2.credentials import Credentials
-from google.auth.transport.requests import Request
+
+from google_clients import get_gspread_client
+from sheet_uploader import append_rows as append_batches
 
 # Load environment variables
 load_dotenv()
 
-SCOPES = [
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive"
-]
-
-
 def extract_sheet_id(url):
     """Extract the Google Sheet ID from a URL."""
     if '/d/' in url:
@@ -28,34 +22,29 @@ def extract_sheet_id(url):
     return url
 
 
-def get_credentials():
-    """Get OAuth2 credentials for Google Sheets API."""
-    creds = None
-
-    if os.path.exists('token.json'):
-        try:
-            with open('token.json', 'r') as token:
-                token_data = json.load(token)
-                creds = Credentials.from_authorized_user_info(token_data, SCOPES)
-        except Exception as e:
-            print(f"Error loading token: {e}")
-
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            from google_auth_oauthlib.flow import InstalledAppFlow
-            creds_file = os.getenv("GOOGLE_APPLICATION_CREDENTIALS", "credentials.json")
-            flow = InstalledAppFlow.from_client_secrets_file(creds_file, SCOPES)
-            creds = flow.run_local_server(port=0)
-
-        with open('token.json', 'w') as token:
-            token.write(creds.to_json())
-
-    return creds
-
+def build_matrix(records, headers, id_column=None, existing_ids=None):
+    """
+    Align records to the sheet header and drop records already in the sheet.
 
-def append_rows(sheet_url, json_file, worksheet_name=None):
+    Returns:
+        (rows, skipped) where rows are lists in header order
+    """
+    id_idx = headers.index(id_column) if id_column else None
+    seen = set(existing_ids or ())
+    rows, skipped = [], 0
+    for record in records:
+        row = ["" if record.get(h) is None else record.get(h) for h in headers]
+        if id_idx is not None:
+            record_id = str(row[id_idx]).strip()
+            if record_id and record_id in seen:
+                skipped += 1
+                continue
+            seen.add(record_id)
+        rows.append(row)
+    return rows, skipped
+
+
+def append_rows(sheet_url, json_file, worksheet_name=None, id_column=None):
     """
     Append rows from JSON file to an existing Google Sheet.
 
@@ -63,9 +52,11 @@ def append_rows(sheet_url, json_file, worksheet_name=None):
         sheet_url: Google Sheets URL or ID
         json_file: Path to JSON file with rows to append
         worksheet_name: Name of the specific worksheet (default: first sheet)
+        id_column: Header of a unique ID column; records whose ID is already
+            in the sheet (or earlier in the file) are skipped, so re-runs are safe
 
     Returns:
-        Number of rows appended
+        Number of rows appended (0 when everything was already there), or None on error
     """
     try:
         # Read JSON data
@@ -77,8 +68,7 @@ def append_rows(sheet_url, json_file, worksheet_name=None):
             return 0
 
         # Authenticate
-        creds = get_credentials()
-        client = gspread.authorize(creds)
+        client = get_gspread_client()
 
         # Open the spreadsheet
         sheet_id = extract_sheet_id(sheet_url)
@@ -95,27 +85,39 @@ def append_rows(sheet_url, json_file, worksheet_name=None):
 
         if not existing_headers:
             print("Sheet has no headers. Please add headers first.")
+            return None
+
+        if id_column and id_column not in existing_headers:
+            print(f"ID column '{id_column}' not found in sheet headers: {existing_headers}", file=sys.stderr)
+            return None
+
+        unknown = sorted({k for record in data for k in record} - set(existing_headers))
+        if unknown:
+            print(f"Ignoring fields not in the sheet header: {unknown}")
+
+        # One read of the ID column instead of checking per record
+        existing_ids = set()
+        if id_column:
+            id_values = worksheet.col_values(existing_headers.index(id_column) + 1)[1:]
+            existing_ids = {str(v).strip() for v in id_values if str(v).strip()}
+
+        rows, skipped = build_matrix(data, existing_headers, id_column, existing_ids)
+        if skipped:
+            print(f"Skipping {skipped} record(s) already in the sheet")
+        if not rows:
+            print("Nothing new to append.")
             return 0
 
-        # Append each row
-        rows_appended = 0
-        for record in data:
-            # Build row in correct column order
-            row = []
-            for header in existing_headers:
-                value = record.get(header, "")
-                row.append(value)
-
-            worksheet.append_row(row, value_input_option='RAW')
-            rows_appended += 1
-            print(f"Appended row: {record.get('ID', 'Unknown')}")
+        # Quota-sized append_rows batches instead of one request per record
+        append_batches(worksheet, rows)
+        rows_appended = len(rows)
 
         print(f"\nSuccessfully appended {rows_appended} row(s) to the sheet.")
         return rows_appended
 
     except Exception as e:
         print(f"Error appending to sheet: {str(e)}", file=sys.stderr)
-        return 0
+        return None
 
 
 def main():
@@ -123,14 +125,16 @@ def main():
     parser.add_argument("--url", required=True, help="Google Sheets URL or ID")
     parser.add_argument("--json_file", required=True, help="Path to JSON file with rows to append")
     parser.add_argument("--worksheet", help="Name of the worksheet (default: first sheet)")
+    parser.add_argument("--id_column", help="Unique ID column; skip records already in the sheet")
 
     args = parser.parse_args()
 
-    result = append_rows(args.url, args.json_file, args.worksheet)
+    result = append_rows(args.url, args.json_file, args.worksheet, args.id_column)
 
-    if result > 0:
-        return 0
-    return 1
+    # A re-run with nothing new to append is still a success
+    if result is None:
+        return 1
+    return 0
 
 
 if __name__ == "__main__":
@@ -1,23 +1,26 @@
 import os
 import sys
-import gspread
 import argparse
 import google.generativeai as genai
-import json
-import concurrent.futures
 import time
 from dotenv import load_dotenv
 from urllib.parse import urlparse
 
+from casualize_cache import CasualizeCache
+from google_clients import get_gspread_client
+from sheet_reader import iter_rows
+from stage_watermarks import StageWatermark
+from lead_store import get_lead_store
+from casualize_engine import CasualizeEngine, AdaptiveController, COMBINED_SPEC, build_column_updates, casualize_lead_list
+
 # Load environment variables
 load_dotenv()
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 if GEMINI_API_KEY:
     genai.configure(api_key=GEMINI_API_KEY)
-BATCH_SIZE = 50  # Sweet spot - balances speed vs reliability
-MAX_WORKERS = 5  # Reduced to avoid rate limits
-MAX_RETRIES = 3  # Retry failed batches
+BATCH_SIZE = 50  # Starting batch size - the engine grows or shrinks it from observed latency
+MAX_WORKERS = 5  # Concurrency ceiling - the engine backs off below it on 429s
 
 def get_sheet_id_from_url(url):
     """Extract spreadsheet ID from URL."""
@@ -36,91 +39,66 @@ def column_letter(n):
         n = n // 26 - 1
     return result
 
-def casualize_batch(records, model, batch_num, total_batches, retry_count=0):
-    """Use Gemini to casualize first names, company names, and cities in one call."""
-    if not records:
-        return []
-
-    # Format records as compact JSON
-    records_list = []
-    for i, record in enumerate(records):
-        records_list.append({
-            "id": i + 1,
-            "first_name": record['first_name'],
-            "company_name": record['company_name'],
-            "city": record['city']
-        })
-
-    records_json = json.dumps(records_list)
-
-    prompt = f"""Convert to casual forms for cold emails.
-
-Rules:
-- first_name: Common nicknames (William→Will, Jennifer→Jen), keep if no nickname
-- company_name: Remove "The", legal suffixes (LLC/Inc/Corp/Ltd), generic words (Realty/Real Estate/Group/Services). Use "you guys" if too generic
-- city: Local nicknames (San Francisco→SF, Philadelphia→Philly), keep if none
-
-Input: {records_json}
-
-Return ONLY the JSON array. Output format: [{{"id": 1, "casual_first_name": "...", "casual_company_name": "...", "casual_city_name": "..."}}]"""
+def build_engine(workers):
+    """Local rules, memo cache, then adaptive Gemini batches for what's left."""
+    print(f"\nInitializing Gemini (gemini-1.5-flash)...")
+    model = genai.GenerativeModel('gemini-1.5-flash')
+    controller = AdaptiveController(
+        batch_size=BATCH_SIZE, concurrency=min(2, workers), max_concurrency=workers
+    )
+    return CasualizeEngine(model, COMBINED_SPEC, cache=CasualizeCache(), controller=controller)
+
+def print_stats(engine):
+    stats = engine.stats
+    print(f"Gemini calls: {stats.calls}, rate limited: {stats.rate_limited}, "
+          f"parse failures: {stats.parse_failures}, fallbacks: {stats.fallbacks}")
+
+def run_engine(records, workers):
+    engine = build_engine(workers)
+    results = engine.run(records)
+    print_stats(engine)
+    return results
+
+def casualize_list(list_name, overwrite=False, workers=MAX_WORKERS):
+    """Casualize a lead store list in place; publish it with lead_store.py afterwards."""
+    store = get_lead_store()
+    if store.get_list(list_name) is None:
+        print(f"Error: no lead list named '{list_name}'")
+        sys.exit(1)
 
-    try:
-        response = model.generate_content(prompt)
-        response_text = response.text.strip()
-
-        # Remove markdown code blocks
-        if "```" in response_text:
-            response_text = re.sub(r'```(?:json)?\s*([\s\S]*?)\s*```', r'\1', response_text)
-
-        # Parse JSON response
-        results = json.loads(response_text)
-
-        # Ensure we have the same number of results as inputs
-        if len(results) != len(records):
-            print(f"  ⚠️  Batch {batch_num}/{total_batches}: Got {len(results)} results for {len(records)} inputs, padding...")
-            while len(results) < len(records):
-                idx = len(results)
-                results.append({
-                    "id": idx + 1,
-                    "casual_first_name": records[idx]['first_name'],
-                    "casual_company_name": records[idx]['company_name'],
-                    "casual_city_name": records[idx]['city']
-                })
-
-        print(f"  ✓ Batch {batch_num}/{total_batches} complete ({len(records)} records)")
-        return results
-    except Exception as e:
-        if retry_count < MAX_RETRIES:
-            wait_time = (2 ** retry_count) * 2
-            print(f"  ⏸️  Batch {batch_num}/{total_batches} failed, retrying in {wait_time}s... ({str(e)[:50]})")
-            time.sleep(wait_time)
-            return casualize_batch(records, model, batch_num, total_batches, retry_count + 1)
-        else:
-            print(f"  ✗ Batch {batch_num}/{total_batches} failed after {MAX_RETRIES} retries")
-            # Return originals
-            return [{
-                "id": i + 1,
-                "casual_first_name": record['first_name'],
-                "casual_company_name": record['company_name'],
-                "casual_city_name": record['city']
-            } for i, record in enumerate(records)]
+    # A local query instead of a sheet download
+    engine = build_engine(workers)
+    processed = casualize_lead_list(store, list_name, engine, overwrite=overwrite)
+    if processed:
+        print_stats(engine)
+    return processed
 
 def main():
     parser = argparse.ArgumentParser(description="Casualize first names, company names, and cities in one pass")
-    parser.add_argument("sheet_url", help="URL of the Google Sheet")
+    parser.add_argument("sheet_url", nargs="?", help="URL of the Google Sheet")
+    parser.add_argument("--list", help="Casualize a lead store list instead of a sheet")
     parser.add_argument("--overwrite", action="store_true", help="Overwrite existing casual names")
-    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help=f"Number of parallel workers (default: {MAX_WORKERS})")
+    parser.add_argument("--rescan", action="store_true", help="Re-read every sheet row (default: new rows plus edited ones)")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help=f"Max parallel workers (default: {MAX_WORKERS})")
     args = parser.parse_args()
 
-    if not ANTHROPIC_API_KEY:
-        print("Error: ANTHROPIC_API_KEY not set in .env")
+    if not GEMINI_API_KEY:
+        print("Error: GEMINI_API_KEY not set in .env")
         sys.exit(1)
 
     start_time = time.time()
 
+    if args.list:
+        processed = casualize_list(args.list, overwrite=args.overwrite, workers=args.workers)
+        elapsed = time.time() - start_time
+        print(f"\n✅ Done! Casualized {processed} records in {elapsed:.1f}s")
+        return
+    if not args.sheet_url:
+        parser.error("sheet_url is required unless --list is given")
+
     print(f"Connecting to Google Sheet...")
     try:
-        gc = gspread.oauth()
+        gc = get_gspread_client(fallback_oauth=True)
         sheet_id = get_sheet_id_from_url(args.sheet_url)
         spreadsheet = gc.open_by_key(sheet_id)
         worksheet = spreadsheet.sheet1
@@ -128,15 +106,13 @@ def main():
         print(f"Error connecting to sheet: {e}")
         sys.exit(1)
 
-    # Get all values at once
-    print("Reading sheet data...")
-    rows = worksheet.get_all_values()
-    if not rows:
+    # Header only; the needed columns are streamed below
+    print("Reading sheet header...")
+    headers = worksheet.row_values(1)
+    if not headers:
         print("Sheet is empty")
         sys.exit(0)
 
-    headers = rows[0]
-
     # Find column indices
     try:
         email_idx = headers.index("email")
@@ -174,29 +150,39 @@ def main():
         if header_updates:
             worksheet.batch_update(header_updates)
 
-    # Collect rows to process
-    print(f"\nScanning {len(rows)-1} rows...")
+    # Collect rows to process, streaming only the input and casual columns
+    print(f"\nScanning rows...")
+    columns = ["email", "first_name", "company_name", "city"] + list(casual_columns)
+
+    # Rows processed on earlier runs are skipped without being read (see stage_watermarks.py)
+    mark = StageWatermark(worksheet, "casualize_batch", COMBINED_SPEC.version, ["email", "first_name", "company_name", "city"])
+    start_row = mark.resume(full=args.rescan or args.overwrite, headers=headers)
+
     rows_to_process = []
+    existing = {}  # row index -> current casual values, kept for rows we don't touch
 
-    for i in range(1, len(rows)):
-        row = rows[i]
+    for row_num, row in iter_rows(worksheet, columns, headers=headers, start_row=start_row):
+        i = row_num - 1
+        existing[i] = {field: row[field] for field in casual_columns}
+        mark.seen(row_num, row)
+        if not args.overwrite and mark.is_done(row_num, row):
+            continue
 
-        if len(row) <= email_idx or not row[email_idx].strip():
+        if not row["email"].strip():
             continue
 
-        first_name = row[first_name_idx].strip() if len(row) > first_name_idx else ""
-        company_name = row[company_name_idx].strip() if len(row) > company_name_idx else ""
-        city = row[city_idx].strip() if len(row) > city_idx else ""
+        first_name = row["first_name"].strip()
+        company_name = row["company_name"].strip()
+        city = row["city"].strip()
 
         if not first_name or not company_name or not city:
             continue
 
         # Check if already casualized
-        if not args.overwrite:
+        if not args.overwrite and not mark.is_changed(row_num, row):
             already_done = True
             for field in ['casual_first_name', 'casual_company_name', 'casual_city_name']:
-                idx = casual_columns[field]
-                if len(row) <= idx or not row[idx].strip():
+                if not row[field].strip():
                     already_done = False
                     break
             if already_done:
@@ -214,90 +200,19 @@ def main():
 
     if total_to_process == 0:
         print("Nothing to process!")
+        mark.commit()
         sys.exit(0)
 
-    # Split into batches
-    batches = []
-    for batch_start in range(0, total_to_process, BATCH_SIZE):
-        batch_end = min(batch_start + BATCH_SIZE, total_to_process)
-        batches.append(rows_to_process[batch_start:batch_end])
-
-    total_batches = len(batches)
-    print(f"\nProcessing {total_batches} batches of up to {BATCH_SIZE} records using {args.workers} parallel workers...")
-
-    # Process batches in parallel
-    print(f"\nInitializing Gemini (gemini-1.5-flash)...")
-    model = genai.GenerativeModel('gemini-1.5-flash')
+    results = run_engine(rows_to_process, args.workers)
+    processed = len(results)
 
-    with concurrent.futures.ThreadPoolExecutor(max_workers=args.workers) as executor:
-        future_to_batch = {
-            executor.submit(casualize_batch, batch, model, i+1, total_batches): (i, batch)
-            for i, batch in enumerate(batches)
-        }
-
-        for future in concurrent.futures.as_completed(future_to_batch):
-            batch_idx, batch = future_to_batch[future]
-            try:
-                results = future.result()
-                all_results.append((batch_idx, batch, results))
-            except Exception as e:
-                print(f"  ✗ Batch {batch_idx+1} failed: {e}")
-                # Add fallback results
-                results = [{
-                    "id": i + 1,
-                    "casual_first_name": record['first_name'],
-                    "casual_company_name": record['company_name'],
-                    "casual_city_name": record['city']
-                } for i, record in enumerate(batch)]
-                all_results.append((batch_idx, batch, results))
-
-    # Sort results by original batch order
-    all_results.sort(key=lambda x: x[0])
-
-    # Prepare all updates
-    print(f"\nPreparing updates...")
-    updates = []
-    processed = 0
-
-    for batch_idx, batch, results in all_results:
-        for i, item in enumerate(batch):
-            result = results[i] if i < len(results) else {
-                "casual_first_name": item['first_name'],
-                "casual_company_name": item['company_name'],
-                "casual_city_name": item['city']
-            }
-
-            casual_first = result.get('casual_first_name', item['first_name'])
-            casual_company = result.get('casual_company_name', item['company_name'])
-            casual_city = result.get('casual_city_name', item['city'])
-
-            row_num = item['row_num'] + 1
-            updates.append({
-                'range': f'{column_letter(casual_columns["casual_first_name"])}{row_num}',
-                'values': [[casual_first]]
-            })
-            updates.append({
-                'range': f'{column_letter(casual_columns["casual_company_name"])}{row_num}',
-                'values': [[casual_company]]
-            })
-            updates.append({
-                'range': f'{column_letter(casual_columns["casual_city_name"])}{row_num}',
-                'values': [[casual_city]]
-            })
-
-        processed += len(batch)
-
-    # Batch update all cells at once
-    print(f"Updating {len(updates)} cells in Google Sheet...")
+    # All three casual columns go out in a single batched write
+    row_outputs = {item['row_num']: result for item, result in zip(rows_to_process, results)}
+    updates = build_column_updates(existing, row_outputs, casual_columns)
+    print(f"\nUpdating {processed} rows in Google Sheet ({len(updates)} ranges, 1 request)...")
     if updates:
-        # Google Sheets API has a limit of ~1000 updates per batch
-        # Split into chunks if needed
-        chunk_size = 1000
-        for i in range(0, len(updates), chunk_size):
-            chunk = updates[i:i+chunk_size]
-            worksheet.batch_update(chunk)
-            if len(updates) > chunk_size:
-                print(f"  Updated {min(i+chunk_size, len(updates))}/{len(updates)} cells...")
+        worksheet.batch_update(updates)
+    mark.commit()
 
     elapsed = time.time() - start_time
     print(f"\n✅ Done! Casualized {processed} records in {elapsed:.1f}s ({processed/elapsed:.1f} records/sec)")
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Offline quality and throughput benchmark for casualization.
+
+Runs a labeled corpus through CasualizeEngine (the same path the casualize
+scripts and Modal use) and reports rows/sec, calls per 1k rows, token usage,
+parse-failure rate and accuracy against the labels. Use it to compare a
+prompt, batch size, worker count or model change before shipping it.
+
+Backends:
+- stub:   deterministic local stand-in for Gemini (answers from casualize_rules),
+          with tunable latency, parse failures and 429s. No network or API key.
+- gemini: the real model (needs GEMINI_API_KEY)
+
+Usage:
+    python3 execution/casualize_benchmark.py
+    python3 execution/casualize_benchmark.py --no-rules --stub-rpm 60 --stub-parse-failure-rate 0.1
+    python3 execution/casualize_benchmark.py --backend gemini --spec first_name --batch-size 30 --fixed
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import importlib
+import threading
+import dataclasses
+from collections import deque
+
+from casualize_cache import CasualizeCache, normalize_input
+from casualize_engine import CasualizeEngine, AdaptiveController, COMBINED_SPEC
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "casualize_benchmark_corpus.json")
+
+# Per-field specs live next to their prompts in the casualize scripts
+SPECS = {
+    "combined": (None, "COMBINED_SPEC"),
+    "first_name": ("casualize_first_names_batch", "FIRST_NAMES_SPEC"),
+    "company_name": ("casualize_company_names_batch", "COMPANY_NAMES_SPEC"),
+    "city": ("casualize_city_names_batch", "CITY_NAMES_SPEC"),
+}
+
+
+def load_spec(name: str):
+    module, attr = SPECS[name]
+    if module is None:
+        return COMBINED_SPEC
+    return getattr(importlib.import_module(module), attr)
+
+
+def load_corpus(path: str, repeat: int = 1) -> list:
+    with open(path, "r", encoding="utf-8") as f:
+        corpus = json.load(f)
+    return corpus * max(1, repeat)
+
+
+# ============================================================================
+# STUB BACKEND
+# ============================================================================
+
+class StubUsage:
+    def __init__(self, prompt_tokens: int, output_tokens: int):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+
+
+class StubResponse:
+    def __init__(self, text: str, usage: StubUsage):
+        self.text = text
+        self.usage_metadata = usage
+
+
+class StubModel:
+    """
+    Deterministic stand-in for genai.GenerativeModel.
+
+    Answers with the local rules, rendered in the spec's output format (JSON
+    array for multi-field specs, numbered list for single-field ones). Failures
+    are seeded by prompt and attempt, so a run gives the same result whatever
+    the thread scheduling. Tokens are estimated at 4 characters per token.
+    """
+
+    def __init__(self, spec, latency: float = 0.05, per_record_latency: float = 0.002,
+                 parse_failure_rate: float = 0.0, rate_limit_rate: float = 0.0,
+                 rpm: int = 0, seed: int = 0):
+        self.latency = latency
+        self.per_record_latency = per_record_latency
+        self.parse_failure_rate = parse_failure_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.rpm = rpm
+        self.seed = seed
+        self._lock = threading.Lock()
+        self._prompts = {}
+        self._attempts = {}
+        self._calls = deque()
+        self._inner_spec = spec
+        # Wrap the prompt builder so each prompt can be mapped back to its records
+        self.spec = dataclasses.replace(spec, build_prompt=self._build_prompt)
+
+    def _build_prompt(self, records):
+        prompt = self._inner_spec.build_prompt(records)
+        with self._lock:
+            self._prompts[prompt] = records
+        return prompt
+
+    def _render(self, records) -> str:
+        fields = self._inner_spec.fields
+        answers = [
+            {f.output: (f.rule(r.get(f.name, ""))[0] if f.rule else r.get(f.name, "")) for f in fields}
+            for r in records
+        ]
+        if len(fields) > 1:
+            return json.dumps([{"id": i + 1, **a} for i, a in enumerate(answers)])
+        return "\n".join(f"{i + 1}. {a[fields[0].output]}" for i, a in enumerate(answers))
+
+    def generate_content(self, prompt: str) -> StubResponse:
+        with self._lock:
+            records = self._prompts[prompt]
+            attempt = self._attempts.get(prompt, 0)
+            self._attempts[prompt] = attempt + 1
+            throttled = False
+            if self.rpm:
+                now = time.time()
+                while self._calls and now - self._calls[0] > 60:
+                    self._calls.popleft()
+                throttled = len(self._calls) >= self.rpm
+                if not throttled:
+                    self._calls.append(now)
+        roll = random.Random(f"{self.seed}:{attempt}:{prompt}").random()
+
+        time.sleep(self.latency + self.per_record_latency * len(records))
+        if throttled or roll < self.rate_limit_rate:
+            raise Exception("429 Resource has been exhausted (stub)")
+
+        if roll < self.rate_limit_rate + self.parse_failure_rate:
+            # Typical real failure: the model drops an item from the list
+            text = self._render(records[:-1] or records[:1] * 2)
+        else:
+            text = self._render(records)
+        return StubResponse(text, StubUsage(len(prompt) // 4, len(text) // 4))
+
+
+# ============================================================================
+# METRICS
+# ============================================================================
+
+def matches(value: str, label) -> bool:
+    labels = label if isinstance(label, list) else [label]
+    return normalize_input(value) in {normalize_input(l) for l in labels}
+
+
+def score(corpus: list, outputs: list, fields) -> tuple:
+    """Return ({output_field: accuracy, 'overall': accuracy}, [mismatches])."""
+    correct = {f.output: 0 for f in fields}
+    labeled = {f.output: 0 for f in fields}
+    mismatches = []
+    for row, out in zip(corpus, outputs):
+        for f in fields:
+            label = row.get(f.output)
+            if label is None:
+                continue
+            labeled[f.output] += 1
+            if matches(out.get(f.output, ""), label):
+                correct[f.output] += 1
+            else:
+                mismatches.append({"field": f.name, "input": row.get(f.name), "got": out.get(f.output), "expected": label})
+    accuracy = {k: round(correct[k] / labeled[k], 4) for k in correct if labeled[k]}
+    total = sum(labeled.values())
+    accuracy["overall"] = round(sum(correct.values()) / total, 4) if total else 0.0
+    return accuracy, mismatches
+
+
+def build_report(engine: CasualizeEngine, corpus: list, outputs: list, elapsed: float, args) -> dict:
+    stats = engine.stats
+    rows = len(corpus)
+    accuracy, mismatches = score(corpus, outputs, engine.spec.fields)
+    per_1k = 1000 / rows if rows else 0
+    report = {
+        "backend": args.backend,
+        "model": args.model if args.backend == "gemini" else "stub",
+        "spec": args.spec,
+        "prompt_version": engine.spec.version,
+        "rules": not args.no_rules,
+        "rows": rows,
+        "distinct_llm_records": stats.llm_records,
+        "elapsed_s": round(elapsed, 3),
+        "rows_per_sec": round(rows / elapsed, 1) if elapsed else 0,
+        "calls": stats.calls,
+        "calls_per_1k_rows": round(stats.calls * per_1k, 1),
+        "prompt_tokens": stats.prompt_tokens,
+        "output_tokens": stats.output_tokens,
+        "tokens_per_1k_rows": round((stats.prompt_tokens + stats.output_tokens) * per_1k),
+        "parse_failures": stats.parse_failures,
+        "parse_failure_rate": round(stats.parse_failures / stats.calls, 4) if stats.calls else 0.0,
+        "rate_limited": stats.rate_limited,
+        "fallbacks": stats.fallbacks,
+        "avg_batch_size": stats.as_dict()["avg_batch_size"],
+        "final_controller": engine.controller.snapshot(),
+        "accuracy": accuracy,
+    }
+    if args.show_errors:
+        report["mismatches"] = mismatches
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark casualization quality and throughput offline")
+    parser.add_argument("--backend", choices=["stub", "gemini"], default="stub")
+    parser.add_argument("--model", default="gemini-1.5-flash", help="Gemini model for --backend gemini")
+    parser.add_argument("--spec", choices=list(SPECS), default="combined", help="Prompt to benchmark")
+    parser.add_argument("--corpus", default=CORPUS_PATH, help="Labeled corpus JSON")
+    parser.add_argument("--repeat", type=int, default=1, help="Repeat the corpus N times (exercises dedup)")
+    parser.add_argument("--batch-size", type=int, default=30, help="Starting batch size")
+    parser.add_argument("--workers", type=int, default=5, help="Max parallel workers")
+    parser.add_argument("--fixed", action="store_true", help="Pin batch size and workers (no adaptation)")
+    parser.add_argument("--no-rules", action="store_true", help="Send every value to the model")
+    parser.add_argument("--cache", help="SQLite memo cache path (default: no cache)")
+    parser.add_argument("--stub-latency", type=float, default=0.05, help="Stub seconds per call")
+    parser.add_argument("--stub-per-record", type=float, default=0.002, help="Stub seconds per record")
+    parser.add_argument("--stub-parse-failure-rate", type=float, default=0.0)
+    parser.add_argument("--stub-rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--stub-rpm", type=int, default=0, help="Stub requests/minute before 429s (0 = unlimited)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Also write the report JSON to this path")
+    parser.add_argument("--show-errors", action="store_true", help="Include mismatched answers in the report")
+    parser.add_argument("--verbose", action="store_true", help="Print per-batch engine progress")
+    args = parser.parse_args()
+
+    spec = load_spec(args.spec)
+    corpus = load_corpus(args.corpus, args.repeat)
+
+    if args.backend == "stub":
+        model = StubModel(
+            spec, latency=args.stub_latency, per_record_latency=args.stub_per_record,
+            parse_failure_rate=args.stub_parse_failure_rate, rate_limit_rate=args.stub_rate_limit_rate,
+            rpm=args.stub_rpm, seed=args.seed,
+        )
+        spec = model.spec
+    else:
+        import google.generativeai as genai
+        from dotenv import load_dotenv
+        load_dotenv()
+        api_key = os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            print("Error: GEMINI_API_KEY not set in .env")
+            sys.exit(1)
+        genai.configure(api_key=api_key)
+        model = genai.GenerativeModel(args.model)
+
+    if args.fixed:
+        controller = AdaptiveController(
+            batch_size=args.batch_size, min_batch=args.batch_size, max_batch=args.batch_size,
+            concurrency=args.workers, min_concurrency=args.workers, max_concurrency=args.workers,
+        )
+    else:
+        controller = AdaptiveController(
+            batch_size=args.batch_size, concurrency=min(2, args.workers), max_concurrency=args.workers
+        )
+
+    cache = CasualizeCache(args.cache) if args.cache else None
+    engine = CasualizeEngine(
+        model, spec, cache=cache, controller=controller, use_rules=not args.no_rules,
+        log=print if args.verbose else (lambda message: None),
+    )
+
+    start = time.time()
+    outputs = engine.run(corpus)
+    report = build_report(engine, corpus, outputs, time.time() - start, args)
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Persistent memo cache for LLM casualization results.
+
+Maps (field type, prompt version, normalized input) -> casual output so the
+same first names, companies and cities are only ever sent to Gemini once,
+across runs and across clients. Bump a script's PROMPT_VERSION whenever its
+prompt or model changes and old answers stop being served.
+
+Backends:
+- SQLite file (default, .tmp/casualize_cache.db) for the local scripts
+- Any dict-like object with get()/update(), e.g. a modal.Dict, for Modal
+
+Usage:
+    python3 execution/casualize_cache.py stats
+    python3 execution/casualize_cache.py clear --field first_name
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+CACHE_PATH = os.getenv("CASUALIZE_CACHE_PATH", os.path.join(".tmp", "casualize_cache.db"))
+REMOTE_LOOKUP_WORKERS = 16
+
+
+def normalize_input(value) -> str:
+    """Case- and whitespace-insensitive key for an input value."""
+    return " ".join(str(value or "").split()).casefold()
+
+
+def make_key(field: str, prompt_version: str, value) -> str:
+    return f"{field}|{prompt_version}|{normalize_input(value)}"
+
+
+def unique_values(values) -> list:
+    """Distinct non-empty values in first-seen order, collapsed by normalized form."""
+    seen = {}
+    for value in values:
+        norm = normalize_input(value)
+        if norm and norm not in seen:
+            seen[norm] = value
+    return list(seen.values())
+
+
+class CasualizeCache:
+    """Keyed store of casualization answers, shared by every casualize script."""
+
+    def __init__(self, path: str = CACHE_PATH, backend=None):
+        self._lock = threading.Lock()
+        self.backend = backend
+        self.db = None
+        self.hits = 0
+        self.misses = 0
+        if backend is None:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS casualize_cache ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " updated_at REAL"
+                ") WITHOUT ROWID"
+            )
+            self.db.commit()
+
+    def get_many(self, field: str, values, prompt_version: str) -> dict:
+        """Return {value: casual} for every value already answered under this prompt version."""
+        keys = {}
+        for v in values:
+            keys.setdefault(make_key(field, prompt_version, v), []).append(v)
+        found = {}
+        if not keys:
+            return found
+        if self.db is not None:
+            key_list = list(keys)
+            with self._lock:
+                # SQLite limits bound parameters per statement
+                for i in range(0, len(key_list), 500):
+                    chunk = key_list[i:i + 500]
+                    placeholders = ",".join("?" * len(chunk))
+                    for key, value in self.db.execute(
+                        f"SELECT key, value FROM casualize_cache WHERE key IN ({placeholders})", chunk
+                    ):
+                        for original in keys[key]:
+                            found[original] = value
+        else:
+            # Remote stores (modal.Dict) pay a round trip per key, so overlap them
+            with ThreadPoolExecutor(max_workers=REMOTE_LOOKUP_WORKERS) as executor:
+                for originals, value in zip(keys.values(), executor.map(self.backend.get, keys)):
+                    if value is not None:
+                        for original in originals:
+                            found[original] = value
+        hit_keys = sum(1 for k, originals in keys.items() if originals[0] in found)
+        self.hits += hit_keys
+        self.misses += len(keys) - hit_keys
+        return found
+
+    def put_many(self, field: str, mapping: dict, prompt_version: str):
+        """Store {value: casual} answers from the LLM."""
+        entries = {make_key(field, prompt_version, k): v for k, v in mapping.items() if normalize_input(k)}
+        if not entries:
+            return
+        if self.db is not None:
+            now = time.time()
+            with self._lock:
+                self.db.executemany(
+                    "INSERT OR REPLACE INTO casualize_cache (key, value, updated_at) VALUES (?, ?, ?)",
+                    ((k, v, now) for k, v in entries.items())
+                )
+                self.db.commit()
+        else:
+            self.backend.update(**entries)
+
+    def clear(self, field: str = None) -> int:
+        if self.db is None:
+            raise NotImplementedError("clear() is only supported on the SQLite backend")
+        with self._lock:
+            if field:
+                cur = self.db.execute("DELETE FROM casualize_cache WHERE key LIKE ?", (f"{field}|%",))
+            else:
+                cur = self.db.execute("DELETE FROM casualize_cache")
+            self.db.commit()
+            return cur.rowcount
+
+    def stats(self) -> dict:
+        result = {"hits": self.hits, "misses": self.misses}
+        if self.db is not None:
+            rows = self.db.execute(
+                "SELECT substr(key, 1, instr(key, '|') - 1) AS field, COUNT(*) FROM casualize_cache GROUP BY field"
+            ).fetchall()
+            result["entries"] = dict(rows)
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect the casualization memo cache")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="Show entry counts per field")
+    p_clear = sub.add_parser("clear", help="Delete cached answers")
+    p_clear.add_argument("--field", help="Only clear one field (first_name, company_name, city)")
+    args = parser.parse_args()
+
+    cache = CasualizeCache()
+    if args.command == "stats":
+        print(json.dumps(cache.stats(), indent=2))
+    elif args.command == "clear":
+        print(f"Deleted {cache.clear(args.field)} entries")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,490 @@
+#!/usr/bin/env python3
+"""
+Adaptive, rate-aware casualization engine.
+
+Shared by every casualize script and the Modal scrape_leads_background step.
+For a list of records it:
+1. Resolves confident values with the local rules (casualize_rules.py)
+2. Serves repeat values from the memo cache (casualize_cache.py)
+3. Sends each remaining distinct record to Gemini once, with batch size and
+   concurrency tuned AIMD-style from observed latency, 429s and parse failures
+4. Caches the answers and returns one output dict per input record
+
+build_column_updates() then turns the outputs into a single batched sheet write;
+casualize_lead_list() runs a lead store list through the engine instead.
+"""
+
+import re
+import json
+import time
+import random
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, List, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+try:
+    from execution.casualize_rules import (
+        casualize_first_name, casualize_company_name, casualize_city_name, CONFIDENCE_THRESHOLD
+    )
+    from execution.casualize_cache import normalize_input
+except ImportError:
+    from casualize_rules import (
+        casualize_first_name, casualize_company_name, casualize_city_name, CONFIDENCE_THRESHOLD
+    )
+    from casualize_cache import normalize_input
+
+logger = logging.getLogger("casualize-engine")
+
+MAX_ATTEMPTS = 4  # Per record, before falling back to the original value
+
+
+class ParseError(Exception):
+    """The model answered, but not in a shape we can line up with the inputs."""
+
+
+# ============================================================================
+# SPECS
+# ============================================================================
+
+@dataclass
+class FieldSpec:
+    """One casualized column: input key, output key, and optional local rule."""
+    name: str
+    output: str
+    rule: Optional[Callable] = None
+
+
+@dataclass
+class PromptSpec:
+    """How to ask the model about a batch of records and read its answer."""
+    fields: List[FieldSpec]
+    version: str
+    build_prompt: Callable[[List[dict]], str]
+    parse: Callable[[str, List[dict]], List[dict]]
+
+
+FIRST_NAME_FIELD = FieldSpec("first_name", "casual_first_name", casualize_first_name)
+COMPANY_NAME_FIELD = FieldSpec("company_name", "casual_company_name", casualize_company_name)
+CITY_FIELD = FieldSpec("city", "casual_city_name", casualize_city_name)
+
+
+def strip_code_fences(text: str) -> str:
+    text = text.strip()
+    if "```" in text:
+        text = re.sub(r'```(?:json)?\s*([\s\S]*?)\s*```', r'\1', text).strip()
+    return text
+
+
+def parse_numbered_list(output: str) -> Callable[[str, List[dict]], List[dict]]:
+    """Parser for prompts that answer with a "1. Value" line per input."""
+    def parse(text: str, records: List[dict]) -> List[dict]:
+        values = []
+        for line in text.strip().split("\n"):
+            line = line.strip()
+            if not line:
+                continue
+            # Remove number prefix (e.g., "1. " or "1) ")
+            m = re.match(r'^\d+[\.\)]\s*(.*)', line)
+            value = m.group(1) if m else line
+            values.append(value.strip('"').strip("'"))
+        if len(values) != len(records):
+            raise ParseError(f"Got {len(values)} results for {len(records)} inputs")
+        return [{output: v} for v in values]
+    return parse
+
+
+def build_combined_prompt(records: List[dict]) -> str:
+    records_json = json.dumps([
+        {"id": i + 1, "first_name": r["first_name"], "company_name": r["company_name"], "city": r["city"]}
+        for i, r in enumerate(records)
+    ])
+    return f"""Convert to casual forms for cold emails.
+
+Rules:
+- first_name: Common nicknames (William→Will, Jennifer→Jen), keep if no nickname
+- company_name: Remove "The", legal suffixes (LLC/Inc/Corp/Ltd), generic words (Realty/Real Estate/Group/Services). Use "you guys" if too generic
+- city: Local nicknames (San Francisco→SF, Philadelphia→Philly), keep if none
+
+Input: {records_json}
+
+Return ONLY the JSON array. Output format: [{{"id": 1, "casual_first_name": "...", "casual_company_name": "...", "casual_city_name": "..."}}]"""
+
+
+def parse_combined(text: str, records: List[dict]) -> List[dict]:
+    try:
+        results = json.loads(strip_code_fences(text))
+    except json.JSONDecodeError as e:
+        raise ParseError(f"Invalid JSON: {e}")
+    if not isinstance(results, list):
+        raise ParseError("Expected a JSON array")
+    by_id = {r.get("id"): r for r in results if isinstance(r, dict)}
+    if len(by_id) != len(records) or set(by_id) != set(range(1, len(records) + 1)):
+        raise ParseError(f"Got {len(results)} results for {len(records)} inputs")
+    return [by_id[i + 1] for i in range(len(records))]
+
+
+COMBINED_SPEC = PromptSpec(
+    fields=[FIRST_NAME_FIELD, COMPANY_NAME_FIELD, CITY_FIELD],
+    version="combined-v2",
+    build_prompt=build_combined_prompt,
+    parse=parse_combined,
+)
+
+
+# ============================================================================
+# AIMD CONTROLLER
+# ============================================================================
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """429 / quota errors from google.generativeai, google-genai or raw HTTP."""
+    name = type(error).__name__
+    text = str(error)
+    return (
+        name in ("ResourceExhausted", "TooManyRequests", "RateLimitError")
+        or "429" in text
+        or "RESOURCE_EXHAUSTED" in text
+        or "quota" in text.lower()
+    )
+
+
+class AdaptiveController:
+    """
+    Additive-increase / multiplicative-decrease control of batch size and concurrency.
+
+    - Fast successful batch: batch size +batch_step, concurrency +1 per window of successes
+    - Slow batch (latency > target): batch size x0.75
+    - Parse failure: batch size halves (replaces recursive splitting)
+    - 429 / quota: concurrency halves and new calls pause with jittered exponential backoff
+    """
+
+    def __init__(self, batch_size: int = 30, concurrency: int = 4,
+                 min_batch: int = 5, max_batch: int = 100,
+                 min_concurrency: int = 1, max_concurrency: int = 16,
+                 target_latency: float = 20.0, batch_step: int = 5,
+                 base_backoff: float = 2.0, max_backoff: float = 60.0):
+        self.batch_size = batch_size
+        self._concurrency = float(concurrency)
+        self.min_batch, self.max_batch = min_batch, max_batch
+        self.min_concurrency, self.max_concurrency = min_concurrency, max_concurrency
+        self.target_latency = target_latency
+        self.batch_step = batch_step
+        self.base_backoff, self.max_backoff = base_backoff, max_backoff
+        self.pause_until = 0.0
+        self._consecutive_throttles = 0
+
+    @property
+    def concurrency(self) -> int:
+        return max(self.min_concurrency, min(self.max_concurrency, int(self._concurrency)))
+
+    def on_success(self, latency: float):
+        self._consecutive_throttles = 0
+        if latency > self.target_latency:
+            self.batch_size = max(self.min_batch, int(self.batch_size * 0.75))
+        else:
+            self.batch_size = min(self.max_batch, self.batch_size + self.batch_step)
+        # +1 worker after roughly one success per worker (TCP-style window growth)
+        self._concurrency = min(self.max_concurrency, self._concurrency + 1.0 / max(self._concurrency, 1.0))
+
+    def on_parse_failure(self, batch_len: int):
+        self.batch_size = max(self.min_batch, min(self.batch_size, batch_len // 2))
+
+    def on_rate_limit(self):
+        self._concurrency = max(self.min_concurrency, self._concurrency / 2)
+        self._backoff()
+
+    def on_error(self):
+        self._backoff()
+
+    def _backoff(self):
+        delay = min(self.max_backoff, self.base_backoff * (2 ** self._consecutive_throttles))
+        self._consecutive_throttles += 1
+        # Full jitter so parallel workers don't retry in lockstep
+        self.pause_until = max(self.pause_until, time.time() + random.uniform(delay / 2, delay))
+
+    def snapshot(self) -> dict:
+        return {"batch_size": self.batch_size, "concurrency": self.concurrency}
+
+
+# ============================================================================
+# ENGINE
+# ============================================================================
+
+@dataclass
+class EngineStats:
+    """Counters for one engine; local/cached count distinct field values."""
+    rows: int = 0
+    local: int = 0
+    cached: int = 0
+    llm_records: int = 0
+    calls: int = 0
+    rate_limited: int = 0
+    parse_failures: int = 0
+    errors: int = 0
+    fallbacks: int = 0
+    prompt_tokens: int = 0
+    output_tokens: int = 0
+    elapsed: float = 0.0
+    batch_sizes: list = field(default_factory=list)
+
+    def as_dict(self) -> dict:
+        d = dict(self.__dict__)
+        sizes = d.pop("batch_sizes")
+        d["avg_batch_size"] = round(sum(sizes) / len(sizes), 1) if sizes else 0
+        return d
+
+
+class CasualizeEngine:
+    """Runs records through rules -> cache -> adaptive Gemini batches."""
+
+    def __init__(self, model, spec: PromptSpec, cache=None, controller: AdaptiveController = None,
+                 use_rules: bool = True, log: Callable[[str], None] = print):
+        self.model = model
+        self.spec = spec
+        self.cache = cache
+        self.controller = controller or AdaptiveController()
+        self.use_rules = use_rules
+        self.log = log
+        self.stats = EngineStats()
+
+    def _fallback(self, record: dict) -> dict:
+        return {f.output: record.get(f.name, "") for f in self.spec.fields}
+
+    def _call(self, records: List[dict]):
+        start = time.time()
+        response = self.model.generate_content(self.spec.build_prompt(records))
+        latency = time.time() - start
+        usage = getattr(response, "usage_metadata", None)
+        tokens = (
+            getattr(usage, "prompt_token_count", 0) or 0,
+            getattr(usage, "candidates_token_count", 0) or 0,
+        )
+        # Parse errors are raised after the call so the controller still sees the latency
+        try:
+            return self.spec.parse(response.text, records), latency, tokens, None
+        except ParseError as e:
+            return None, latency, tokens, e
+
+    def run(self, records: List[dict]) -> List[dict]:
+        """Return one {output_field: value} dict per input record, in order."""
+        start = time.time()
+        self.stats.rows += len(records)
+        fields = self.spec.fields
+
+        # 1 + 2: local rules and memo cache, per field
+        known = {}
+        for f in fields:
+            pending = []
+            for value in dict.fromkeys(r.get(f.name, "") for r in records):
+                if not normalize_input(value):
+                    known[(f.name, "")] = value
+                    continue
+                if self.use_rules and f.rule:
+                    casual, confidence = f.rule(value)
+                    if confidence >= CONFIDENCE_THRESHOLD:
+                        known[(f.name, normalize_input(value))] = casual
+                        self.stats.local += 1
+                        continue
+                pending.append(value)
+            if self.cache is not None and pending:
+                for value, casual in self.cache.get_many(f.name, pending, self.spec.version).items():
+                    known[(f.name, normalize_input(value))] = casual
+                    self.stats.cached += 1
+
+        outputs: List[Optional[dict]] = [None] * len(records)
+        groups = {}  # normalized record -> indexes of every duplicate
+        for i, record in enumerate(records):
+            keys = [(f.name, normalize_input(record.get(f.name, ""))) for f in fields]
+            if all(k in known for k in keys):
+                outputs[i] = {f.output: known[k] for f, k in zip(fields, keys)}
+            else:
+                groups.setdefault(tuple(k for _, k in keys), []).append(i)
+
+        # 3: adaptive LLM calls over distinct records
+        unique = deque((records[idxs[0]], key, 0) for key, idxs in groups.items())
+        self.stats.llm_records += len(unique)
+        if unique:
+            self.log(f"Casualizing {len(unique)} distinct records with Gemini "
+                     f"({len(records) - sum(len(v) for v in groups.values())} answered locally or from cache)")
+            answers = self._run_adaptive(unique)
+            for key, result in answers.items():
+                # Confident local/cached answers win over the model's for the same field
+                merged = {f.output: known.get((f.name, k), result[f.output]) for f, k in zip(fields, key)}
+                for i in groups[key]:
+                    outputs[i] = merged
+
+        for i, out in enumerate(outputs):
+            if out is None:
+                outputs[i] = self._fallback(records[i])
+        self.stats.elapsed += time.time() - start
+        return outputs
+
+    def _run_adaptive(self, queue: deque) -> Dict[tuple, dict]:
+        ctl = self.controller
+        answers = {}
+        inflight = {}
+        with ThreadPoolExecutor(max_workers=ctl.max_concurrency) as executor:
+            while queue or inflight:
+                # Launch as many batches as the controller currently allows
+                while queue and len(inflight) < ctl.concurrency and time.time() >= ctl.pause_until:
+                    size = min(ctl.batch_size, len(queue))
+                    batch = [queue.popleft() for _ in range(size)]
+                    self.stats.calls += 1
+                    self.stats.batch_sizes.append(size)
+                    future = executor.submit(self._call, [item[0] for item in batch])
+                    inflight[future] = batch
+
+                if not inflight:
+                    # Only waiting out a backoff pause
+                    time.sleep(max(0.0, min(ctl.pause_until - time.time(), 1.0)))
+                    continue
+
+                done, _ = wait(list(inflight), timeout=1.0, return_when=FIRST_COMPLETED)
+                for future in done:
+                    batch = inflight.pop(future)
+                    try:
+                        results, latency, tokens, parse_error = future.result()
+                    except Exception as e:
+                        if is_rate_limit_error(e):
+                            self.stats.rate_limited += 1
+                            ctl.on_rate_limit()
+                            self.log(f"  ⏸️  Rate limited, concurrency → {ctl.concurrency}")
+                        else:
+                            self.stats.errors += 1
+                            ctl.on_error()
+                            self.log(f"  ⚠️  Batch error: {str(e)[:80]}")
+                        self._requeue(queue, batch, answers)
+                        continue
+
+                    self.stats.prompt_tokens += tokens[0]
+                    self.stats.output_tokens += tokens[1]
+                    if parse_error is not None:
+                        self.stats.parse_failures += 1
+                        ctl.on_parse_failure(len(batch))
+                        self.log(f"  ⚠️  {parse_error}; batch size → {ctl.batch_size}")
+                        self._requeue(queue, batch, answers)
+                        continue
+
+                    ctl.on_success(latency)
+                    batch_answers = {}
+                    for (record, key, _), result in zip(batch, results):
+                        out = {f.output: result.get(f.output, record.get(f.name, "")) for f in self.spec.fields}
+                        answers[key] = out
+                        batch_answers[key] = (record, out)
+                    self._remember(batch_answers.values())
+                    self.log(f"  ✓ {len(batch)} records in {latency:.1f}s "
+                             f"(next: batch {ctl.batch_size}, workers {ctl.concurrency})")
+        return answers
+
+    def _requeue(self, queue: deque, batch: list, answers: dict):
+        # Retried records go to the front so the run doesn't stall on a tail of failures
+        for record, key, attempts in reversed(batch):
+            if attempts + 1 >= MAX_ATTEMPTS:
+                self.stats.fallbacks += 1
+                answers[key] = self._fallback(record)
+            else:
+                queue.appendleft((record, key, attempts + 1))
+
+    def _remember(self, items):
+        if self.cache is None:
+            return
+        for f in self.spec.fields:
+            mapping = {record[f.name]: out[f.output] for record, out in items if normalize_input(record.get(f.name))}
+            self.cache.put_many(f.name, mapping, self.spec.version)
+
+
+# ============================================================================
+# LEAD STORE
+# ============================================================================
+
+def casualize_lead_list(store, list_name: str, engine: CasualizeEngine, overwrite: bool = False) -> int:
+    """
+    Casualize a lead store list in place (leads with an email and every input field).
+
+    Leads that already have every output field are skipped unless overwrite is set.
+    Returns the number of leads processed.
+    """
+    inputs = [f.name for f in engine.spec.fields]
+    outputs = [f.output for f in engine.spec.fields]
+    keys, records = [], []
+    for key, lead in store.iter_leads(list_name, present=["email"] + inputs):
+        if not overwrite and all(str(lead.get(field, "")).strip() for field in outputs):
+            continue
+        keys.append(key)
+        records.append({field: str(lead[field]).strip() for field in inputs})
+
+    engine.log(f"Found {len(records)} leads to casualize in list '{list_name}'")
+    if not records:
+        return 0
+
+    results = engine.run(records)
+    updated = store.update(list_name, {
+        key: {field: result[field] for field in outputs if field in result}
+        for key, result in zip(keys, results)
+    })
+    engine.log(f"Saved {updated} leads to the lead store")
+    return len(results)
+
+
+# ============================================================================
+# SHEET WRITES
+# ============================================================================
+
+def column_letter(n):
+    """Convert column index (0-based) to Excel-style column letter (A, B, ... Z, AA, AB, ...)."""
+    result = ""
+    while n >= 0:
+        result = chr(65 + (n % 26)) + result
+        n = n // 26 - 1
+    return result
+
+
+def _existing_value(rows, r: int, name: str, idx: int):
+    """Current cell value from a list of row lists, or from {row index: {output_field: value}}."""
+    if isinstance(rows, dict):
+        return rows.get(r, {}).get(name, "")
+    existing = rows[r] if r < len(rows) else []
+    return existing[idx] if idx < len(existing) else ""
+
+
+def build_column_updates(rows, row_outputs: Dict[int, dict], columns: Dict[str, int]) -> List[dict]:
+    """
+    Build batch_update ranges that write every output column in one request.
+
+    Args:
+        rows: Current sheet values (row 0 is the header), used to keep cells we don't touch.
+            Either a list of row lists, or {row index: {output_field: value}} for projected reads
+        row_outputs: {index into rows: {output_field: value}}
+        columns: {output_field: 0-based column index}
+
+    Returns:
+        A list of {'range', 'values'} dicts for worksheet.batch_update(). Adjacent
+        output columns are merged into one rectangular range spanning the touched rows.
+    """
+    if not row_outputs:
+        return []
+    first, last = min(row_outputs), max(row_outputs)
+
+    # Group adjacent columns into runs: [[(field, idx), ...], ...]
+    runs = []
+    for name, idx in sorted(columns.items(), key=lambda item: item[1]):
+        if runs and runs[-1][-1][1] == idx - 1:
+            runs[-1].append((name, idx))
+        else:
+            runs.append([(name, idx)])
+
+    updates = []
+    for run in runs:
+        values = []
+        for r in range(first, last + 1):
+            out = row_outputs.get(r, {})
+            values.append([
+                out[name] if name in out else _existing_value(rows, r, name, idx)
+                for name, idx in run
+            ])
+        updates.append({
+            'range': f"{column_letter(run[0][1])}{first + 1}:{column_letter(run[-1][1])}{last + 1}",
+            'values': values
+        })
+    return updates
@@ -1,18 +1,25 @@
 import os
 import sys
-import gspread
 import argparse
 import google.generativeai as genai
 from dotenv import load_dotenv
 from urllib.parse import urlparse
 
+from casualize_cache import CasualizeCache
+from google_clients import get_gspread_client
+from sheet_reader import iter_rows
+from stage_watermarks import StageWatermark
+from lead_store import get_lead_store
+from casualize_engine import CasualizeEngine, AdaptiveController, PromptSpec, FIRST_NAME_FIELD, parse_numbered_list, build_column_updates, casualize_lead_list
+
 # Load environment variables
 load_dotenv()
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 if GEMINI_API_KEY:
     genai.configure(api_key=GEMINI_API_KEY)
-BATCH_SIZE = 30  # Process 30 names per API call
+BATCH_SIZE = 30  # Starting names per API call - adapted from latency and parse failures
+PROMPT_VERSION = "v1"  # Bump when the prompt or model changes to invalidate cached answers
 
 def get_sheet_id_from_url(url):
     """Extract spreadsheet ID from URL."""
@@ -31,13 +38,10 @@ def column_letter(n):
         n = n // 26 - 1
     return result
 
-def casualize_first_names_batch(first_names, model):
-    """Use Gemini to convert multiple first names to casual nicknames."""
-    if not first_names:
-        return []
-
+def build_first_names_prompt(records):
+    """Prompt asking Gemini for one casual form per record, as a numbered list."""
     # Format first names as numbered list
-    name_list = "\n".join([f"{i+1}. {name}" for i, name in enumerate(first_names)])
+    name_list = "\n".join([f"{i+1}. {name}" for i, name in enumerate(r['first_name'] for r in records)])
 
     prompt = f"""Convert these formal first names to their most common casual nicknames for cold emails. Use what feels natural and friendly.
 
@@ -56,54 +60,44 @@ Example output:
 2. Rob
 3. Jen
 4. John"""
+    return prompt
 
-    try:
-        response = model.generate_content(prompt)
-        response_text = response.text.strip()
-
-        # Parse the numbered list response
-        casual_names = []
-        for line in response_text.split('\n'):
-            line = line.strip()
-            if not line:
-                continue
-            # Remove number prefix (e.g., "1. " or "1) ")
-            import re
-            m = re.match(r'^\d+[\.\)]\s*(.*)', line)
-            if m:
-                casual_name = m.group(1)
-            else:
-                casual_name = line
-            
-            # Remove quotes if present
-            casual_name = casual_name.strip('"').strip("'")
-            casual_names.append(casual_name)
-
-        # Ensure we have the same number of results as inputs
-        if len(casual_names) != len(first_names):
-            print(f"  ! Warning: Got {len(casual_names)} results for {len(first_names)} inputs")
-            # Pad with original names if needed
-            while len(casual_names) < len(first_names):
-                casual_names.append(first_names[len(casual_names)])
-
-        return casual_names
-    except Exception as e:
-        print(f"  ! API Error: {e}")
-        return first_names
+FIRST_NAMES_SPEC = PromptSpec(
+    fields=[FIRST_NAME_FIELD],
+    version=PROMPT_VERSION,
+    build_prompt=build_first_names_prompt,
+    parse=parse_numbered_list(FIRST_NAME_FIELD.output),
+)
 
 def main():
     parser = argparse.ArgumentParser(description="Casualize first names to nicknames for cold email (batched)")
-    parser.add_argument("sheet_url", help="URL of the Google Sheet")
+    parser.add_argument("sheet_url", nargs="?", help="URL of the Google Sheet")
+    parser.add_argument("--list", help="Casualize a lead store list instead of a sheet")
     parser.add_argument("--overwrite", action="store_true", help="Overwrite existing casual names")
+    parser.add_argument("--rescan", action="store_true", help="Re-read every row (default: new rows plus edited ones)")
     args = parser.parse_args()
 
-    if not ANTHROPIC_API_KEY:
-        print("Error: ANTHROPIC_API_KEY not set in .env")
+    if not GEMINI_API_KEY:
+        print("Error: GEMINI_API_KEY not set in .env")
         sys.exit(1)
 
+    if args.list:
+        # A local query instead of a sheet download; publish with lead_store.py afterwards
+        store = get_lead_store()
+        if store.get_list(args.list) is None:
+            print(f"Error: no lead list named '{args.list}'")
+            sys.exit(1)
+        engine = CasualizeEngine(genai.GenerativeModel('gemini-1.5-flash'), FIRST_NAMES_SPEC,
+                                 cache=CasualizeCache(), controller=AdaptiveController(batch_size=BATCH_SIZE))
+        processed = casualize_lead_list(store, args.list, engine, overwrite=args.overwrite)
+        print(f"\n✅ Done! Casualized {processed} first names.")
+        return
+    if not args.sheet_url:
+        parser.error("sheet_url is required unless --list is given")
+
     print(f"Connecting to Google Sheet...")
     try:
-        gc = gspread.oauth()
+        gc = get_gspread_client(fallback_oauth=True)
         sheet_id = get_sheet_id_from_url(args.sheet_url)
         spreadsheet = gc.open_by_key(sheet_id)
         worksheet = spreadsheet.sheet1
@@ -111,15 +105,13 @@ def main():
         print(f"Error connecting to sheet: {e}")
         sys.exit(1)
 
-    # Get all values
-    print("Reading sheet data...")
-    rows = worksheet.get_all_values()
-    if not rows:
+    # Header only; the needed columns are streamed below
+    print("Reading sheet header...")
+    headers = worksheet.row_values(1)
+    if not headers:
         print("Sheet is empty")
         sys.exit(0)
 
-    headers = rows[0]
-
     # Find column indices
     try:
         email_idx = headers.index("email")
@@ -153,23 +145,35 @@ def main():
     model = genai.GenerativeModel('gemini-1.5-flash')
 
     # Collect rows to process
-    print(f"\nScanning {len(rows)-1} rows for records with emails...")
+    # Stream only the columns this script reads
+    print(f"\nScanning rows for records with emails...")
+    columns = [headers[email_idx], headers[first_name_idx], headers[casual_idx]]
+
+    # Rows processed on earlier runs are skipped without being read (see stage_watermarks.py)
+    mark = StageWatermark(worksheet, "casualize_first_name", FIRST_NAMES_SPEC.version, [headers[email_idx], headers[first_name_idx]])
+    start_row = mark.resume(full=args.rescan or args.overwrite, headers=headers)
+
     rows_to_process = []
+    existing = {}  # row index -> current casual value, kept for rows we don't touch
 
-    for i in range(1, len(rows)):
-        row = rows[i]
+    for row_num, row in iter_rows(worksheet, columns, headers=headers, start_row=start_row):
+        i = row_num - 1
+        existing[i] = {'casual_first_name': row[headers[casual_idx]]}
+        mark.seen(row_num, row)
+        if not args.overwrite and mark.is_done(row_num, row):
+            continue
 
         # Skip if no email
-        if len(row) <= email_idx or not row[email_idx].strip():
+        if not row[headers[email_idx]].strip():
             continue
 
         # Get first name
-        first_name = row[first_name_idx].strip() if len(row) > first_name_idx else ""
+        first_name = row[headers[first_name_idx]].strip()
         if not first_name:
             continue
 
         # Check if already casualized (skip if not overwriting)
-        if not args.overwrite and len(row) > casual_idx and row[casual_idx].strip():
+        if not args.overwrite and row[headers[casual_idx]].strip() and not mark.is_changed(row_num, row):
             continue
 
         rows_to_process.append({
@@ -182,41 +186,25 @@ def main():
 
     if total_to_process == 0:
         print("Nothing to process!")
+        mark.commit()
         sys.exit(0)
 
-    # Process in batches
-    print(f"\nProcessing in batches of {BATCH_SIZE}...")
-    updates = []
-    processed = 0
-
-    for batch_start in range(0, total_to_process, BATCH_SIZE):
-        batch_end = min(batch_start + BATCH_SIZE, total_to_process)
-        batch = rows_to_process[batch_start:batch_end]
-
-        batch_names = [item['first_name'] for item in batch]
-
-        print(f"[{batch_start+1}-{batch_end}/{total_to_process}] Processing batch of {len(batch_names)} names...")
-
-        casual_names = casualize_first_names_batch(batch_names, model)
-
-        # Prepare updates for this batch
-        for i, item in enumerate(batch):
-            casual_name = casual_names[i] if i < len(casual_names) else item['first_name']
-            print(f"  {item['first_name']} → {casual_name}")
-
-            # Sheet rows are 1-indexed, +1 for header
-            updates.append({
-                'range': f'{column_letter(casual_idx)}{item["row_num"] + 1}',
-                'values': [[casual_name]]
-            })
+    # Local rules, memo cache, then adaptive Gemini batches for what's left
+    controller = AdaptiveController(batch_size=BATCH_SIZE)
+    engine = CasualizeEngine(model, FIRST_NAMES_SPEC, cache=CasualizeCache(), controller=controller)
+    results = engine.run([{'first_name': item['first_name']} for item in rows_to_process])
 
-        processed += len(batch)
+    # Rows whose batches never succeeded keep the original value
+    row_outputs = {item['row_num']: result for item, result in zip(rows_to_process, results)}
+    updates = build_column_updates(existing, row_outputs, {FIRST_NAME_FIELD.output: casual_idx})
+    processed = len(row_outputs)
 
-    # Batch update all cells at once
-    print(f"\nUpdating {len(updates)} cells in Google Sheet...")
+    # One batched write covering every processed row
+    print(f"\nUpdating {processed} cells in Google Sheet...")
     if updates:
         worksheet.batch_update(updates)
-        print(f"✅ Updated {len(updates)} casual first names")
+        print(f"✅ Updated {processed} casual first names")
+    mark.commit()
 
     print(f"\n✅ Done! Casualized {processed} first names.")
 
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Deterministic fast path for casualizing first names, company names and cities.
+
+Most rows in a lead sheet need a mechanical change ("William" -> "Will",
+"Acme Plumbing LLC" -> "Acme Plumbing", "San Francisco" -> "SF"). These rules
+handle them locally and attach a confidence score; only rows below
+CONFIDENCE_THRESHOLD are sent to Gemini by the casualize scripts.
+
+Usage:
+    python3 execution/casualize_rules.py first_name William Jennifer Xiomara
+    python3 execution/casualize_rules.py company_name "The Acme Plumbing Co., LLC"
+    python3 execution/casualize_rules.py city "San Francisco, CA"
+"""
+
+import re
+import sys
+import json
+
+CONFIDENCE_THRESHOLD = 0.85
+
+# ============================================================================
+# FIRST NAMES
+# ============================================================================
+
+# Most common, professional nickname only (matches the Gemini prompt rules:
+# "William" -> "Will", not "Bill" or "Billy")
+NICKNAMES = {
+    "abigail": "Abby", "alexander": "Alex", "alexandra": "Alex", "alexis": "Alex",
+    "alfred": "Al", "andrew": "Andy", "anthony": "Tony", "benjamin": "Ben",
+    "bradley": "Brad", "cameron": "Cam", "charles": "Charlie", "christopher": "Chris",
+    "cynthia": "Cindy", "daniel": "Dan", "deborah": "Deb", "debra": "Deb",
+    "dominic": "Dom", "donald": "Don", "douglas": "Doug", "edward": "Ed",
+    "elizabeth": "Liz", "frederick": "Fred", "gabriel": "Gabe", "geoffrey": "Geoff",
+    "gerald": "Jerry", "gregory": "Greg", "jacob": "Jake", "jacqueline": "Jackie",
+    "james": "Jim", "jeffery": "Jeff", "jeffrey": "Jeff", "jennifer": "Jen",
+    "jessica": "Jess", "jonathan": "Jon", "joseph": "Joe", "joshua": "Josh",
+    "katherine": "Kate", "catherine": "Kate", "kathleen": "Kathy", "kenneth": "Ken",
+    "kimberly": "Kim", "kristopher": "Kris", "lawrence": "Larry", "leonard": "Len",
+    "margaret": "Maggie", "matthew": "Matt", "maxwell": "Max", "melissa": "Mel",
+    "michael": "Mike", "mitchell": "Mitch", "nathan": "Nate", "nathaniel": "Nate",
+    "nicholas": "Nick", "pamela": "Pam", "patricia": "Pat", "patrick": "Pat",
+    "philip": "Phil", "phillip": "Phil", "raymond": "Ray", "rebecca": "Becky",
+    "richard": "Rich", "robert": "Rob", "ronald": "Ron", "russell": "Russ",
+    "samantha": "Sam", "samuel": "Sam", "stephanie": "Steph", "stephen": "Steve",
+    "steven": "Steve", "susan": "Sue", "theodore": "Ted", "thomas": "Tom",
+    "timothy": "Tim", "vincent": "Vince", "william": "Will", "zachary": "Zach",
+}
+_NICKNAME_VALUES = set(NICKNAMES.values())
+
+# Common names with no widely used nickname - safe to keep as-is
+KEEP_FIRST_NAMES = {
+    "aaron", "adam", "alan", "amanda", "amber", "amy", "angela", "anna", "ashley",
+    "austin", "barbara", "betty", "brandon", "brenda", "brian", "bryan", "carlos",
+    "carol", "carolyn", "chad", "craig", "dana", "david", "dennis", "derek", "diana",
+    "diane", "dylan", "emily", "emma", "eric", "erica", "erin", "gary", "george",
+    "grace", "hannah", "heather", "helen", "henry", "jack", "jamie", "jason", "jeremy",
+    "jordan", "jose", "joyce", "juan", "julia", "julie", "justin", "karen", "keith",
+    "kelly", "kevin", "kyle", "laura", "lauren", "linda", "lisa", "logan", "luis",
+    "maria", "marie", "mark", "megan", "melanie", "michelle", "monica", "nancy",
+    "nicole", "olivia", "paul", "peter", "rachel", "ryan", "sandra", "sarah", "scott",
+    "sean", "sharon", "shawn", "sophia", "travis", "tyler", "wayne",
+}
+
+
+def _title(name: str) -> str:
+    """Title-case names typed in all caps or all lowercase; leave mixed case (McDonald) alone."""
+    if name.isupper() or name.islower():
+        return name.capitalize()
+    return name
+
+
+def casualize_first_name(name: str) -> tuple:
+    """Return (casual_first_name, confidence)."""
+    name = (name or "").strip()
+    if not name:
+        return "", 1.0
+    # "Mary Ann", "J. Robert", "Jean-Luc" - let the model decide
+    if " " in name or "-" in name:
+        return name, 0.5
+    key = name.lower().rstrip(".")
+    if key in NICKNAMES:
+        return NICKNAMES[key], 0.95
+    if key in KEEP_FIRST_NAMES or len(key) <= 4:
+        return _title(name), 0.95
+    # Already a nickname (the value of some mapping)
+    if name.capitalize() in _NICKNAME_VALUES:
+        return _title(name), 0.95
+    return _title(name), 0.5
+
+
+# ============================================================================
+# COMPANY NAMES
+# ============================================================================
+
+LEGAL_SUFFIXES = {
+    "llc", "l.l.c", "inc", "incorporated", "corp", "corporation", "co", "ltd",
+    "limited", "llp", "lp", "pllc", "pc", "p.c", "pa", "p.a", "plc", "gmbh",
+    "ag", "bv", "sa", "s.a", "srl", "pty", "lc", "dba",
+}
+
+# Trailing words the prompts ask us to remove when a brand name remains: corporate
+# filler, the generic words listed in the company-name prompt, and venue/format
+# nouns ("Keller Williams Realty" -> "Keller Williams"). Two-word entries match
+# the last two tokens.
+GENERIC_WORDS = {
+    "group", "holdings", "enterprises", "services", "service", "solutions", "associates",
+    "partners", "company", "international", "worldwide", "global", "llc",
+    "laboratory", "laboratories", "lab", "labs", "healthcare", "family", "center",
+    "centre", "clinic", "systems", "advisors",
+    "realty", "real estate", "restaurant", "hospital", "agency", "management",
+    "motors", "medicine",
+}
+
+# Industry words - a name made only of these (plus filler) is "too generic"
+INDUSTRY_WORDS = {
+    "dental", "dentistry", "office", "clinic", "center", "medical", "healthcare",
+    "health", "family", "law", "legal", "plumbing", "roofing", "realty",
+    "real", "estate", "insurance", "construction", "cleaning", "landscaping",
+    "marketing", "agency", "consulting", "auto", "repair", "hvac", "electric",
+    "electrical", "salon", "spa", "fitness", "gym", "restaurant", "cafe",
+    "laboratory", "lab", "pharmacy", "vet", "veterinary", "animal", "hospital",
+    "care", "home", "homes", "management", "property", "properties", "design",
+    "studio", "studios", "media", "digital", "tech", "technologies", "technology",
+    "software", "systems", "accounting", "financial", "finance", "&", "and", "of",
+}
+
+TOO_GENERIC = "you guys"
+
+# A name can't end on one of these ("Center for Family Medicine" stripped to
+# "Center for"); such names are left whole for the model
+CONNECTORS = {"for", "at", "by", "of", "the", "&", "and", "in", "on", "to", "with"}
+
+_SPLIT_TAGLINE = re.compile(r"\s+[|–—]\s+|\s+-\s+")
+
+
+def _strip_legal(tokens: list) -> list:
+    # Repeats so "Pty Ltd" and "Co., LLC" both go
+    while tokens and tokens[-1].lower().strip(".,") in LEGAL_SUFFIXES:
+        tokens = tokens[:-1]
+    return tokens
+
+
+def casualize_company_name(name: str) -> tuple:
+    """Return (casual_company_name, confidence)."""
+    name = " ".join((name or "").split())
+    if not name:
+        return "", 1.0
+
+    confidence = 0.95
+    # "Acme Dental | Family Dentistry" - keep the brand half but let the model confirm
+    parts = _SPLIT_TAGLINE.split(name)
+    if len(parts) > 1:
+        name = parts[0]
+        confidence = 0.6
+
+    tokens = name.split()
+    if tokens and tokens[0].lower() == "the" and len(tokens) > 1:
+        tokens = tokens[1:]
+    whole = tokens
+    tokens = _strip_legal(tokens)
+    legal_stripped = len(tokens) < len(whole)
+    # Trailing "Group", "Services", "Real Estate", ... go if a brand word is left
+    while len(tokens) > 1:
+        last_two = " ".join(tokens[-2:]).lower().strip(".,")
+        if len(tokens) > 2 and last_two in GENERIC_WORDS:
+            tokens = _strip_legal(tokens[:-2])
+        elif tokens[-1].lower().strip(".,") in GENERIC_WORDS:
+            tokens = _strip_legal(tokens[:-1])
+        else:
+            break
+        if tokens and tokens[-1].lower().strip(".,") in CONNECTORS:
+            return " ".join(whole).strip(" ,.-"), 0.6
+
+    if not tokens:
+        return TOO_GENERIC, 0.9
+
+    casual = " ".join(tokens).strip(" ,.-")
+    words = [t.lower().strip(".,") for t in tokens]
+    if all(w in INDUSTRY_WORDS or w in GENERIC_WORDS for w in words):
+        # "Lab Corp" may be the brand itself; only "The Dental Group"-style names are sure
+        if legal_stripped and len(tokens) == 1:
+            return " ".join(whole).strip(" ,.-"), 0.6
+        return TOO_GENERIC, 0.9
+    if words[-1] in CONNECTORS:
+        return " ".join(whole).strip(" ,.-"), 0.6
+    # Long names need judgement about which part is the brand
+    if len(tokens) > 3:
+        confidence = min(confidence, 0.6)
+    # "Bloom Marketing": whether the industry word stays depends on how distinctive
+    # the brand is, which the prompt leaves to the model
+    if words[-1] in INDUSTRY_WORDS:
+        confidence = min(confidence, 0.6)
+    return casual, confidence
+
+
+# ============================================================================
+# CITIES
+# ============================================================================
+
+CITY_ABBREVIATIONS = {
+    "san francisco": "SF", "los angeles": "LA", "new york": "NYC",
+    "new york city": "NYC", "manhattan": "NYC", "philadelphia": "Philly",
+    "las vegas": "Vegas", "washington dc": "DC",
+    "washington d.c.": "DC", "new orleans": "NOLA", "indianapolis": "Indy",
+    "oklahoma city": "OKC", "salt lake city": "SLC", "kansas city": "KC",
+    "cincinnati": "Cincy", "jacksonville": "Jax", "albuquerque": "ABQ",
+    "dallas-fort worth": "DFW", "dallas fort worth": "DFW",
+    "saint louis": "St. Louis", "saint paul": "St. Paul",
+    "saint petersburg": "St. Pete", "st. petersburg": "St. Pete", "st petersburg": "St. Pete",
+    "fort lauderdale": "Fort Lauderdale", "san diego": "San Diego", "san jose": "San Jose",
+    "san antonio": "San Antonio", "jersey city": "Jersey City",
+    "palo alto": "Palo Alto", "santa monica": "Santa Monica", "el paso": "El Paso",
+    "fort worth": "Fort Worth", "colorado springs": "Colorado Springs",
+    "long beach": "Long Beach", "virginia beach": "Virginia Beach",
+    "st. louis": "St. Louis", "st louis": "St. Louis",
+}
+
+_CITY_PREFIXES = ("city of ", "greater ", "metro ")
+
+# Single words that are as often a state or another town as the big city
+AMBIGUOUS_CITIES = {"washington"}
+_DC = re.compile(r"^washington,?\s+d\.?\s?c\.?$", re.IGNORECASE)
+
+
+def casualize_city_name(city: str) -> tuple:
+    """Return (casual_city_name, confidence)."""
+    city = " ".join((city or "").split())
+    if not city:
+        return "", 1.0
+    if _DC.match(city):
+        return "DC", 0.95
+    # "Austin, TX" / "Austin, Texas, USA" -> "Austin"
+    base = city.split(",")[0].strip()
+    key = base.lower()
+    for prefix in _CITY_PREFIXES:
+        if key.startswith(prefix):
+            base = base[len(prefix):]
+            key = key[len(prefix):]
+    for suffix in (" area", " metro"):
+        if key.endswith(suffix):
+            base = base[:-len(suffix)]
+            key = key[:-len(suffix)]
+
+    if key in CITY_ABBREVIATIONS:
+        return CITY_ABBREVIATIONS[key], 0.95
+    if key in AMBIGUOUS_CITIES:
+        return _title(base), 0.5
+    if " " not in key and "-" not in key:
+        # Most single-word cities have no casual form
+        return _title(base), 0.9
+    return _title(base), 0.5
+
+
+# ============================================================================
+# BATCH HELPERS
+# ============================================================================
+
+RULES = {
+    "first_name": casualize_first_name,
+    "company_name": casualize_company_name,
+    "city": casualize_city_name,
+}
+
+
+def resolve_locally(values, field: str, threshold: float = CONFIDENCE_THRESHOLD) -> tuple:
+    """
+    Casualize distinct values with the local rules.
+
+    Returns:
+        (resolved, pending): resolved maps value -> casual form for every
+        confident result; pending lists the distinct values that need the LLM.
+    """
+    rule = RULES[field]
+    resolved, pending = {}, []
+    for value in dict.fromkeys(values):
+        casual, confidence = rule(value)
+        if confidence >= threshold:
+            resolved[value] = casual
+        else:
+            pending.append(value)
+    return resolved, pending
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] not in RULES:
+        print(f"Usage: {sys.argv[0]} {{{'|'.join(RULES)}}} VALUE [VALUE ...]")
+        sys.exit(1)
+    rule = RULES[sys.argv[1]]
+    for value in sys.argv[2:]:
+        casual, confidence = rule(value)
+        status = "local" if confidence >= CONFIDENCE_THRESHOLD else "llm"
+        print(json.dumps({"input": value, "casual": casual, "confidence": confidence, "route": status}))
+
+
+if __name__ == "__main__":
+    main()
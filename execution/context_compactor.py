@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Tool-output shaping and context compaction for Gemini agent loops.
+
+run_directive sent every tool result back to the model in full (web_fetch text
+up to 15k characters, whole scrape payloads), and the chat history resends all
+of them on every later turn, so prompt size grew with each of up to 15 turns.
+ContextCompactor bounds it:
+1. shape(): each result is cut to a per-tool character budget before it is
+   sent; long strings keep their head, long lists their first items, each
+   with a note of what was dropped
+2. compact(): results older than the last `keep_recent` turns are replaced in
+   the chat history by a short digest, so a stale page fetch costs ~300
+   characters on later turns instead of its full text
+3. summary: one line per tool call (turn, tool, digest), the rolling record of
+   what the stale turns contained
+
+Usage:
+    from context_compactor import ContextCompactor
+    compactor = ContextCompactor()
+    result = compactor.shape("web_fetch", result)   # before building the FunctionResponse
+    compactor.record_turn(turn, [("web_fetch", result)])
+    response = chat.send_message(tool_results)
+    compactor.compact(chat)
+
+    python3 execution/context_compactor.py result.json --tool web_fetch
+"""
+
+import sys
+import json
+import argparse
+from typing import Any, Dict, List, Tuple
+
+# Characters of JSON each tool's result may take in the prompt
+TOOL_OUTPUT_BUDGETS = {
+    "web_fetch": 4000,
+    "firecrawl_scrape": 4000,
+    "web_search": 3000,
+    "pagespeed_analyze": 2000,
+    "read_sheet": 6000,
+    "instantly_get_emails": 6000,
+    "analyze_social_presence": 3000,
+    "scrape_competitors": 3000,
+}
+DEFAULT_OUTPUT_BUDGET = 3000
+DIGEST_BUDGET = 300   # Characters a compacted (stale) result keeps
+KEEP_RECENT_TURNS = 2  # Turns whose results stay at full (shaped) size
+MIN_STRING = 40
+
+
+def _size(value: Any) -> int:
+    return len(json.dumps(value, default=str))
+
+
+def _shrink(value: Any, max_str: int, max_items: int) -> Any:
+    if isinstance(value, str):
+        if len(value) > max_str:
+            return f"{value[:max_str]}... [{len(value) - max_str} more chars]"
+        return value
+    if isinstance(value, (list, tuple)):
+        items = [_shrink(v, max_str, max_items) for v in value[:max_items]]
+        if len(value) > max_items:
+            items.append(f"... [{len(value) - max_items} more items]")
+        return items
+    if isinstance(value, dict):
+        return {k: _shrink(v, max_str, max_items) for k, v in value.items()}
+    return value
+
+
+def shape_tool_output(result: Any, budget: int) -> dict:
+    """
+    Cut a tool result down to about `budget` characters of JSON.
+
+    Returns the result unchanged if it fits, otherwise a trimmed copy with
+    "_truncated": true. The input is never modified (it may be a cached object).
+    """
+    if not isinstance(result, dict):
+        result = {"result": result}
+    if _size(result) <= budget:
+        return result
+
+    max_str, max_items = budget, 50
+    while True:
+        shaped = _shrink(result, max_str, max_items)
+        if _size(shaped) <= budget or (max_str <= MIN_STRING and max_items <= 1):
+            break
+        max_str, max_items = max(MIN_STRING, max_str // 2), max(1, max_items // 2)
+    shaped["_truncated"] = True
+    return shaped
+
+
+class ContextCompactor:
+    """Keeps a Gemini tool loop's prompt bounded: shaped results, digested stale turns."""
+
+    def __init__(self, budgets: Dict[str, int] = None, keep_recent: int = KEEP_RECENT_TURNS,
+                 digest_budget: int = DIGEST_BUDGET):
+        self.budgets = dict(TOOL_OUTPUT_BUDGETS if budgets is None else budgets)
+        self.keep_recent = keep_recent
+        self.digest_budget = digest_budget
+        self.summary: List[str] = []
+        self._turns: List[List[Tuple[str, dict]]] = []  # per turn: [(tool, digest)]
+        self._compacted = 0
+        self.stats = {"raw_chars": 0, "sent_chars": 0, "compacted_results": 0}
+
+    def shape(self, tool_name: str, result: Any) -> dict:
+        """The result as it should be sent to the model this turn."""
+        shaped = shape_tool_output(result, self.budgets.get(tool_name, DEFAULT_OUTPUT_BUDGET))
+        self.stats["raw_chars"] += _size(result)
+        self.stats["sent_chars"] += _size(shaped)
+        return shaped
+
+    def record_turn(self, turn: int, results: List[Tuple[str, Any]]):
+        """Note one turn's (tool name, result) pairs, in the order they were sent."""
+        digests = []
+        for tool_name, result in results:
+            digest = shape_tool_output(result, self.digest_budget)
+            digests.append((tool_name, digest))
+            self.summary.append(f"Turn {turn}: {tool_name} -> {json.dumps(digest, default=str)}")
+        self._turns.append(digests)
+
+    def compact(self, chat) -> int:
+        """
+        Replace results older than the last `keep_recent` turns with their digests
+        in the chat history. Returns how many results were compacted.
+        """
+        stale = len(self._turns) - self.keep_recent
+        if stale <= self._compacted:
+            return 0
+
+        import google.generativeai as genai
+
+        history = list(chat.history)
+        # Each recorded turn is one history entry holding its function responses, in order
+        responses = [content for content in history
+                     if any(part.function_response.name for part in content.parts)]
+        count = 0
+        for index in range(self._compacted, min(stale, len(responses))):
+            content, digests = responses[index], self._turns[index]
+            for part_index, (tool_name, digest) in enumerate(digests):
+                if part_index >= len(content.parts):
+                    break
+                content.parts[part_index] = genai.protos.Part(
+                    function_response=genai.protos.FunctionResponse(
+                        name=tool_name,
+                        response={"compacted": True, "digest": digest}
+                    )
+                )
+                count += 1
+        chat.history = history
+        self._compacted = stale
+        self.stats["compacted_results"] += count
+        return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show how a tool result is shaped for the prompt")
+    parser.add_argument("json_file", help="JSON file with a tool result")
+    parser.add_argument("--tool", default="web_fetch", help="Tool name (selects the budget)")
+    args = parser.parse_args()
+
+    with open(args.json_file) as f:
+        result = json.load(f)
+    compactor = ContextCompactor()
+    shaped = compactor.shape(args.tool, result)
+    compactor.record_turn(1, [(args.tool, result)])
+    print(json.dumps(shaped, indent=2, default=str))
+    print(f"\n{compactor.stats['raw_chars']} -> {compactor.stats['sent_chars']} chars; digest:\n{compactor.summary[0]}",
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 """
-Enrich missing emails using AnyMailFinder API.
+Enrich missing emails using AnyMailFinder API, in a Google Sheet or a lead store list (--list).
 """
 
 import os
@@ -9,63 +9,27 @@ import json
 import argparse
 import time
 from dotenv import load_dotenv
-import gspread
-from google.oauth2.credentials import Credentials
-from google.oauth2.service_account import Credentials as ServiceAccountCredentials
 import requests
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
+from suppression_store import get_store
+from lead_store import get_lead_store
+from google_clients import get_gspread_client
+from sheet_reader import iter_rows
+from sheet_sync import coalesce_cells, batch_write
+from stage_watermarks import StageWatermark
+
 # Load environment variables
 load_dotenv()
 
-SCOPES = [
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive"
-]
-
-def get_credentials():
-    """
-    Load Google credentials (reuse logic from update_sheet.py).
-    """
-    creds = None
-    
-    # Try OAuth 2.0 Token
-    if os.path.exists('token.json'):
-        creds = Credentials.from_authorized_user_file('token.json', SCOPES)
-
-    # Refresh if expired
-    if creds and creds.expired and creds.refresh_token:
-        from google.auth.transport.requests import Request
-        try:
-            creds.refresh(Request())
-        except Exception as e:
-            print(f"Error refreshing token: {e}")
-            creds = None
-
-    # Try Service Account or new OAuth flow
-    if not creds:
-        service_account_file = os.getenv("GOOGLE_APPLICATION_CREDENTIALS", "service_account.json")
-        
-        if os.path.exists(service_account_file):
-            with open(service_account_file, 'r') as f:
-                content = json.load(f)
-                
-            if "type" in content and content["type"] == "service_account":
-                print("Using Service Account credentials...")
-                creds = ServiceAccountCredentials.from_service_account_file(service_account_file, scopes=SCOPES)
-            elif "installed" in content:
-                print("Using OAuth 2.0 Client Credentials...")
-                from google_auth_oauthlib.flow import InstalledAppFlow
-                flow = InstalledAppFlow.from_client_secrets_file(service_account_file, SCOPES)
-                creds = flow.run_local_server(port=0)
-                with open('token.json', 'w') as token:
-                    token.write(creds.to_json())
-            
-    return creds
+STAGE_VERSION = "v1"  # Bump when the lookup changes to retry every row's enrichment
 
 def find_email_with_anymailfinder(first_name, last_name, full_name, company_domain, company_name):
     """
     Query AnyMailFinder API to find an email.
+
+    Returns the email, "" when there is definitely none (not found, or too little
+    data to search), or None when the lookup itself failed and is worth retrying.
     """
     api_key = os.getenv("ANYMAILFINDER_API_KEY")
     if not api_key:
@@ -101,7 +65,7 @@ def find_email_with_anymailfinder(first_name, last_name, full_name, company_doma
     has_company = company_domain or company_name
     
     if not has_name or not has_company:
-        return None
+        return ""
     
     try:
         response = requests.post(url, headers=headers, json=body, timeout=180)  # 180s timeout per docs
@@ -112,7 +76,7 @@ def find_email_with_anymailfinder(first_name, last_name, full_name, company_doma
         if data.get("email") and data.get("email_status") in ["valid", "risky"]:
             return data["email"]
         
-        return None
+        return ""
         
     except Exception as e:
         print(f"Error querying AnyMailFinder: {e}")
@@ -246,17 +210,21 @@ def download_bulk_results(search_id):
         print(f"Error downloading results: {e}")
         return None
 
-def enrich_sheet(sheet_url):
+def enrich_sheet(sheet_url, use_suppression=True, rescan=False):
     """
     Enrich a Google Sheet by finding missing emails.
+
+    Rows whose company domain is in the local suppression store are skipped
+    before any AnyMailFinder credits are spent. Only rows added since the last
+    run, rows whose name or company cells were edited, and rows whose lookup
+    errored are processed (see stage_watermarks.py); rescan re-reads every row.
     """
-    # Authenticate
-    creds = get_credentials()
-    if not creds:
+    # Authenticate (cached per process, see google_clients.py)
+    try:
+        client = get_gspread_client()
+    except RuntimeError:
         print("Error: Could not authenticate with Google")
         return None
-        
-    client = gspread.authorize(creds)
     
     # Open the sheet
     try:
@@ -266,13 +234,6 @@ def enrich_sheet(sheet_url):
         print(f"Error opening sheet: {e}")
         return None
     
-    # Get all records
-    records = worksheet.get_all_records()
-    
-    if not records:
-        print("No records found in sheet")
-        return sheet_url
-    
     # Find email column index once
     email_col = None
     headers = worksheet.row_values(1)
@@ -285,13 +246,27 @@ def enrich_sheet(sheet_url):
         print("Error: Could not find 'email' column in sheet")
         return None
     
+    # Stream only the columns the lookup needs instead of every column of every row
+    email_header = headers[email_col - 1]
+    lookup_fields = [f for f in ("first_name", "last_name", "full_name", "company_domain", "company_name")
+                     if f in headers]
+    
+    # Rows with a definite answer from an earlier run (found or not) are skipped
+    mark = StageWatermark(worksheet, "enrich_emails", STAGE_VERSION, lookup_fields)
+    start_row = mark.resume(full=rescan, headers=headers)
+    
     # Collect rows that need enrichment
     rows_to_enrich = []
-    for idx, record in enumerate(records):
-        row_num = idx + 2  # +2 because header is row 1 and idx is 0-based
+    seen_rows = 0
+    for row_num, record in iter_rows(worksheet, [email_header] + lookup_fields, headers=headers,
+                                     start_row=start_row):
+        seen_rows += 1
+        mark.seen(row_num, record)
+        if mark.is_done(row_num, record):
+            continue
         
         # Check if email is missing
-        email = record.get("email", "").strip()
+        email = record[email_header].strip()
         if email:
             continue  # Email already exists
         
@@ -303,7 +278,7 @@ def enrich_sheet(sheet_url):
         company_name = record.get("company_name", "").strip()
         
         rows_to_enrich.append({
-            'row_num': row_num,
+            'ref': row_num,
             'first_name': first_name,
             'last_name': last_name,
             'full_name': full_name,
@@ -311,28 +286,125 @@ def enrich_sheet(sheet_url):
             'company_name': company_name
         })
     
+    if not seen_rows:
+        print("No new records in sheet" if start_row > 2 else "No records found in sheet")
+        return sheet_url
+    
+    if rows_to_enrich and use_suppression:
+        store = get_store()
+        rows_to_enrich, suppressed = store.filter_records(
+            rows_to_enrich, email_key=None, domain_key='company_domain'
+        )
+        if suppressed:
+            print(f"Skipping {len(suppressed)} rows whose domain is already suppressed")
+
     if not rows_to_enrich:
         print("No rows need email enrichment")
+        mark.commit()
         return sheet_url
     
     print(f"Processing {len(rows_to_enrich)} rows with missing emails...\n")
-    
-    # Auto-detect: Use bulk API for 200+ rows, concurrent for smaller datasets
+    answers = find_emails(rows_to_enrich)
+    if answers is None:
+        return None
+    found = {row_num: email for row_num, email in answers.items() if email}
+    for row in rows_to_enrich:
+        if row['ref'] not in answers:
+            mark.retry(row['ref'])  # Lookup errored; not the same as "no email"
+
+    # Adjacent cells coalesce into ranges, sent in one batch_update (avoids per-cell API calls)
+    if found:
+        print(f"\nBatch updating {len(found)} cells in sheet...")
+        try:
+            write_updates(worksheet, [{'row': row_num, 'col': email_col, 'value': email}
+                                      for row_num, email in found.items()])
+            print(f"✅ Batch update complete!")
+        except Exception as e:
+            print(f"Error during batch update: {e}")
+            return None
+
+    # Only advance once the results are in the sheet; errored rows stay pending
+    mark.commit()
+    return sheet_url
+
+def enrich_list(list_name, use_suppression=True, rescan=False):
+    """
+    Enrich a lead store list by finding missing emails; publish it with lead_store.py afterwards.
+
+    Leads looked up on an earlier run (found or not) are skipped unless rescan
+    is set, so their credits are not spent twice; leads whose lookup errored are
+    retried next run. Returns the number of emails found, or None on failure.
+    """
+    store = get_lead_store()
+    if store.get_list(list_name) is None:
+        print(f"Error: no lead list named '{list_name}'")
+        return None
+
+    # A local query instead of a sheet download
+    rows_to_enrich = []
+    for key, lead in store.iter_leads(list_name, missing=["email"]):
+        if not rescan and lead.get("email_lookup_version") == STAGE_VERSION:
+            continue
+        row = {'ref': key}
+        for field in ('first_name', 'last_name', 'full_name', 'company_domain', 'company_name'):
+            row[field] = str(lead.get(field) or '').strip()
+        rows_to_enrich.append(row)
+
+    if rows_to_enrich and use_suppression:
+        rows_to_enrich, suppressed = get_store().filter_records(
+            rows_to_enrich, email_key=None, domain_key='company_domain'
+        )
+        if suppressed:
+            print(f"Skipping {len(suppressed)} leads whose domain is already suppressed")
+
+    if not rows_to_enrich:
+        print("No leads need email enrichment")
+        return 0
+
+    print(f"Processing {len(rows_to_enrich)} leads with missing emails...\n")
+    answers = find_emails(rows_to_enrich)
+    if answers is None:
+        return None
+
+    # Only definite answers are stamped; errored lookups stay eligible
+    updates = {key: {'email_lookup_version': STAGE_VERSION} for key in answers}
+    for key, email in answers.items():
+        if email:
+            updates[key]['email'] = email
+    store.update(list_name, updates)
+    found = sum(1 for email in answers.values() if email)
+    print(f"Saved {found} emails to the lead store")
+    return found
+
+def find_emails(rows_to_enrich):
+    """
+    Look up emails for the rows.
+
+    Returns {row ref: email, or "" if there is none} for every row that got a
+    definite answer; rows whose lookup errored are left out. None if nothing
+    could be looked up (no API key, API down).
+
+    Uses the bulk API for 200+ rows (faster for large datasets), concurrent calls below that.
+    """
     if len(rows_to_enrich) >= 200:
         print(f"🚀 Using BULK API for {len(rows_to_enrich)} rows (faster for large datasets)")
-        result = enrich_with_bulk_api(worksheet, email_col, rows_to_enrich, sheet_url)
+        found = find_emails_bulk(rows_to_enrich)
 
         # Fallback to concurrent API if bulk API fails
-        if result is None:
-            print(f"\n⚠️  Bulk API failed. Falling back to CONCURRENT API...")
-            return enrich_with_concurrent_api(worksheet, email_col, rows_to_enrich, sheet_url)
-        return result
+        if found is not None:
+            return found
+        print(f"\n⚠️  Bulk API failed. Falling back to CONCURRENT API...")
     else:
         print(f"⚡ Using CONCURRENT API for {len(rows_to_enrich)} rows")
-        return enrich_with_concurrent_api(worksheet, email_col, rows_to_enrich, sheet_url)
+    return find_emails_concurrent(rows_to_enrich)
+
+def write_updates(worksheet, updates_to_apply):
+    """Write {'row', 'col' (1-based), 'value'} updates as coalesced ranges in one request."""
+    cells = {(u['row'], u['col'] - 1): u['value'] for u in updates_to_apply}
+    batch_write(worksheet, coalesce_cells(cells))
 
-def enrich_with_bulk_api(worksheet, email_col, rows_to_enrich, sheet_url):
-    """Enrich using bulk API (for 200+ rows)."""
+def find_emails_bulk(rows_to_enrich):
+    """Look up emails with the bulk API (for 200+ rows)."""
     
     # Create bulk search
     search_id = create_bulk_search(rows_to_enrich)
@@ -352,9 +424,8 @@ def enrich_with_bulk_api(worksheet, email_col, rows_to_enrich, sheet_url):
         return None
     
     # Map results back to rows (excluding header row)
-    enriched_count = 0
+    answers = {}
     failed_count = 0
-    updates_to_apply = []
     
     # Results start from index 1 (skip header at index 0)
     for idx, result_row in enumerate(results[1:], start=0):
@@ -362,55 +433,43 @@ def enrich_with_bulk_api(worksheet, email_col, rows_to_enrich, sheet_url):
             break
         
         row_data = rows_to_enrich[idx]
-        row_num = row_data['row_num']
+        ref = row_data['ref']
         
         # Result row format: [first_name, last_name, full_name, domain, company_name, email, email_status]
         email = result_row[5] if len(result_row) > 5 else None
         email_status = result_row[6] if len(result_row) > 6 else None
         
         if email and email_status in ['valid', 'risky']:
-            updates_to_apply.append({
-                'row': row_num,
-                'col': email_col,
-                'value': email
-            })
-            print(f"  ✅ Row {row_num}: Found: {email}")
-            enriched_count += 1
+            answers[ref] = email
+            print(f"  ✅ Row {ref}: Found: {email}")
         else:
             display_name = row_data['full_name'] or f"{row_data['first_name']} {row_data['last_name']}"
-            print(f"  ⚠️  Row {row_num}: Email not found for {display_name}")
+            print(f"  ⚠️  Row {ref}: Email not found for {display_name}")
+            answers[ref] = ""
             failed_count += 1
     
-    # Batch update sheet
-    if updates_to_apply:
-        print(f"\nBatch updating {len(updates_to_apply)} cells in sheet...")
-        cell_list = []
-        for update in updates_to_apply:
-            cell = worksheet.cell(update['row'], update['col'])
-            cell.value = update['value']
-            cell_list.append(cell)
-        worksheet.update_cells(cell_list, value_input_option='RAW')
-        print(f"✅ Batch update complete!")
-    
+    # Rows the results didn't cover have no answer
     print(f"\nEnrichment complete:")
-    print(f"  - Emails found: {enriched_count}")
+    print(f"  - Emails found: {len(answers) - failed_count}")
     print(f"  - Not found: {failed_count}")
+    print(f"  - No result: {len(rows_to_enrich) - len(answers)}")
     
-    return sheet_url
+    return answers
 
-def enrich_with_concurrent_api(worksheet, email_col, rows_to_enrich, sheet_url):
-    """Enrich using concurrent API calls (for <200 rows)."""
+def find_emails_concurrent(rows_to_enrich):
+    """Look up emails with concurrent API calls (for <200 rows)."""
 
-    enriched_count = 0
+    answers = {}
     failed_count = 0
+    error_count = 0
 
     def enrich_row(row_data):
         """Helper function to enrich a single row."""
-        row_num = row_data['row_num']
+        ref = row_data['ref']
         display_name = row_data['full_name'] or f"{row_data['first_name']} {row_data['last_name']}"
         display_company = row_data['company_domain'] or row_data['company_name']
 
-        print(f"Row {row_num}: Querying for {display_name} at {display_company}")
+        print(f"Row {ref}: Querying for {display_name} at {display_company}")
 
         found_email = find_email_with_anymailfinder(
             row_data['first_name'],
@@ -421,7 +480,7 @@ def enrich_with_concurrent_api(worksheet, email_col, rows_to_enrich, sheet_url):
         )
 
         return {
-            'row_num': row_num,
+            'ref': ref,
             'email': found_email,
             'display_name': display_name
         }
@@ -430,76 +489,51 @@ def enrich_with_concurrent_api(worksheet, email_col, rows_to_enrich, sheet_url):
     with ThreadPoolExecutor(max_workers=20) as executor:
         future_to_row = {executor.submit(enrich_row, row): row for row in rows_to_enrich}
 
-        # Collect updates for batch processing
-        updates_to_apply = []
-
         for future in as_completed(future_to_row):
             result = future.result()
 
-            if result['email']:
-                # Stage the update for batch processing
-                updates_to_apply.append({
-                    'row': result['row_num'],
-                    'col': email_col,
-                    'value': result['email']
-                })
-                print(f"  ✅ Row {result['row_num']}: Found: {result['email']}")
-                enriched_count += 1
+            if result['email'] is None:
+                print(f"  ❌ Row {result['ref']}: Lookup failed for {result['display_name']}, will retry next run")
+                error_count += 1
+            elif result['email']:
+                answers[result['ref']] = result['email']
+                print(f"  ✅ Row {result['ref']}: Found: {result['email']}")
             else:
-                print(f"  ⚠️  Row {result['row_num']}: Email not found for {result['display_name']}")
+                answers[result['ref']] = ""
+                print(f"  ⚠️  Row {result['ref']}: Email not found for {result['display_name']}")
                 failed_count += 1
 
-    # Batch update all cells at once using range update (avoids per-cell API calls)
-    if updates_to_apply:
-        print(f"\nBatch updating {len(updates_to_apply)} cells in sheet...")
-
-        # Prepare data for batch update using values_update (more efficient)
-        # Group updates by row for batch processing
-        try:
-            # Use update() with cell list but avoid individual cell() calls
-            # Instead, build the range notation directly
-            batch_data = []
-            for update in updates_to_apply:
-                # Convert column number to letter
-                col_letter = chr(64 + update['col'])  # A=65, B=66, etc.
-                range_notation = f"{col_letter}{update['row']}"
-                batch_data.append({
-                    'range': range_notation,
-                    'values': [[update['value']]]
-                })
-
-            # Use batch_update to update multiple ranges at once
-            worksheet.spreadsheet.values_batch_update(
-                body={
-                    'value_input_option': 'RAW',
-                    'data': batch_data
-                }
-            )
-            print(f"✅ Batch update complete!")
-        except Exception as e:
-            print(f"Error during batch update: {e}")
-            print("Attempting alternative update method...")
-            # Fallback: use single range update with sorted data
-            updates_to_apply.sort(key=lambda x: x['row'])
-            for update in updates_to_apply:
-                col_letter = chr(64 + update['col'])
-                range_notation = f"{col_letter}{update['row']}"
-                worksheet.update(range_notation, [[update['value']]], value_input_option='RAW')
-                time.sleep(0.1)  # Small delay to avoid rate limits
-
     print(f"\nEnrichment complete:")
-    print(f"  - Emails found: {enriched_count}")
+    print(f"  - Emails found: {len(answers) - failed_count}")
     print(f"  - Not found: {failed_count}")
+    print(f"  - Lookup errors: {error_count}")
 
-    return sheet_url
+    if error_count and not answers:
+        return None  # Every lookup failed (missing API key, out of credits, API down)
+    return answers
 
 def main():
     parser = argparse.ArgumentParser(description="Enrich missing emails using AnyMailFinder")
-    parser.add_argument("sheet_url", help="Google Sheet URL to enrich")
+    parser.add_argument("sheet_url", nargs="?", help="Google Sheet URL to enrich")
+    parser.add_argument("--list", help="Enrich a lead store list instead of a sheet")
+    parser.add_argument("--ignore_suppression", action="store_true",
+                        help="Enrich rows even if their domain is in the suppression store")
+    parser.add_argument("--rescan", action="store_true",
+                        help="Re-read every row (default: new rows plus edited or errored ones)")
 
     args = parser.parse_args()
 
-    result_url = enrich_sheet(args.sheet_url)
+    if args.list:
+        found = enrich_list(args.list, use_suppression=not args.ignore_suppression, rescan=args.rescan)
+        if found is None:
+            print("Enrichment failed.")
+            sys.exit(1)
+        print(f"\nSuccess! Found {found} emails for list '{args.list}'")
+        return
+    if not args.sheet_url:
+        parser.error("sheet_url is required unless --list is given")
+
+    result_url = enrich_sheet(args.sheet_url, use_suppression=not args.ignore_suppression, rescan=args.rescan)
     
     if result_url:
         print(f"\nSuccess! Updated sheet: {result_url}")
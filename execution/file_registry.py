@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+In-memory registry of parsed config, directive and script files, with hot reload.
+
+Every webhook request re-read and re-parsed webhooks.json and the directive
+markdown, and list_available_scripts() read every .py file in execution/ to
+pull out its docstring. FileRegistry parses each file once and serves the
+parsed value from memory:
+- a file is stat()ed again at most every `check_interval` seconds; a new
+  mtime or size re-parses it (edits show up without a redeploy)
+- a directory listing is cached the same way and refreshed when the
+  directory's mtime changes (files added or removed)
+- missing files are remembered too, so a fallback path list costs nothing
+  on repeat lookups
+
+Usage:
+    from file_registry import FileRegistry
+    registry = FileRegistry()
+    config = registry.file("/app/webhooks.json", json.loads)           # None if missing
+    scripts = registry.scan("/app/execution", "*.py", script_metadata)  # {stem: parsed}
+
+    python3 execution/file_registry.py directives "*.md"
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+CHECK_INTERVAL = float(os.getenv("REGISTRY_CHECK_INTERVAL", "2"))
+
+_MISSING = (None, None)
+
+
+def _stamp(path: str):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return _MISSING
+    return (st.st_mtime_ns, st.st_size)
+
+
+def docstring_summary(text: str) -> str:
+    """First line of a module's leading docstring, or ''."""
+    if '"""' not in text:
+        return ""
+    start = text.find('"""') + 3
+    end = text.find('"""', start)
+    return text[start:end].strip().split("\n")[0] if end > start else ""
+
+
+def directive_summary(text: str) -> str:
+    """First line under a directive's '## Goal' or '## Description' heading, or ''."""
+    lines = text.split("\n")
+    for i, line in enumerate(lines):
+        if line.startswith("## Goal") or line.startswith("## Description"):
+            for following in lines[i + 1:]:
+                if following.strip():
+                    return following.strip()
+            return ""
+    return ""
+
+
+class FileRegistry:
+    """Parsed file contents keyed by path, refreshed when the file changes on disk."""
+
+    def __init__(self, check_interval: float = CHECK_INTERVAL, log=print):
+        self.check_interval = check_interval
+        self.log = log
+        self._files: Dict[tuple, dict] = {}  # (path, parser) -> {"stamp", "checked", "value"}
+        self._dirs: Dict[tuple, dict] = {}   # (directory, pattern) -> {"stamp", "checked", "names"}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "loads": 0, "reloads": 0}
+
+    def file(self, path: str, parse: Callable[[str], Any] = None, default: Any = None) -> Any:
+        """
+        The parsed contents of `path` (text through `parse`, or the raw text), or `default` if it doesn't exist.
+
+        Errors raised by `parse` propagate and nothing is cached.
+        """
+        key = (str(path), parse)
+        now = time.time()
+        entry = self._files.get(key)
+        if entry is not None and now - entry["checked"] < self.check_interval:
+            self.stats["hits"] += 1
+            return default if entry["stamp"] == _MISSING else entry["value"]
+
+        with self._lock:
+            stamp = _stamp(key[0])
+            entry = self._files.get(key)
+            if entry is not None and entry["stamp"] == stamp:
+                entry["checked"] = now
+                self.stats["hits"] += 1
+                return default if stamp == _MISSING else entry["value"]
+
+            value = None
+            if stamp != _MISSING:
+                text = Path(key[0]).read_text()
+                value = parse(text) if parse else text
+                self.stats["reloads" if entry is not None else "loads"] += 1
+                if entry is not None:
+                    self.log(f"[registry] Reloaded {key[0]}")
+            self._files[key] = {"stamp": stamp, "checked": now, "value": value}
+            return default if stamp == _MISSING else value
+
+    def scan(self, directory: str, pattern: str, parse: Callable[[str], Any] = None) -> Dict[str, Any]:
+        """{file stem: parsed contents} for files in `directory` matching `pattern`, sorted by name."""
+        key = (str(directory), pattern)
+        now = time.time()
+        entry = self._dirs.get(key)
+        if entry is None or now - entry["checked"] >= self.check_interval:
+            stamp = _stamp(key[0])
+            if entry is None or entry["stamp"] != stamp:
+                names = sorted(p.name for p in Path(key[0]).glob(pattern)) if stamp != _MISSING else []
+                entry = {"stamp": stamp, "names": names}
+            entry["checked"] = now
+            with self._lock:
+                self._dirs[key] = entry
+        return {Path(name).stem: self.file(os.path.join(key[0], name), parse) for name in entry["names"]}
+
+    def invalidate(self):
+        """Forget everything; the next lookups read from disk."""
+        with self._lock:
+            self._files.clear()
+            self._dirs.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time cold vs cached registry scans")
+    parser.add_argument("directory", help="Directory to scan")
+    parser.add_argument("pattern", help='Glob pattern, e.g. "*.py"')
+    args = parser.parse_args()
+
+    registry = FileRegistry()
+    summary = docstring_summary if args.pattern.endswith(".py") else directive_summary
+    start = time.time()
+    entries = registry.scan(args.directory, args.pattern, summary)
+    cold = time.time() - start
+    start = time.time()
+    registry.scan(args.directory, args.pattern, summary)
+    warm = time.time() - start
+    print(json.dumps({"files": len(entries), "cold_seconds": round(cold, 4), "cached_seconds": round(warm, 6),
+                      "stats": registry.stats, "entries": entries}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,7 +6,7 @@ End-to-end pipeline that:
 1. Scrapes Google Maps for businesses matching search criteria
 2. Enriches each business by scraping their website for contact info
 3. Uses Claude to extract structured contact data
-4. Saves everything to a persistent Google Sheet
+4. Saves everything to the local lead store and publishes it to a Google Sheet
 
 Usage:
     python3 execution/gmaps_lead_pipeline.py --search "plumbers in Austin TX" --limit 10
@@ -22,22 +22,16 @@ from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 
-import gspread
-from google.oauth2.credentials import Credentials
-from google.auth.transport.requests import Request
-
 # Import our modules
 from scrape_google_maps import scrape_google_maps
 from extract_website_contacts import scrape_website_contacts
+from google_clients import get_gspread_client
+from lead_store import get_lead_store
+from sheet_shards import ShardedSheet
+from supabase_sink import SupabaseSink, lead_rows, LEADS_TABLE, LEADS_CONFLICT
 
 load_dotenv()
 
-# Google Sheets config
-SCOPES = [
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive"
-]
-
 # Default sheet name for leads
 DEFAULT_SHEET_NAME = "GMaps Lead Database"
 
@@ -236,33 +230,6 @@ def flatten_lead(gmaps_data: dict, contacts: dict, search_query: str) -> dict:
     }
 
 
-def get_credentials():
-    """Get OAuth2 credentials for Google Sheets API."""
-    creds = None
-
-    if os.path.exists('token.json'):
-        try:
-            with open('token.json', 'r') as token:
-                token_data = json.load(token)
-                creds = Credentials.from_authorized_user_info(token_data, SCOPES)
-        except Exception as e:
-            print(f"Error loading token: {e}")
-
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            from google_auth_oauthlib.flow import InstalledAppFlow
-            creds_file = os.getenv("GOOGLE_APPLICATION_CREDENTIALS", "credentials.json")
-            flow = InstalledAppFlow.from_client_secrets_file(creds_file, SCOPES)
-            creds = flow.run_local_server(port=0)
-
-        with open('token.json', 'w') as token:
-            token.write(creds.to_json())
-
-    return creds
-
-
 def get_or_create_sheet(sheet_url: str = None, sheet_name: str = None) -> tuple:
     """
     Get existing sheet or create a new one.
@@ -270,8 +237,7 @@ def get_or_create_sheet(sheet_url: str = None, sheet_name: str = None) -> tuple:
     Returns:
         Tuple of (spreadsheet, worksheet, is_new)
     """
-    creds = get_credentials()
-    client = gspread.authorize(creds)
+    client = get_gspread_client()
 
     if sheet_url:
         # Open existing sheet by URL
@@ -309,41 +275,24 @@ def get_or_create_sheet(sheet_url: str = None, sheet_name: str = None) -> tuple:
     return spreadsheet, worksheet, is_new
 
 
-def get_existing_lead_ids(worksheet) -> set:
-    """Get all existing lead IDs from the sheet to avoid duplicates."""
-    try:
-        # Get all values in column A (lead_id)
-        lead_ids = worksheet.col_values(1)
-        return set(lead_ids[1:])  # Skip header
-    except Exception:
-        return set()
-
-
-def append_leads_to_sheet(worksheet, leads: list[dict], existing_ids: set) -> int:
+def open_lead_list(worksheet, spreadsheet, is_new: bool, list_name: str = None) -> str:
     """
-    Append new leads to the sheet, skipping duplicates.
+    Name of the lead store list backing a sheet (one list per spreadsheet by default).
 
-    Returns:
-        Number of leads added
+    The first time an existing sheet is used, its rows are imported so the
+    store, not the sheet, is the record of what has already been scraped.
     """
-    # Filter out duplicates
-    new_leads = [lead for lead in leads if lead["lead_id"] not in existing_ids]
-
-    if not new_leads:
-        print("No new leads to add (all duplicates)")
-        return 0
-
-    # Convert to rows
-    rows = []
-    for lead in new_leads:
-        row = [lead.get(col, "") for col in LEAD_COLUMNS]
-        rows.append(row)
+    store = get_lead_store()
+    list_name = list_name or f"gmaps:{spreadsheet.id}"
+    if store.get_list(list_name) is None and not is_new:
+        imported = store.pull(list_name, worksheet, key_column="lead_id")
+        print(f"Imported {imported['inserted']} existing leads from the sheet into the lead store")
+    return list_name
 
-    # Batch append
-    worksheet.append_rows(rows, value_input_option='RAW')
 
-    print(f"Added {len(new_leads)} new leads to sheet")
-    return len(new_leads)
+def publish_leads(worksheet, list_name: str) -> dict:
+    """Publish the list to its sheet, writing only new and changed cells."""
+    return get_lead_store().publish(list_name, worksheet)
 
 
 def enrich_businesses(businesses: list[dict], max_workers: int = 3) -> list[dict]:
@@ -413,6 +362,10 @@ def run_pipeline(
     sheet_name: str = None,
     workers: int = 3,
     save_intermediate: bool = True,
+    list_name: str = None,
+    sharded: str = None,
+    partition_by: str = None,
+    supabase: bool = False,
 ) -> dict:
     """
     Run the full lead generation pipeline.
@@ -425,6 +378,10 @@ def run_pipeline(
         sheet_name: Name for new sheet (if creating)
         workers: Parallel workers for website enrichment
         save_intermediate: Whether to save intermediate JSON files
+        list_name: Lead store list (default: one list per spreadsheet)
+        sharded: Publish to this sharded table instead of one sheet (see sheet_shards.py)
+        partition_by: Shard partition field, e.g. "state" or "month:scraped_at"
+        supabase: Also upsert the leads into the Supabase leads table (see supabase_sink.py)
 
     Returns:
         Dictionary with pipeline results
@@ -477,32 +434,79 @@ def run_pipeline(
     print(f"STEP 3: Processing lead records")
     print(f"{'='*60}")
 
+    # Leads stream into Supabase in batches while the rest are flattened
+    sink = SupabaseSink(LEADS_TABLE, on_conflict=LEADS_CONFLICT) if supabase else None
     leads = []
     for item in enriched:
         lead = flatten_lead(item["gmaps"], item["contacts"], search_query)
         leads.append(lead)
+        if sink:
+            sink.extend(lead_rows([lead], source="gmaps", key_column="lead_id"))
+    if sink:
+        sink.close()
+        results["supabase"] = dict(sink.stats)
+        print(f"Supabase: {sink.stats['written']} leads written, {sink.stats['failed']} failed")
 
     # Save intermediate enriched data
     if save_intermediate:
         with open(f".tmp/leads_enriched_{timestamp}.json", "w") as f:
             json.dump(leads, f, indent=2)
 
-    # Step 4: Save to Google Sheet
+    # Step 4: Save to the lead store and publish to Google Sheet
     print(f"\n{'='*60}")
-    print(f"STEP 4: Saving to Google Sheet")
+    print(f"STEP 4: Saving to lead store and Google Sheet")
     print(f"{'='*60}")
 
-    try:
-        spreadsheet, worksheet, is_new = get_or_create_sheet(sheet_url, sheet_name)
-        results["sheet_url"] = spreadsheet.url
+    if sharded:
+        # Multi-region scrapes: the store keeps everything, shards hold the published rows
+        list_name = list_name or f"gmaps:{sharded}"
+        results["list_name"] = list_name
+        try:
+            saved = get_lead_store().upsert(list_name, leads, key_column="lead_id")
+            print(f"Lead store: {saved['inserted']} new, {saved['updated']} updated, {saved['unchanged']} unchanged")
+        except Exception as e:
+            results["errors"].append(f"Lead store error: {str(e)}")
+            print(f"Error saving to lead store: {e}")
+        try:
+            table = ShardedSheet.open(sharded, key_column="lead_id", partition_by=partition_by)
+            appended = table.append(leads)
+            results["leads_added"] = appended["added"]
+            results["shards"] = table.stats()
+            if table.shards:
+                results["sheet_url"] = f"https://docs.google.com/spreadsheets/d/{table.shards[0]['spreadsheet_id']}"
+        except Exception as e:
+            results["errors"].append(f"Google Sheets error: {str(e)}")
+            print(f"Error saving to sheet: {e}")
+    else:
+        worksheet = None
+        try:
+            spreadsheet, worksheet, is_new = get_or_create_sheet(sheet_url, sheet_name)
+            results["sheet_url"] = spreadsheet.url
+        except Exception as e:
+            results["errors"].append(f"Google Sheets error: {str(e)}")
+            print(f"Error opening sheet (leads still go to the lead store): {e}")
 
-        existing_ids = get_existing_lead_ids(worksheet)
-        added = append_leads_to_sheet(worksheet, leads, existing_ids)
-        results["leads_added"] = added
+        # The lead store is the system of record; the sheet is its published view
+        saved = None
+        try:
+            if worksheet is not None:
+                list_name = open_lead_list(worksheet, spreadsheet, is_new, list_name)
+            else:
+                list_name = list_name or f"gmaps:{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            results["list_name"] = list_name
+            saved = get_lead_store().upsert(list_name, leads, key_column="lead_id")
+            results["leads_added"] = saved["inserted"]
+            print(f"Lead store: {saved['inserted']} new, {saved['updated']} updated, {saved['unchanged']} unchanged")
+        except Exception as e:
+            results["errors"].append(f"Lead store error: {str(e)}")
+            print(f"Error saving to lead store: {e}")
 
-    except Exception as e:
-        results["errors"].append(f"Google Sheets error: {str(e)}")
-        print(f"Error saving to sheet: {e}")
+        if worksheet is not None and saved is not None:
+            try:
+                publish_leads(worksheet, list_name)
+            except Exception as e:
+                results["errors"].append(f"Google Sheets error: {str(e)}")
+                print(f"Error publishing to sheet (leads are kept in the lead store): {e}")
 
     # Summary
     results["completed_at"] = datetime.now().isoformat()
@@ -545,6 +549,10 @@ Examples:
     parser.add_argument("--sheet-name", help="Name for new sheet (if not using existing)")
     parser.add_argument("--workers", type=int, default=3, help="Parallel workers for enrichment (default: 3)")
     parser.add_argument("--no-intermediate", action="store_true", help="Don't save intermediate JSON files")
+    parser.add_argument("--list", help="Lead store list name (default: one list per spreadsheet)")
+    parser.add_argument("--sharded", help="Publish to a sharded table across sheets (for very large lead sets)")
+    parser.add_argument("--partition-by", help="Shard partition field, e.g. state or month:scraped_at")
+    parser.add_argument("--supabase", action="store_true", help=f"Also upsert leads into the Supabase '{LEADS_TABLE}' table")
     parser.add_argument("--json", action="store_true", help="Output results as JSON")
 
     args = parser.parse_args()
@@ -557,6 +565,10 @@ Examples:
         sheet_name=args.sheet_name,
         workers=args.workers,
         save_intermediate=not args.no_intermediate,
+        list_name=args.list,
+        sharded=args.sharded,
+        partition_by=args.partition_by,
+        supabase=args.supabase,
     )
 
     if args.json:
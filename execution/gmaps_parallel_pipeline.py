@@ -2,7 +2,8 @@
 """
 Parallelized Google Maps Lead Pipeline - Incremental Save
 
-Enriches businesses and saves to Google Sheet incrementally (every few leads).
+Enriches businesses and saves each lead to the local lead store as soon as it
+is ready, publishing to the Google Sheet every few leads.
 """
 
 import os
@@ -20,12 +21,14 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from scrape_google_maps import scrape_google_maps
 from extract_website_contacts import scrape_website_contacts
 from gmaps_lead_pipeline import (
-    flatten_lead, get_or_create_sheet, get_existing_lead_ids,
-    LEAD_COLUMNS
+    flatten_lead, get_or_create_sheet, open_lead_list, publish_leads,
 )
+from lead_store import get_lead_store
 
 load_dotenv()
 
+PUBLISH_EVERY = 25  # Leads saved to the store between sheet publishes
+
 # Global lock for sheet writes
 sheet_lock = Lock()
 
@@ -49,16 +52,10 @@ def enrich_single(args: tuple) -> dict:
     return flatten_lead(business, contacts, search_query)
 
 
-def append_single_lead(worksheet, lead: dict, existing_ids: set) -> bool:
-    """Append a single lead to the sheet if not duplicate. Thread-safe."""
-    if lead["lead_id"] in existing_ids:
-        return False
-
-    with sheet_lock:
-        row = [lead.get(col, "") for col in LEAD_COLUMNS]
-        worksheet.append_row(row, value_input_option='RAW')
-        existing_ids.add(lead["lead_id"])
-    return True
+def save_single_lead(list_name: str, lead: dict) -> bool:
+    """Save a lead to the local lead store. Returns False if it was already there."""
+    saved = get_lead_store().upsert(list_name, [lead], key_column="lead_id")
+    return saved["inserted"] == 1
 
 
 def run_incremental_pipeline(
@@ -68,6 +65,7 @@ def run_incremental_pipeline(
     sheet_url: str = None,
     sheet_name: str = None,
     workers: int = 10,
+    list_name: str = None,
 ) -> dict:
     """
     Run pipeline with incremental saves after each enrichment.
@@ -114,13 +112,19 @@ def run_incremental_pipeline(
         spreadsheet, worksheet, is_new = get_or_create_sheet(sheet_url, sheet_name)
         results["sheet_url"] = spreadsheet.url
         print(f"Sheet URL: {spreadsheet.url}")
-        existing_ids = get_existing_lead_ids(worksheet)
-        print(f"Existing leads in sheet: {len(existing_ids)}")
     except Exception as e:
         results["errors"].append(f"Google Sheets error: {str(e)}")
         print(f"Error: {e}")
         return results
 
+    try:
+        list_name = open_lead_list(worksheet, spreadsheet, is_new, list_name)
+        print(f"Existing leads in lead store: {get_lead_store().count(list_name)}")
+    except Exception as e:
+        results["errors"].append(f"Lead store error: {str(e)}")
+        print(f"Error: {e}")
+        return results
+
     # Step 3: Enrich in parallel, save incrementally
     print(f"\n{'='*60}")
     print(f"STEP 3: Enriching & saving incrementally ({workers} workers)")
@@ -140,10 +144,13 @@ def run_incremental_pipeline(
                 lead = future.result()
                 all_leads.append(lead)
 
-                # Save immediately to sheet
-                if append_single_lead(worksheet, lead, existing_ids):
+                # Save immediately to the store; publish to the sheet in batches
+                if save_single_lead(list_name, lead):
                     added_count += 1
                     print(f"  ✓ Saved: {lead['business_name']} ({added_count} added)")
+                    if added_count % PUBLISH_EVERY == 0:
+                        with sheet_lock:
+                            publish_leads(worksheet, list_name)
                 else:
                     print(f"  - Skipped (duplicate): {lead['business_name']}")
 
@@ -152,6 +159,13 @@ def run_incremental_pipeline(
                 print(f"  ✗ Error: {task[0].get('title', 'Unknown')} - {e}")
                 results["errors"].append(str(e))
 
+    # Publish whatever the last batch left unsynced
+    try:
+        publish_leads(worksheet, list_name)
+    except Exception as e:
+        results["errors"].append(f"Google Sheets error: {str(e)}")
+        print(f"Error publishing to sheet (leads are kept in the lead store): {e}")
+
     # Save local backup
     with open(f".tmp/leads_enriched_{timestamp}.json", "w") as f:
         json.dump(all_leads, f, indent=2)
@@ -177,6 +191,7 @@ def main():
     parser.add_argument("--sheet-url", help="Existing sheet URL")
     parser.add_argument("--sheet-name", help="New sheet name")
     parser.add_argument("--workers", type=int, default=10, help="Parallel workers (default: 10)")
+    parser.add_argument("--list", help="Lead store list name (default: one list per spreadsheet)")
 
     args = parser.parse_args()
 
@@ -187,6 +202,7 @@ def main():
         sheet_url=args.sheet_url,
         sheet_name=args.sheet_name,
         workers=args.workers,
+        list_name=args.list,
     )
 
     if results["leads_added"] == 0 and results["errors"]:
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Shared Google credentials and API clients.
+
+Scripts used to reload token.json, refresh it, rewrite it and build a fresh
+gspread client or googleapiclient service on every call. This module keeps one
+credentials object per token source per process, refreshes it single-flight
+(one thread refreshes under a lock, the others wait and reuse the new token),
+and caches gspread clients, discovery documents and built services.
+
+Credential sources, in order:
+1. token_data dict (Modal GOOGLE_TOKEN_JSON secret, Instantly webhooks)
+2. token.json OAuth user token (rewritten only after a refresh)
+3. GOOGLE_APPLICATION_CREDENTIALS / service_account.json / credentials.json: a service account,
+   or an installed-app client secret that runs the browser flow once
+
+Usage:
+    from google_clients import get_gspread_client, get_service
+    gc = get_gspread_client()
+    sheets = get_service("sheets", "v4", token_data=token_data)
+
+    python3 execution/google_clients.py check
+"""
+
+import os
+import sys
+import json
+import argparse
+import threading
+import urllib.request
+from datetime import datetime, timedelta
+
+SCOPES = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive"
+]
+TOKEN_FILE = os.getenv("GOOGLE_TOKEN_FILE", "token.json")
+DISCOVERY_DIR = os.path.join(".tmp", "discovery")
+REFRESH_MARGIN = timedelta(minutes=5)  # Refresh early so long batches never hit a 401 mid-run
+
+DISCOVERY_URLS = [
+    "https://www.googleapis.com/discovery/v1/apis/{api}/{version}/rest",
+    "https://{api}.googleapis.com/$discovery/rest?version={version}",
+]
+
+_lock = threading.Lock()
+_entries = {}            # source key -> _CredentialEntry
+_gspread_clients = {}    # id(credentials) -> gspread.Client
+_discovery_docs = {}     # (api, version) -> parsed discovery document
+_local = threading.local()  # googleapiclient services use httplib2, which is not thread-safe
+
+
+def _needs_refresh(creds) -> bool:
+    if not creds.valid:
+        return True
+    expiry = getattr(creds, "expiry", None)
+    return expiry is not None and expiry - datetime.utcnow() < REFRESH_MARGIN
+
+
+def _write_token(path: str, content: str):
+    # Write-then-rename so a concurrent reader never sees a half-written token
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(content)
+    os.replace(tmp, path)
+
+
+class _CredentialEntry:
+    """One credentials object plus the lock that serializes its refreshes."""
+
+    def __init__(self, creds, source: str, token_file: str = None):
+        self.creds = creds
+        self.source = source
+        self.token_file = token_file
+        self.lock = threading.Lock()
+        self.refreshes = 0
+
+    def fresh(self):
+        if not _needs_refresh(self.creds):
+            return self.creds
+        with self.lock:
+            # Another thread may have refreshed while we waited for the lock
+            if _needs_refresh(self.creds):
+                from google.auth.transport.requests import Request
+                self.creds.refresh(Request())
+                self.refreshes += 1
+                if self.token_file:
+                    _write_token(self.token_file, self.creds.to_json())
+        return self.creds
+
+
+def _token_data_entry(token_data: dict) -> tuple:
+    key = ("token_data", token_data.get("client_id"), token_data.get("refresh_token"))
+    entry = _entries.get(key)
+    if entry is None:
+        from google.oauth2.credentials import Credentials
+        creds = Credentials(
+            token=token_data.get("token"),
+            refresh_token=token_data["refresh_token"],
+            token_uri=token_data["token_uri"],
+            client_id=token_data["client_id"],
+            client_secret=token_data["client_secret"],
+            scopes=token_data.get("scopes")
+        )
+        entry = _entries[key] = _CredentialEntry(creds, "token_data")
+    return key, entry
+
+
+def _token_file_entry(token_file: str, scopes: list) -> tuple:
+    key = ("token_file", os.path.abspath(token_file), tuple(scopes))
+    entry = _entries.get(key)
+    if entry is None and os.path.exists(token_file):
+        from google.oauth2.credentials import Credentials
+        try:
+            creds = Credentials.from_authorized_user_file(token_file, scopes)
+        except Exception as e:
+            print(f"Error loading {token_file}: {e}", file=sys.stderr)
+            return key, None
+        entry = _entries[key] = _CredentialEntry(creds, "token_file", token_file)
+    return key, entry
+
+
+def _service_account_entry(token_file: str, scopes: list) -> tuple:
+    service_account_file = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
+    if not service_account_file:
+        # Older scripts called the client secret credentials.json
+        service_account_file = next(
+            (f for f in ("service_account.json", "credentials.json") if os.path.exists(f)), "service_account.json"
+        )
+    key = ("service_account", os.path.abspath(service_account_file), tuple(scopes))
+    entry = _entries.get(key)
+    if entry is not None:
+        return key, entry
+    if not os.path.exists(service_account_file):
+        print(f"Error: Credentials file '{service_account_file}' not found.", file=sys.stderr)
+        return key, None
+
+    with open(service_account_file, "r") as f:
+        content = json.load(f)
+    if content.get("type") == "service_account":
+        from google.oauth2.service_account import Credentials as ServiceAccountCredentials
+        print("Using Service Account credentials...")
+        creds = ServiceAccountCredentials.from_service_account_file(service_account_file, scopes=scopes)
+        entry = _entries[key] = _CredentialEntry(creds, "service_account")
+    elif "installed" in content:
+        from google_auth_oauthlib.flow import InstalledAppFlow
+        print("Using OAuth 2.0 Client Credentials...")
+        flow = InstalledAppFlow.from_client_secrets_file(service_account_file, scopes)
+        creds = flow.run_local_server(port=0)
+        # Save the credentials for the next run; later calls use the token file entry
+        _write_token(token_file, creds.to_json())
+        key = ("token_file", os.path.abspath(token_file), tuple(scopes))
+        entry = _entries[key] = _CredentialEntry(creds, "token_file", token_file)
+    else:
+        print("Unknown credential type in JSON.", file=sys.stderr)
+    return key, entry
+
+
+def get_credentials(scopes: list = None, token_data: dict = None, token_file: str = None):
+    """
+    Return valid, cached credentials, or None if no source is configured.
+
+    token_data credentials keep the scopes they were issued with; scopes
+    applies to token.json and service account sources.
+    """
+    scopes = scopes or SCOPES
+    token_file = token_file or TOKEN_FILE
+
+    if token_data:
+        with _lock:
+            _, entry = _token_data_entry(token_data)
+        return entry.fresh()
+
+    with _lock:
+        key, entry = _token_file_entry(token_file, scopes)
+    if entry is not None:
+        try:
+            return entry.fresh()
+        except Exception as e:
+            print(f"Error refreshing token: {e}", file=sys.stderr)
+            with _lock:
+                _entries.pop(key, None)
+
+    # The browser flow also runs under the lock so concurrent callers share one login
+    with _lock:
+        _, entry = _service_account_entry(token_file, scopes)
+    return entry.fresh() if entry else None
+
+
+def get_gspread_client(scopes: list = None, token_data: dict = None, token_file: str = None,
+                       fallback_oauth: bool = False):
+    """
+    Return a cached gspread client for the configured credentials.
+
+    With fallback_oauth, scripts that used gspread.oauth() keep working when
+    neither token.json nor a service account is set up.
+    """
+    import gspread
+
+    creds = get_credentials(scopes, token_data, token_file)
+    if creds is None:
+        if not fallback_oauth:
+            raise RuntimeError("No Google credentials found (token.json or service account)")
+        key = "gspread.oauth"
+    else:
+        key = id(creds)
+
+    with _lock:
+        client = _gspread_clients.get(key)
+        if client is None:
+            client = gspread.oauth() if creds is None else gspread.authorize(creds)
+            _gspread_clients[key] = client
+    return client
+
+
+def get_discovery_document(api: str, version: str) -> dict:
+    """Discovery document from memory, .tmp/discovery, the googleapiclient bundle, or the network."""
+    doc_key = (api, version)
+    doc = _discovery_docs.get(doc_key)
+    if doc is not None:
+        return doc
+
+    path = os.path.join(DISCOVERY_DIR, f"{api}.{version}.json")
+    content = None
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            content = f.read()
+    if content is None:
+        try:
+            from googleapiclient.discovery_cache import get_static_doc
+            content = get_static_doc(api, version)
+        except ImportError:
+            content = None
+    if content is None:
+        for url in DISCOVERY_URLS:
+            try:
+                with urllib.request.urlopen(url.format(api=api, version=version), timeout=30) as response:
+                    content = response.read().decode("utf-8")
+                break
+            except Exception:
+                continue
+        if content is None:
+            raise RuntimeError(f"Could not load discovery document for {api} {version}")
+        try:
+            os.makedirs(DISCOVERY_DIR, exist_ok=True)
+            with open(path, "w") as f:
+                f.write(content)
+        except OSError:
+            pass  # Read-only filesystem; the in-memory copy still applies
+
+    doc = json.loads(content)
+    with _lock:
+        _discovery_docs[doc_key] = doc
+    return doc
+
+
+def get_service(api: str, version: str, scopes: list = None, token_data: dict = None, token_file: str = None):
+    """Return a googleapiclient service, built once per thread from a cached discovery document."""
+    from googleapiclient.discovery import build_from_document
+
+    creds = get_credentials(scopes, token_data, token_file)
+    if creds is None:
+        raise RuntimeError("No Google credentials found (token.json or service account)")
+
+    services = getattr(_local, "services", None)
+    if services is None:
+        services = _local.services = {}
+    key = (api, version, id(creds))
+    service = services.get(key)
+    if service is None:
+        service = build_from_document(get_discovery_document(api, version), credentials=creds)
+        services[key] = service
+    return service
+
+
+def stats() -> dict:
+    return {
+        "credentials": [
+            {"source": entry.source, "valid": entry.creds.valid, "refreshes": entry.refreshes,
+             "expiry": entry.creds.expiry.isoformat() if getattr(entry.creds, "expiry", None) else None}
+            for entry in _entries.values()
+        ],
+        "gspread_clients": len(_gspread_clients),
+        "discovery_documents": sorted(f"{api}.{version}" for api, version in _discovery_docs),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check shared Google credentials")
+    parser.add_argument("command", choices=["check"])
+    parser.add_argument("--token_file", default=TOKEN_FILE, help="OAuth token file")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    token_json = os.getenv("GOOGLE_TOKEN_JSON")
+    token_data = json.loads(token_json) if token_json and not os.path.exists(args.token_file) else None
+
+    creds = get_credentials(token_data=token_data, token_file=args.token_file)
+    if creds is None:
+        print("No Google credentials found")
+        sys.exit(1)
+    print(json.dumps(stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
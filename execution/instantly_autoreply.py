@@ -11,12 +11,14 @@ import os
 import json
 import logging
 import requests
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from google.auth.transport.requests import Request
 import google.generativeai as genai
 from dotenv import load_dotenv
 
+try:
+    from execution.google_clients import get_service
+except ImportError:
+    from google_clients import get_service
+
 # Load environment variables
 load_dotenv()
 
@@ -33,55 +35,56 @@ logger = logging.getLogger("instantly-autoreply")
 KB_SPREADSHEET_ID = "1QS7MYDm6RUTzzTWoMfX-0G9NzT5EoE2KiCE7iR1DBLM"
 
 
-def get_google_creds(token_data: dict) -> Credentials:
-    """Get Google credentials from token data."""
-    creds = Credentials(
-        token=token_data["token"],
-        refresh_token=token_data["refresh_token"],
-        token_uri=token_data["token_uri"],
-        client_id=token_data["client_id"],
-        client_secret=token_data["client_secret"],
-        scopes=token_data["scopes"]
-    )
-    if creds.expired:
-        creds.refresh(Request())
-    return creds
-
-
 def lookup_knowledge_base(campaign_id: str, token_data: dict) -> dict | None:
     """
     Look up knowledge base for a campaign ID.
     Returns {"knowledge_base": str, "reply_examples": str} or None if not found.
     """
-    creds = get_google_creds(token_data)
-    service = build("sheets", "v4", credentials=creds)
-
-    result = service.spreadsheets().values().get(
-        spreadsheetId=KB_SPREADSHEET_ID,
-        range="Sheet1!A:D"
-    ).execute()
+    service = get_service("sheets", "v4", token_data=token_data)
+    values = service.spreadsheets().values()
 
-    rows = result.get("values", [])
-    if len(rows) < 2:
+    # Header row first, then only the ID column, then only the matched rows' cells
+    header_rows = values.get(spreadsheetId=KB_SPREADSHEET_ID, range="Sheet1!A1:D1").execute().get("values", [])
+    if not header_rows:
         return None
 
     # Find header indices
-    headers = [h.lower() for h in rows[0]]
+    headers = [h.lower() for h in header_rows[0]]
     id_idx = headers.index("id") if "id" in headers else 0
     kb_idx = headers.index("knowledge base") if "knowledge base" in headers else 2
     examples_idx = headers.index("reply examples") if "reply examples" in headers else 3
 
-    # Search for matching campaign ID
-    for row in rows[1:]:
-        if len(row) > id_idx and row[id_idx] == campaign_id:
-            kb = row[kb_idx] if len(row) > kb_idx else ""
-            examples = row[examples_idx] if len(row) > examples_idx else ""
-            if kb:  # Only return if there's actual content
-                return {"knowledge_base": kb, "reply_examples": examples}
+    id_col = column_letter(id_idx)
+    ids = values.get(
+        spreadsheetId=KB_SPREADSHEET_ID, range=f"Sheet1!{id_col}2:{id_col}", majorDimension="COLUMNS"
+    ).execute().get("values", [[]])
+    matches = [i + 2 for i, value in enumerate(ids[0] if ids else []) if value == campaign_id]
+    if not matches:
+        return None
+
+    # Search matching rows for the first one with content
+    ranges = []
+    for row_num in matches:
+        ranges += [f"Sheet1!{column_letter(kb_idx)}{row_num}", f"Sheet1!{column_letter(examples_idx)}{row_num}"]
+    value_ranges = values.batchGet(spreadsheetId=KB_SPREADSHEET_ID, ranges=ranges).execute().get("valueRanges", [])
+    cells = [vr["values"][0][0] if vr.get("values") and vr["values"][0] else "" for vr in value_ranges]
+    for i in range(0, len(cells) - 1, 2):
+        kb, examples = cells[i], cells[i + 1]
+        if kb:  # Only return if there's actual content
+            return {"knowledge_base": kb, "reply_examples": examples}
 
     return None
 
 
+def column_letter(n):
+    """Convert column index (0-based) to Excel-style column letter (A, B, ... Z, AA, AB, ...)."""
+    result = ""
+    while n >= 0:
+        result = chr(65 + (n % 26)) + result
+        n = n // 26 - 1
+    return result
+
+
 def get_conversation_history(lead_email: str, limit: int = 10) -> list:
     """Get email conversation history from Instantly."""
     api_key = os.getenv("INSTANTLY_API_KEY")
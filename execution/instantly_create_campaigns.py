@@ -13,7 +13,11 @@ Usage:
         --client_description "Description..." \
         --offers "Offer1|Offer2|Offer3" \
         --target_audience "Who we're targeting" \
-        --social_proof "Credentials to mention"
+        --social_proof "Credentials to mention" \
+        --leads_file .tmp/leads_enriched.json
+
+Leads in --leads_file are checked against the local suppression store
+(execution/suppression_store.py) before upload, and recorded there afterwards.
 """
 
 import os
@@ -29,6 +33,8 @@ import requests
 import google.generativeai as genai
 from dotenv import load_dotenv
 
+from suppression_store import get_store, normalize_email
+
 # Load environment variables
 load_dotenv()
 
@@ -239,6 +245,69 @@ def create_campaign_in_instantly(campaign_data: dict) -> dict:
         return {"error": str(e)}
 
 
+def lead_to_instantly_payload(lead: dict, campaign_id: str) -> dict:
+    """Map a scraped/enriched lead record to an Instantly v2 lead."""
+    payload = {
+        "campaign": campaign_id,
+        "email": normalize_email(lead.get("email") or lead.get("owner_email")),
+        "first_name": lead.get("casual_first_name") or lead.get("first_name", ""),
+        "last_name": lead.get("last_name", ""),
+        "company_name": lead.get("casual_company_name") or lead.get("company_name") or lead.get("business_name", ""),
+        "website": lead.get("website") or lead.get("company_domain", ""),
+    }
+    if lead.get("icebreaker"):
+        payload["personalization"] = lead["icebreaker"]
+    return payload
+
+
+def upload_leads_to_campaign(campaign_id: str, leads: list[dict]) -> dict:
+    """
+    Upload leads to an Instantly campaign, skipping anything in the suppression store.
+    Every successfully uploaded address and its company domain are added to the store, so
+    the lead is never sent twice and enrichment skips companies already contacted.
+    """
+    api_key = os.getenv("INSTANTLY_API_KEY")
+    if not api_key:
+        return {"error": "INSTANTLY_API_KEY not configured in .env"}
+
+    store = get_store()
+    payloads = [lead_to_instantly_payload(lead, campaign_id) for lead in leads]
+    payloads = [p for p in payloads if p["email"]]
+    to_upload, suppressed = store.filter_records(payloads, email_key="email", domain_key="website")
+    if suppressed:
+        logger.info(f"Skipping {len(suppressed)} suppressed leads for campaign {campaign_id}")
+
+    url = f"{INSTANTLY_API_BASE}/leads"
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json"
+    }
+
+    uploaded = []
+    errors = 0
+    for payload in to_upload:
+        try:
+            response = requests.post(url, headers=headers, json=payload, timeout=30)
+            if response.status_code == 429:
+                logger.warning("Rate limited, waiting 30 seconds...")
+                time.sleep(30)
+                response = requests.post(url, headers=headers, json=payload, timeout=30)
+            if response.status_code in [200, 201]:
+                uploaded.append(payload)
+            else:
+                logger.error(f"Lead upload failed for {payload['email']}: {response.status_code} - {response.text[:200]}")
+                errors += 1
+        except Exception as e:
+            logger.error(f"Lead upload failed for {payload['email']}: {e}")
+            errors += 1
+
+    # Domains too: enrichment runs before a row has an email, so it can only match on domain
+    store.add_records(uploaded, source=f"instantly:{campaign_id}", include_domains=True)
+    store.save()
+
+    return {"uploaded": len(uploaded), "suppressed": len(suppressed), "errors": errors}
+
+
 def generate_offers_if_missing(client_name: str, client_description: str) -> list[str]:
     """Generate 3 offers if none provided."""
     if not GEMINI_API_KEY:
@@ -290,6 +359,7 @@ def main():
     parser.add_argument("--target_audience", default="Business owners and decision makers", help="Target audience description")
     parser.add_argument("--social_proof", default="", help="Credentials and social proof to include")
     parser.add_argument("--dry_run", action="store_true", help="Generate campaigns without creating in Instantly")
+    parser.add_argument("--leads_file", help="JSON list of leads to split across the created campaigns")
 
     args = parser.parse_args()
 
@@ -371,6 +441,16 @@ def main():
     if errors:
         output["errors"] = errors
 
+    # Split leads evenly across the new campaigns (one offer per campaign)
+    if args.leads_file and campaign_ids:
+        with open(args.leads_file, "r") as f:
+            leads = json.load(f)
+        output["lead_uploads"] = {}
+        for i, campaign_id in enumerate(campaign_ids):
+            output["lead_uploads"][campaign_id] = upload_leads_to_campaign(
+                campaign_id, leads[i::len(campaign_ids)]
+            )
+
     print(json.dumps(output, indent=2))
 
 
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Job records for background work: IDs, status, per-stage progress, cancel and retry.
+
+Background pipelines (lead scraping, YouTube outliers, async directive runs)
+were spawned fire-and-forget; the only progress report was Slack. A job
+record gives callers something to poll:
+- create() hands back a job ID before the work is spawned
+- the worker reports each stage through JobContext.stage(), with optional
+  partial results, and finishes with succeeded / failed / cancelled
+- cancel() only sets a separate flag, which the worker checks at stage
+  boundaries (a queued job reads as cancelled straight away)
+- retry() re-queues a finished job with its stored parameters
+- list() reads a capped index of recent job IDs per kind, never the whole
+  backend; jobs that fall off the index, or finished more than
+  RETENTION_DAYS ago, are deleted
+- a running job with no progress for STALE_MINUTES (its worker crashed or hit
+  the function timeout), or a job still queued after QUEUED_STALE_HOURS, is
+  marked failed (cancelled, if a cancel was asked for) the next time it is read
+
+Records live in any dict-like backend with get / [key] = value / pop:
+a modal.Dict shared by all containers in the deployment, or SqliteDict
+(.tmp/jobs.db) when running locally. Only the job's worker writes its record
+while it runs; the cancel flag and the Modal call ID are stored under their
+own keys, so an API call never races the worker's read-modify-write.
+
+Job statuses: queued -> running -> succeeded | failed | cancelled
+(get() reports "cancelling" while a running job hasn't stopped yet). Status
+only moves forward and a finished record is not changed until retry().
+
+Usage:
+    from job_store import JobStore, JobContext, JobCancelled
+    store = JobStore(modal.Dict.from_name("zeniac-jobs", create_if_missing=True))
+    job_id = store.create("scrape_leads", {"query": "dentists"})["id"]
+
+    job = JobContext(store, job_id)          # in the worker
+    job.start()
+    job.stage("scrape", 1, 4)                # raises JobCancelled if cancelled
+    job.partial("scrape", {"leads_found": 120})
+    job.finish({"status": "success"})
+
+    python3 execution/job_store.py list
+    python3 execution/job_store.py show JOB_ID
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import sqlite3
+import argparse
+import threading
+from typing import Any, Dict, List, Optional
+
+JOBS_PATH = os.getenv("JOBS_PATH", os.path.join(".tmp", "jobs.db"))
+TERMINAL = {"succeeded", "failed", "cancelled"}
+STATUS_ORDER = {"queued": 0, "running": 1, "succeeded": 2, "failed": 2, "cancelled": 2}
+INDEX_SIZE = int(os.getenv("JOBS_INDEX_SIZE", "200"))            # Recent job IDs kept per kind
+RETENTION_DAYS = float(os.getenv("JOBS_RETENTION_DAYS", "14"))   # Finished jobs older than this are deleted
+STALE_MINUTES = float(os.getenv("JOBS_STALE_MINUTES", "60"))     # Background functions time out at 30 min
+QUEUED_STALE_HOURS = float(os.getenv("JOBS_QUEUED_STALE_HOURS", "24"))
+
+
+class JobCancelled(Exception):
+    """Raised in a worker when its job was cancelled."""
+
+
+class SqliteDict:
+    """Local stand-in for modal.Dict: JSON values in a SQLite key/value table."""
+
+    def __init__(self, path: str = JOBS_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self.db.commit()
+
+    def get(self, key: str, default=None):
+        row = self.db.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def __setitem__(self, key: str, value):
+        with self._lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)", (key, json.dumps(value, default=str)))
+
+    def pop(self, key: str, default=None):
+        value = self.get(key, default)
+        with self._lock, self.db:
+            self.db.execute("DELETE FROM kv WHERE key = ?", (key,))
+        return value
+
+    def keys(self):
+        return [row[0] for row in self.db.execute("SELECT key FROM kv")]
+
+
+class JobStore:
+    """Job records in a dict-like backend (modal.Dict in production, SqliteDict locally)."""
+
+    def __init__(self, backend=None):
+        self.backend = backend if backend is not None else SqliteDict()
+
+    def create(self, kind: str, params: dict) -> dict:
+        job_id = uuid.uuid4().hex[:12]
+        record = {
+            "id": job_id,
+            "kind": kind,
+            "status": "queued",
+            "params": params,
+            "attempts": 0,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "progress": None,   # {"stage", "step", "total", "message", "at"}
+            "stages": {},       # stage -> {"step", "result", "at"}, the partial results so far
+            "result": None,
+            "error": None,
+        }
+        self.backend[f"job:{job_id}"] = record
+        self._index(kind, job_id, record["created_at"])
+        return record
+
+    def _index(self, kind: str, job_id: str, created_at: float):
+        """
+        Add a job to its kind's index ([[id, created_at]], newest last), dropping the oldest beyond INDEX_SIZE.
+
+        Dropped jobs are deleted unless still queued or running (those stay indexed).
+        Two containers creating jobs of one kind at the same moment can lose one
+        index entry; the job itself still runs and is reachable by ID.
+        """
+        kinds = self.backend.get("kinds") or []
+        if kind not in kinds:
+            self.backend["kinds"] = kinds + [kind]
+        entries = (self.backend.get(f"index:{kind}") or []) + [[job_id, created_at]]
+        kept = entries[-INDEX_SIZE:]
+        for old_id, old_created in entries[:-INDEX_SIZE]:
+            record = self.get(old_id)
+            if record and record["status"] not in TERMINAL:
+                kept.insert(0, [old_id, old_created])
+            else:
+                self._delete(old_id)
+        self.backend[f"index:{kind}"] = kept
+
+    def _delete(self, job_id: str):
+        for prefix in ("job", "cancel", "call"):
+            self.backend.pop(f"{prefix}:{job_id}", None)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        record = self.backend.get(f"job:{job_id}")
+        if record is None:
+            return None
+        if record["status"] not in TERMINAL and self._is_stale(record):
+            record = self._reap(record)
+        if record["status"] not in TERMINAL and self.backend.get(f"cancel:{job_id}"):
+            record["status"] = "cancelled" if record["status"] == "queued" else "cancelling"
+        return record
+
+    def _is_stale(self, record: dict) -> bool:
+        now = time.time()
+        if record["status"] == "queued":
+            return now - record["created_at"] > QUEUED_STALE_HOURS * 3600
+        activity = [record["created_at"], record.get("started_at") or 0, (record.get("progress") or {}).get("at") or 0]
+        activity += [stage.get("at") or 0 for stage in (record.get("stages") or {}).values()]
+        return now - max(activity) > STALE_MINUTES * 60
+
+    def _reap(self, record: dict) -> dict:
+        """Finish a job whose worker is gone; a late write from it is then ignored, like any after a finish."""
+        if self.backend.get(f"cancel:{record['id']}"):
+            fields = {"status": "cancelled"}
+        else:
+            error = ("Never picked up by a worker" if record["status"] == "queued"
+                     else "Worker stopped reporting progress (crashed or timed out)")
+            fields = {"status": "failed", "error": error}
+        return self.update(record["id"], finished_at=time.time(), **fields) or record
+
+    def update(self, job_id: str, **fields) -> Optional[dict]:
+        """
+        Merge `fields` into the record (only the job's own worker calls this while it runs).
+
+        A finished record is returned unchanged, and a status that would move
+        backwards (e.g. a late "running" after "failed") is ignored.
+        """
+        record = self.backend.get(f"job:{job_id}")
+        if record is None or record["status"] in TERMINAL:
+            return record
+        status = fields.get("status")
+        if status and STATUS_ORDER[status] < STATUS_ORDER[record["status"]]:
+            fields.pop("status")
+        record.update(fields)
+        self.backend[f"job:{job_id}"] = record
+        return record
+
+    def set_call_id(self, job_id: str, call_id: str):
+        self.backend[f"call:{job_id}"] = call_id
+
+    def call_id(self, job_id: str) -> Optional[str]:
+        return self.backend.get(f"call:{job_id}")
+
+    def cancel(self, job_id: str) -> Optional[dict]:
+        """Ask the job to stop; returns the record as it now reads, or None if unknown."""
+        record = self.get(job_id)
+        if record is None or record["status"] in TERMINAL:
+            return record
+        # Only the flag: the worker records the cancelled status itself (a queued job
+        # reads as cancelled from the flag, and exits in start() if it is picked up)
+        self.backend[f"cancel:{job_id}"] = time.time()
+        return self.get(job_id)
+
+    def is_cancelled(self, job_id: str) -> bool:
+        return bool(self.backend.get(f"cancel:{job_id}"))
+
+    def retry(self, job_id: str) -> Optional[dict]:
+        """Re-queue a finished job with the same parameters; returns None if it isn't finished."""
+        record = self.get(job_id)
+        if record is None or record["status"] not in TERMINAL:
+            return None
+        self.backend.pop(f"cancel:{job_id}", None)
+        self.backend.pop(f"call:{job_id}", None)
+        record.update(status="queued", started_at=None, finished_at=None,
+                      progress=None, stages={}, result=None, error=None)
+        self.backend[f"job:{job_id}"] = record
+        return record
+
+    def list(self, kind: str = None, limit: int = 20) -> List[dict]:
+        """Most recent jobs first, without their partial results; prunes finished jobs past retention."""
+        kinds = [kind] if kind else self.backend.get("kinds") or []
+        entries = []
+        for name in kinds:
+            entries.extend((created_at, job_id, name) for job_id, created_at in self.backend.get(f"index:{name}") or [])
+        entries.sort(reverse=True)
+
+        cutoff = time.time() - RETENTION_DAYS * 86400
+        records, expired = [], []
+        for created_at, job_id, name in entries:
+            if len(records) >= limit:
+                break
+            record = self.get(job_id)
+            if record is None or (record["status"] in TERMINAL and
+                                  (record.get("finished_at") or record["created_at"]) < cutoff):
+                expired.append((name, job_id))
+                continue
+            records.append({k: record[k] for k in ("id", "kind", "status", "attempts", "created_at",
+                                                    "finished_at", "progress", "error")})
+        if expired:
+            self._expire(expired)
+        return records
+
+    def _expire(self, jobs: List[tuple]):
+        """Delete (kind, job_id) pairs and drop them from their indexes."""
+        by_kind: Dict[str, set] = {}
+        for kind, job_id in jobs:
+            self._delete(job_id)
+            by_kind.setdefault(kind, set()).add(job_id)
+        for kind, job_ids in by_kind.items():
+            entries = self.backend.get(f"index:{kind}") or []
+            self.backend[f"index:{kind}"] = [e for e in entries if e[0] not in job_ids]
+
+
+class JobContext:
+    """A worker's handle on its job. With job_id=None every call is a no-op, so workers run without one too."""
+
+    def __init__(self, store: JobStore, job_id: str = None):
+        self.store = store
+        self.job_id = job_id
+        self._stages: Dict[str, dict] = {}
+
+    def start(self):
+        if not self.job_id:
+            return
+        self.check_cancelled()
+        record = self.store.get(self.job_id) or {}
+        self.store.update(self.job_id, status="running", started_at=time.time(),
+                          attempts=record.get("attempts", 0) + 1)
+
+    def check_cancelled(self):
+        if self.job_id and self.store.is_cancelled(self.job_id):
+            raise JobCancelled(f"Job {self.job_id} was cancelled")
+
+    def stage(self, name: str, step: int = None, total: int = None, message: str = None):
+        """Record that the job reached a stage; raises JobCancelled if the job was cancelled."""
+        if not self.job_id:
+            return
+        self.check_cancelled()
+        now = time.time()
+        self._stages.setdefault(name, {}).update({"step": step, "at": now})
+        self.store.update(self.job_id, stages=self._stages,
+                          progress={"stage": name, "step": step, "total": total, "message": message, "at": now})
+
+    def partial(self, name: str, result: Any):
+        """Attach a stage's partial result (e.g. rows scraped) once it is known."""
+        if not self.job_id:
+            return
+        self._stages.setdefault(name, {}).update({"result": result, "at": time.time()})
+        self.store.update(self.job_id, stages=self._stages)
+
+    def finish(self, result: dict):
+        if self.job_id:
+            status = "failed" if isinstance(result, dict) and result.get("status") == "error" else "succeeded"
+            self.store.update(self.job_id, status=status, result=result, finished_at=time.time(),
+                              error=result.get("error") if status == "failed" else None)
+
+    def fail(self, error: str):
+        if self.job_id:
+            self.store.update(self.job_id, status="failed", error=error, finished_at=time.time())
+
+    def cancelled(self):
+        if self.job_id:
+            self.store.update(self.job_id, status="cancelled", finished_at=time.time())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect local job records (.tmp/jobs.db)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    ls = sub.add_parser("list", help="Recent jobs")
+    ls.add_argument("--kind", help="Only jobs of this kind")
+    ls.add_argument("--limit", type=int, default=20)
+    show = sub.add_parser("show", help="One job with its stages")
+    show.add_argument("job_id")
+    cancel = sub.add_parser("cancel", help="Ask a job to stop")
+    cancel.add_argument("job_id")
+    args = parser.parse_args()
+
+    store = JobStore()
+    if args.command == "list":
+        print(json.dumps(store.list(args.kind, args.limit), indent=2, default=str))
+        return 0
+    record = store.get(args.job_id) if args.command == "show" else store.cancel(args.job_id)
+    if record is None:
+        print(f"Error: job {args.job_id} not found", file=sys.stderr)
+        return 1
+    print(json.dumps(record, indent=2, default=str))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,513 @@
+#!/usr/bin/env python3
+"""
+Local lead store: the system of record for lead lists.
+
+Every lead lives in one SQLite file (.tmp/leads.db) as a JSON record keyed by
+(list, lead key), with email and domain pulled out into indexed columns.
+Pipelines read and write leads here; stage-to-stage handoffs ("leads still
+missing an email", "leads not yet casualized") are local queries instead of
+full sheet downloads, and list size is no longer capped by the Sheets
+10M-cell limit or write quota.
+
+Google Sheets is a published view: `publish` pushes a list to a worksheet
+with a row-hash delta sync (sheet_sync.py), so only changed cells are
+written, and `pull` imports edits made in the sheet back into the store.
+
+Usage:
+    from lead_store import get_lead_store
+    store = get_lead_store()
+    store.upsert("dentists-miami", leads, key_column="lead_id")
+    for key, lead in store.iter_leads("dentists-miami", missing=["email"]):
+        ...
+    store.update("dentists-miami", {key: {"email": "..."}})
+    store.publish("dentists-miami", worksheet)
+
+    python3 execution/lead_store.py import leads.json --list dentists-miami --key lead_id
+    python3 execution/lead_store.py import .tmp/leads_*.json --list plumbers-ny   # Apify leads, keyed for you
+    python3 execution/lead_store.py pull --list dentists-miami --url SHEET_URL --key lead_id
+    python3 execution/lead_store.py publish --list dentists-miami --url SHEET_URL
+    python3 execution/lead_store.py export --list dentists-miami --output .tmp/dentists.json
+    python3 execution/lead_store.py normalize --list dentists-miami   # lists saved before FIELD_ALIASES
+    python3 execution/lead_store.py stats
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    from execution.suppression_store import is_shared_host
+except ImportError:
+    from suppression_store import is_shared_host
+
+LEAD_STORE_PATH = os.getenv("LEAD_STORE_PATH", os.path.join(".tmp", "leads.db"))
+EMAIL_FIELDS = ("email", "owner_email", "emails")
+DOMAIN_FIELDS = ("company_domain", "domain", "website")
+
+# Standard field -> the names other sources use for it (Google Maps leads carry
+# emails / owner_name / business_name / website). upsert and update fill the
+# standard field from these when it is empty, so every stage queries one schema.
+FIELD_ALIASES = {
+    "email": ("owner_email", "emails", "contact_email"),
+    "company_name": ("business_name", "companyName"),
+    "full_name": ("owner_name", "contact_name"),
+    "company_domain": ("website", "company_website", "domain"),
+}
+NAME_TITLES = {"dr", "mr", "mrs", "ms", "miss", "prof"}
+
+
+def _is_empty(value) -> bool:
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _first_present(record: dict, fields) -> str:
+    for name in fields:
+        value = record.get(name)
+        if not _is_empty(value):
+            return str(value)
+    return ""
+
+
+def _index_email(record: dict) -> str:
+    # "emails" may hold a comma-separated list; index the first address
+    return _first_present(record, EMAIL_FIELDS).split(",")[0].strip().lower()
+
+
+def _index_domain(record: dict) -> str:
+    # A Facebook page or Yelp listing is not the company's domain; use the next field, or none
+    for name in DOMAIN_FIELDS:
+        value = record.get(name)
+        if _is_empty(value):
+            continue
+        value = str(value).lower().replace("https://", "").replace("http://", "").replace("www.", "")
+        host = value.split("/")[0].strip()
+        if host and not is_shared_host(host):
+            return host
+    return ""
+
+
+def normalize_lead(record: dict) -> dict:
+    """A copy of `record` with empty standard fields filled from their aliases (never overwrites)."""
+    lead = dict(record)
+    derived_domain = _is_empty(lead.get("company_domain"))
+    for field, aliases in FIELD_ALIASES.items():
+        if _is_empty(lead.get(field)):
+            value = _first_present(lead, aliases)
+            if value:
+                lead[field] = value
+    # A comma-separated "emails" cell keeps its first address; a website becomes its bare domain
+    if "," in str(lead.get("email") or ""):
+        lead["email"] = str(lead["email"]).split(",")[0].strip()
+    if not _is_empty(lead.get("company_domain")):
+        domain = _index_domain(lead)
+        if domain:
+            lead["company_domain"] = domain
+        elif derived_domain:
+            del lead["company_domain"]  # Only a social or directory page to derive it from
+    if _is_empty(lead.get("first_name")) and not _is_empty(lead.get("full_name")):
+        words = [w for w in str(lead["full_name"]).split() if w.lower().rstrip(".") not in NAME_TITLES]
+        if words:
+            lead["first_name"] = words[0]
+            if len(words) > 1 and _is_empty(lead.get("last_name")):
+                lead["last_name"] = words[-1]
+    return lead
+
+
+def assign_lead_ids(records: List[dict]) -> List[dict]:
+    """Copies of scraped records with a stable "lead_id": kept if set, else the email or a hash of the lead."""
+    try:
+        from execution.supabase_sink import lead_key
+    except ImportError:
+        from supabase_sink import lead_key
+    return [record if record.get("lead_id") else {**record, "lead_id": lead_key(normalize_lead(record))}
+            for record in records]
+
+
+class LeadStore:
+    """Named lead lists in SQLite, each with a key column and an ordered field list."""
+
+    def __init__(self, path: str = LEAD_STORE_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS lead_lists ("
+            " name TEXT PRIMARY KEY,"
+            " key_column TEXT NOT NULL,"
+            " columns TEXT NOT NULL,"
+            " created_at REAL,"
+            " updated_at REAL"
+            ")"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS leads ("
+            " list TEXT NOT NULL,"
+            " lead_key TEXT NOT NULL,"
+            " position INTEGER NOT NULL,"
+            " data TEXT NOT NULL,"
+            " email TEXT,"
+            " domain TEXT,"
+            " updated_at REAL,"
+            " PRIMARY KEY (list, lead_key)"
+            ") WITHOUT ROWID"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS leads_position ON leads (list, position)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS leads_email ON leads (email)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS leads_domain ON leads (domain)")
+        self.db.commit()
+
+    # ------------------------------------------------------------------ lists
+
+    def get_list(self, name: str) -> Optional[dict]:
+        row = self.db.execute(
+            "SELECT key_column, columns, created_at, updated_at FROM lead_lists WHERE name = ?", (name,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"name": name, "key_column": row[0], "columns": json.loads(row[1]),
+                "created_at": row[2], "updated_at": row[3]}
+
+    def lists(self) -> List[str]:
+        return [row[0] for row in self.db.execute("SELECT name FROM lead_lists ORDER BY name")]
+
+    def _require_list(self, name: str) -> dict:
+        info = self.get_list(name)
+        if info is None:
+            raise KeyError(f"No lead list named {name!r}")
+        return info
+
+    @staticmethod
+    def _key(record: dict, key_column: str) -> str:
+        return str(record.get(key_column, "")).strip().lower()
+
+    # ----------------------------------------------------------------- writes
+
+    def upsert(self, name: str, records: List[dict], key_column: str = None, overwrite: bool = False) -> dict:
+        """
+        Insert new leads and merge fields into existing ones, in one transaction.
+
+        Existing non-empty values are kept unless overwrite is set, so re-importing
+        a scrape never wipes enrichment done since. The list is created on first
+        use with key_column (required then). Records without a key are skipped.
+        Standard fields are filled from source-specific names (see normalize_lead).
+
+        Returns {'inserted', 'updated', 'unchanged', 'skipped', 'inserted_keys'}.
+        """
+        now = time.time()
+        with self._lock, self.db:
+            info = self.get_list(name)
+            if info is None:
+                if not key_column:
+                    raise ValueError(f"Lead list {name!r} does not exist; pass key_column to create it")
+                info = {"key_column": key_column, "columns": []}
+                self.db.execute(
+                    "INSERT INTO lead_lists (name, key_column, columns, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                    (name, key_column, "[]", now, now)
+                )
+            elif key_column and key_column != info["key_column"]:
+                raise ValueError(f"Lead list {name!r} is keyed by {info['key_column']!r}, not {key_column!r}")
+            key_column = info["key_column"]
+            columns = list(info["columns"])
+            known = set(columns)
+
+            by_key = {}
+            skipped = 0
+            for record in records:
+                record = normalize_lead(record)
+                key = self._key(record, key_column)
+                if not key:
+                    skipped += 1
+                    continue
+                for field in record:
+                    if field not in known:
+                        known.add(field)
+                        columns.append(field)
+                by_key.setdefault(key, {}).update(record)
+
+            existing = self._fetch(name, list(by_key))
+            position = self.db.execute(
+                "SELECT COALESCE(MAX(position), -1) + 1 FROM leads WHERE list = ?", (name,)
+            ).fetchone()[0]
+
+            inserts, updates, inserted_keys, unchanged = [], [], [], 0
+            for key, record in by_key.items():
+                current = existing.get(key)
+                if current is None:
+                    inserts.append((name, key, position, json.dumps(record, ensure_ascii=False),
+                                    _index_email(record), _index_domain(record), now))
+                    inserted_keys.append(key)
+                    position += 1
+                    continue
+                merged = dict(current)
+                for field, value in record.items():
+                    if overwrite or field not in merged or (_is_empty(merged[field]) and not _is_empty(value)):
+                        merged[field] = value
+                if merged == current:
+                    unchanged += 1
+                    continue
+                updates.append((json.dumps(merged, ensure_ascii=False), _index_email(merged),
+                                _index_domain(merged), now, name, key))
+
+            self.db.executemany(
+                "INSERT INTO leads (list, lead_key, position, data, email, domain, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)", inserts
+            )
+            self.db.executemany(
+                "UPDATE leads SET data = ?, email = ?, domain = ?, updated_at = ? WHERE list = ? AND lead_key = ?",
+                updates
+            )
+            self.db.execute(
+                "UPDATE lead_lists SET columns = ?, updated_at = ? WHERE name = ?",
+                (json.dumps(columns), now, name)
+            )
+        return {"inserted": len(inserts), "updated": len(updates), "unchanged": unchanged,
+                "skipped": skipped, "inserted_keys": inserted_keys}
+
+    def import_records(self, name: str, records: List[dict], key_column: str = None, overwrite: bool = False) -> dict:
+        """upsert for scraped records: keyed by key_column, the list's key, or a lead_id assigned here."""
+        key_column = key_column or (self.get_list(name) or {}).get("key_column") or "lead_id"
+        if key_column == "lead_id":
+            records = assign_lead_ids(records)
+        return self.upsert(name, records, key_column=key_column, overwrite=overwrite)
+
+    def update(self, name: str, fields_by_key: Dict[str, dict]) -> int:
+        """Set fields on existing leads (stage outputs such as emails or casual names). Returns leads changed."""
+        now = time.time()
+        with self._lock, self.db:
+            info = self._require_list(name)
+            columns, known = list(info["columns"]), set(info["columns"])
+            existing = self._fetch(name, [str(k).strip().lower() for k in fields_by_key])
+            rows = []
+            for key, fields in fields_by_key.items():
+                key = str(key).strip().lower()
+                current = existing.get(key)
+                if current is None:
+                    continue
+                merged = normalize_lead({**current, **fields})
+                if merged == current:
+                    continue
+                for field in merged:
+                    if field not in known:
+                        known.add(field)
+                        columns.append(field)
+                rows.append((json.dumps(merged, ensure_ascii=False), _index_email(merged),
+                             _index_domain(merged), now, name, key))
+            self.db.executemany(
+                "UPDATE leads SET data = ?, email = ?, domain = ?, updated_at = ? WHERE list = ? AND lead_key = ?",
+                rows
+            )
+            self.db.execute(
+                "UPDATE lead_lists SET columns = ?, updated_at = ? WHERE name = ?",
+                (json.dumps(columns), now, name)
+            )
+        return len(rows)
+
+    def normalize(self, name: str) -> int:
+        """Fill standard fields on leads saved before they were normalized. Returns leads changed."""
+        return self.update(name, {key: {} for key in self.keys(name)})
+
+    def delete_list(self, name: str) -> int:
+        with self._lock, self.db:
+            count = self.db.execute("DELETE FROM leads WHERE list = ?", (name,)).rowcount
+            self.db.execute("DELETE FROM lead_lists WHERE name = ?", (name,))
+        return count
+
+    # ------------------------------------------------------------------ reads
+
+    def _fetch(self, name: str, keys: List[str]) -> Dict[str, dict]:
+        found = {}
+        for i in range(0, len(keys), 500):  # Stay under SQLite's bound-parameter limit
+            chunk = keys[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            for key, data in self.db.execute(
+                f"SELECT lead_key, data FROM leads WHERE list = ? AND lead_key IN ({placeholders})", [name] + chunk
+            ):
+                found[key] = json.loads(data)
+        return found
+
+    def get(self, name: str, key: str) -> Optional[dict]:
+        return self._fetch(name, [str(key).strip().lower()]).get(str(key).strip().lower())
+
+    def keys(self, name: str) -> set:
+        return {row[0] for row in self.db.execute("SELECT lead_key FROM leads WHERE list = ?", (name,))}
+
+    def count(self, name: str) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM leads WHERE list = ?", (name,)).fetchone()[0]
+
+    def iter_leads(self, name: str, missing: List[str] = None, present: List[str] = None,
+                   fields: List[str] = None) -> Iterator[Tuple[str, dict]]:
+        """
+        Yield (lead_key, record) in insertion order.
+
+        Args:
+            missing: Only leads where all of these fields are empty
+            present: Only leads where all of these fields are non-empty
+            fields: Project each record down to these fields
+        """
+        sql = "SELECT lead_key, data FROM leads WHERE list = ?"
+        params = [name]
+        # Filters run inside SQLite via JSON1, so a handoff query never loads unrelated leads
+        for field in missing or []:
+            sql += " AND COALESCE(TRIM(CAST(json_extract(data, ?) AS TEXT)), '') = ''"
+            params.append(f'$."{field}"')
+        for field in present or []:
+            sql += " AND COALESCE(TRIM(CAST(json_extract(data, ?) AS TEXT)), '') != ''"
+            params.append(f'$."{field}"')
+        sql += " ORDER BY position"
+        for key, data in self.db.execute(sql, params):
+            record = json.loads(data)
+            if fields:
+                record = {f: record.get(f, "") for f in fields}
+            yield key, record
+
+    def records(self, name: str) -> List[dict]:
+        """Every lead in the list with every known column, in insertion order."""
+        columns = self._require_list(name)["columns"]
+        return [{c: record.get(c, "") for c in columns} for _, record in self.iter_leads(name)]
+
+    def find(self, email: str = None, domain: str = None) -> List[Tuple[str, str, dict]]:
+        """Look up leads across every list by email or domain: [(list, lead_key, record)]."""
+        if email:
+            rows = self.db.execute("SELECT list, lead_key, data FROM leads WHERE email = ?", (email.strip().lower(),))
+        elif domain:
+            rows = self.db.execute("SELECT list, lead_key, data FROM leads WHERE domain = ?", (domain.strip().lower(),))
+        else:
+            return []
+        return [(list_name, key, json.loads(data)) for list_name, key, data in rows]
+
+    # ---------------------------------------------------------------- sheets
+
+    def publish(self, name: str, worksheet, clear_missing: bool = False, dry_run: bool = False, log=print) -> dict:
+        """Push a list to a worksheet, writing only cells that changed since the last publish."""
+        try:
+            from execution.sheet_sync import SheetSync
+        except ImportError:
+            from sheet_sync import SheetSync
+
+        info = self._require_list(name)
+        # Only fields the lead has, so values filled in on the sheet aren't blanked
+        records = [{c: record[c] for c in info["columns"] if c in record} for _, record in self.iter_leads(name)]
+        syncer = SheetSync(worksheet, key_column=info["key_column"], log=log)
+        try:
+            return syncer.sync(records, clear_missing=clear_missing, dry_run=dry_run)
+        finally:
+            syncer.close()
+
+    def pull(self, name: str, worksheet, key_column: str = None, overwrite: bool = True) -> dict:
+        """Import a worksheet into a list; by default sheet values win, so manual edits are kept."""
+        try:
+            from execution.sheet_reader import iter_records
+        except ImportError:
+            from sheet_reader import iter_records
+
+        records = list(iter_records(worksheet))
+        return self.upsert(name, records, key_column=key_column, overwrite=overwrite)
+
+    def export_json(self, name: str, path: str) -> int:
+        records = self.records(name)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(records, f, indent=2, ensure_ascii=False)
+        return len(records)
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "lists": {
+                name: {"key_column": key_column, "columns": len(json.loads(columns)), "leads": count,
+                       "updated_at": updated_at}
+                for name, key_column, columns, updated_at, count in self.db.execute(
+                    "SELECT l.name, l.key_column, l.columns, l.updated_at, COUNT(d.lead_key) FROM lead_lists l"
+                    " LEFT JOIN leads d ON d.list = l.name GROUP BY l.name ORDER BY l.name"
+                )
+            },
+        }
+
+    def close(self):
+        self.db.close()
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_lead_store() -> LeadStore:
+    """Process-wide store shared by the lead pipelines."""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = LeadStore()
+        return _default_store
+
+
+def _open_worksheet(url: str, worksheet_name: str = None):
+    from google_clients import get_gspread_client
+    from read_sheet import extract_sheet_id
+
+    spreadsheet = get_gspread_client().open_by_key(extract_sheet_id(url))
+    return spreadsheet.worksheet(worksheet_name) if worksheet_name else spreadsheet.sheet1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local lead store (system of record for lead lists)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import", help="Upsert leads from a JSON file")
+    import_parser.add_argument("json_file", help="JSON list of lead records")
+    pull_parser = subparsers.add_parser("pull", help="Import a Google Sheet into a list")
+    publish_parser = subparsers.add_parser("publish", help="Delta-sync a list to a Google Sheet")
+    export_parser = subparsers.add_parser("export", help="Write a list to JSON")
+    normalize_parser = subparsers.add_parser("normalize", help="Fill standard fields (email, company_name, ...)")
+    subparsers.add_parser("stats", help="Show lists and lead counts")
+
+    for sub in (import_parser, pull_parser, publish_parser, export_parser, normalize_parser):
+        sub.add_argument("--list", required=True, help="Lead list name")
+    for sub in (import_parser, pull_parser):
+        sub.add_argument("--key", help="Key column (required for pull when creating the list; import defaults to lead_id)")
+    import_parser.add_argument("--overwrite", action="store_true", help="Replace existing non-empty values")
+    for sub in (pull_parser, publish_parser):
+        sub.add_argument("--url", required=True, help="Google Sheets URL or ID")
+        sub.add_argument("--worksheet", help="Name of the worksheet (default: first sheet)")
+    publish_parser.add_argument("--clear_missing", action="store_true", help="Blank sheet rows not in the list")
+    publish_parser.add_argument("--dry-run", action="store_true", help="Show what would be written")
+    export_parser.add_argument("--output", required=True, help="Output JSON path")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    store = get_lead_store()
+
+    if args.command == "import":
+        with open(args.json_file, "r") as f:
+            records = json.load(f)
+        result = store.import_records(args.list, records, key_column=args.key, overwrite=args.overwrite)
+        result.pop("inserted_keys")
+        print(json.dumps(result, indent=2))
+    elif args.command == "pull":
+        result = store.pull(args.list, _open_worksheet(args.url, args.worksheet), key_column=args.key)
+        result.pop("inserted_keys")
+        print(json.dumps(result, indent=2))
+    elif args.command == "publish":
+        result = store.publish(args.list, _open_worksheet(args.url, args.worksheet),
+                               clear_missing=args.clear_missing, dry_run=args.dry_run)
+        print(json.dumps(result, indent=2))
+    elif args.command == "export":
+        count = store.export_json(args.list, args.output)
+        print(f"Exported {count} leads to {args.output}")
+    elif args.command == "normalize":
+        print(f"Normalized {store.normalize(args.list)} leads in '{args.list}'")
+    else:
+        print(json.dumps(store.stats(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
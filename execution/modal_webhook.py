@@ -18,13 +18,17 @@ import os
 import json
 import base64
 import logging
-import urllib.request
 import urllib.parse
 import re
 from email.mime.text import MIMEText
 from datetime import datetime, timedelta
 from pathlib import Path
 import uuid
+import time
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
 import google.generativeai as genai
 
 # Import custom execution modules
@@ -44,6 +48,44 @@ except ImportError:
         generate_pdf_report = None
         construct_analysis_data = None
 
+try:
+    from execution.google_clients import get_gspread_client, get_service
+    from execution.sheet_uploader import upload_row_stream
+    from execution.record_flattener import RowFlattener
+    from execution.sheet_reader import iter_rows
+    from execution.sheet_sync import coalesce_cells, batch_write
+    from execution.supabase_sink import get_supabase_client, get_sink, lead_rows, analysis_row, normalize_domain, LEADS_TABLE, LEADS_CONFLICT
+    from execution.script_loader import ScriptModuleCache
+    from execution.service_clients import get_http_session, configure_genai, get_anthropic_client, get_apify_client, get_firecrawl_app
+    from execution.tool_cache import get_tool_cache
+    from execution.context_compactor import ContextCompactor
+    from execution.slack_notifier import get_slack_notifier
+    from execution.file_registry import FileRegistry, docstring_summary, directive_summary
+    from execution.job_store import JobStore, JobContext, JobCancelled
+    from execution.suppression_store import get_store as get_suppression_store
+except ImportError:
+    from google_clients import get_gspread_client, get_service
+    from sheet_uploader import upload_row_stream
+    from record_flattener import RowFlattener
+    from sheet_reader import iter_rows
+    from sheet_sync import coalesce_cells, batch_write
+    from supabase_sink import get_supabase_client, get_sink, lead_rows, analysis_row, normalize_domain, LEADS_TABLE, LEADS_CONFLICT
+    from script_loader import ScriptModuleCache
+    from service_clients import get_http_session, configure_genai, get_anthropic_client, get_apify_client, get_firecrawl_app
+    from tool_cache import get_tool_cache
+    from context_compactor import ContextCompactor
+    from slack_notifier import get_slack_notifier
+    from file_registry import FileRegistry, docstring_summary, directive_summary
+    from job_store import JobStore, JobContext, JobCancelled
+    from suppression_store import get_store as get_suppression_store
+
+try:
+    from execution.casualize_cache import CasualizeCache
+    from execution.casualize_engine import CasualizeEngine, COMBINED_SPEC, build_column_updates
+except ImportError:
+    from casualize_cache import CasualizeCache
+    from casualize_engine import CasualizeEngine, COMBINED_SPEC, build_column_updates
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("gemini-orchestrator")
@@ -76,6 +118,17 @@ image = (
 )
 
 
+# Casualization answers shared by every container and run (see casualize_cache.py)
+casualize_cache_dict = modal.Dict.from_name("zeniac-casualize-cache", create_if_missing=True)
+
+# Domains with an analysis in progress, so containers don't run the same paid pipeline twice
+analysis_claims = modal.Dict.from_name("zeniac-analysis-inflight", create_if_missing=True)
+
+# Background job records (status, progress, partial results), polled through GET /jobs
+job_store = JobStore(modal.Dict.from_name("zeniac-jobs", create_if_missing=True))
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "3"))  # Background jobs running at once; the rest wait queued
+
+
 # All secrets
 ALL_SECRETS = [
     modal.Secret.from_name("firecrawl-api-key"),
@@ -91,39 +144,32 @@ ALL_SECRETS = [
 # SUPABASE HELPER
 # ============================================================================
 
+ANALYSIS_SAVE_TIMEOUT = float(os.getenv("ANALYSIS_SAVE_TIMEOUT", "10"))  # Seconds a request waits on its insert
+analysis_save_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="analysis-save")
+
 def save_analysis_to_supabase(data: dict, user_id: str = None):
-    """Save analysis result to Supabase."""
-    from supabase import create_client, Client
-    
-    url = os.getenv("SUPABASE_URL")
-    key = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_KEY") # Try service role, fallback to anon/service key
-    
-    if not url or not key:
-        logger.warning(f"Supabase credentials missing (URL: {bool(url)}, KEY: {bool(key)}), skipping save.")
+    """
+    Save analysis result to Supabase.
+
+    One insert on the shared client, waited on for at most ANALYSIS_SAVE_TIMEOUT
+    seconds. No retries or parking on the request path (those are for the bulk
+    lead sinks, see supabase_sink.py); a failed save is logged as an error.
+    """
+    supabase = get_supabase_client()
+    if supabase is None:
+        logger.warning("Supabase credentials missing, skipping save.")
         return
-        
+
+    # Payload matches the 'analyses' table schema:
+    # id (uuid), created_at (timestamptz), domain (text), score (int4), report_data (jsonb), user_id (uuid)
+    payload = analysis_row(data, user_id)
+    logger.info(f"[DB] Inserting to Supabase: domain={payload['domain']}, score={payload['score']}")
     try:
-        supabase: Client = create_client(url, key)
-        
-        # Prepare payload matching actual 'analyses' table schema
-        # Columns: id (uuid), created_at (timestamptz), domain (text), score (int4), report_data (jsonb), user_id (uuid)
-        domain_normalized = (data.get("url") or "").lower().replace("https://", "").replace("http://", "").replace("www.", "").rstrip("/")
-        
-        payload = {
-            "domain": domain_normalized,
-            "score": data.get("score"),
-            "report_data": data,
-        }
-        
-        # Only include user_id if it looks like a valid UUID
-        if user_id and len(str(user_id)) > 10:
-            payload["user_id"] = user_id
-        
-        logger.info(f"[DB] Inserting to Supabase: domain={domain_normalized}, score={data.get('score')}")
-        
-        # Insert
-        res = supabase.table("analyses").insert(payload).execute()
+        future = analysis_save_pool.submit(lambda: supabase.table("analyses").insert(payload).execute())
+        res = future.result(timeout=ANALYSIS_SAVE_TIMEOUT)
         logger.info(f"[DB] Saved analysis to Supabase successfully: {len(res.data) if res.data else 0} rows")
+    except FuturesTimeout:
+        logger.error(f"[DB] Supabase save timed out after {ANALYSIS_SAVE_TIMEOUT}s: domain={payload['domain']}")
     except Exception as e:
         logger.error(f"[DB] Supabase save error: {e}")
 
@@ -133,13 +179,12 @@ def save_analysis_to_supabase(data: dict, user_id: str = None):
 
 def firecrawl_scrape_impl(url: str, limit: int = 5) -> dict:
     """Multi-page crawl via Firecrawl with Apify fallback."""
-    from firecrawl import FirecrawlApp
     
     # 1. Try Firecrawl
     api_key = os.getenv("FIRECRAWL_API_KEY")
     if api_key:
         try:
-            app = FirecrawlApp(api_key=api_key)
+            app = get_firecrawl_app(api_key)
             logger.info(f"[FIRECRAWL] Starting scan for {url}")
             
             params = {'formats': ['markdown', 'html']}
@@ -171,8 +216,7 @@ def firecrawl_scrape_impl(url: str, limit: int = 5) -> dict:
         return {"error": "Firecrawl failed and APIFY_API_KEY not configured"}
         
     try:
-        from apify_client import ApifyClient
-        client = ApifyClient(apify_key)
+        client = get_apify_client(apify_key)
         
         # Use simple Website Content Crawler (cheaper/faster than full crawl)
         # Actor: apify/website-content-crawler
@@ -215,7 +259,6 @@ def firecrawl_scrape_impl(url: str, limit: int = 5) -> dict:
 
 def pagespeed_analyze_impl(url: str) -> dict:
     """Analyze performance via Google PageSpeed Insights."""
-    import requests
     
     api_key = os.getenv("PAGESPEED_API_KEY")
     if not api_key:
@@ -224,7 +267,7 @@ def pagespeed_analyze_impl(url: str) -> dict:
     endpoint = f"https://www.googleapis.com/pagespeedonline/v5/runPagespeed?url={url}&key={api_key}&strategy=mobile&category=performance"
     
     try:
-        resp = requests.get(endpoint, timeout=30)
+        resp = get_http_session().get(endpoint, timeout=30)
         if resp.status_code == 200:
             data = resp.json()
             audits = data['lighthouseResult']['audits']
@@ -475,22 +518,7 @@ ALL_TOOLS = {
 
 def send_email_impl(to: str, subject: str, body: str, token_data: dict) -> dict:
     """Send email via Gmail API."""
-    from google.oauth2.credentials import Credentials
-    from googleapiclient.discovery import build
-    from google.auth.transport.requests import Request
-
-    creds = Credentials(
-        token=token_data["token"],
-        refresh_token=token_data["refresh_token"],
-        token_uri=token_data["token_uri"],
-        client_id=token_data["client_id"],
-        client_secret=token_data["client_secret"],
-        scopes=token_data["scopes"]
-    )
-    if creds.expired:
-        creds.refresh(Request())
-
-    service = build("gmail", "v1", credentials=creds)
+    service = get_service("gmail", "v1", token_data=token_data)
     message = MIMEText(body)
     message["to"] = to
     message["subject"] = subject
@@ -502,24 +530,10 @@ def send_email_impl(to: str, subject: str, body: str, token_data: dict) -> dict:
 
 def send_email_with_attachment_impl(to: str, subject: str, body: str, attachment_path: str, token_data: dict) -> dict:
     """Send email with PDF attachment via Gmail API."""
-    from google.oauth2.credentials import Credentials
-    from googleapiclient.discovery import build
-    from google.auth.transport.requests import Request
     from email.mime.multipart import MIMEMultipart
     from email.mime.application import MIMEApplication
     
-    creds = Credentials(
-        token=token_data["token"],
-        refresh_token=token_data["refresh_token"],
-        token_uri=token_data["token_uri"],
-        client_id=token_data["client_id"],
-        client_secret=token_data["client_secret"],
-        scopes=token_data["scopes"]
-    )
-    if creds.expired:
-        creds.refresh(Request())
-        
-    service = build("gmail", "v1", credentials=creds)
+    service = get_service("gmail", "v1", token_data=token_data)
     
     message = MIMEMultipart()
     message["to"] = to
@@ -540,22 +554,7 @@ def send_email_with_attachment_impl(to: str, subject: str, body: str, attachment
 
 def read_sheet_impl(spreadsheet_id: str, range: str, token_data: dict) -> dict:
     """Read from Google Sheet."""
-    from google.oauth2.credentials import Credentials
-    from googleapiclient.discovery import build
-    from google.auth.transport.requests import Request
-
-    creds = Credentials(
-        token=token_data["token"],
-        refresh_token=token_data["refresh_token"],
-        token_uri=token_data["token_uri"],
-        client_id=token_data["client_id"],
-        client_secret=token_data["client_secret"],
-        scopes=token_data["scopes"]
-    )
-    if creds.expired:
-        creds.refresh(Request())
-
-    service = build("sheets", "v4", credentials=creds)
+    service = get_service("sheets", "v4", token_data=token_data)
     result = service.spreadsheets().values().get(
         spreadsheetId=spreadsheet_id,
         range=range
@@ -568,22 +567,7 @@ def read_sheet_impl(spreadsheet_id: str, range: str, token_data: dict) -> dict:
 
 def update_sheet_impl(spreadsheet_id: str, range: str, values: list, token_data: dict) -> dict:
     """Update Google Sheet."""
-    from google.oauth2.credentials import Credentials
-    from googleapiclient.discovery import build
-    from google.auth.transport.requests import Request
-
-    creds = Credentials(
-        token=token_data["token"],
-        refresh_token=token_data["refresh_token"],
-        token_uri=token_data["token_uri"],
-        client_id=token_data["client_id"],
-        client_secret=token_data["client_secret"],
-        scopes=token_data["scopes"]
-    )
-    if creds.expired:
-        creds.refresh(Request())
-
-    service = build("sheets", "v4", credentials=creds)
+    service = get_service("sheets", "v4", token_data=token_data)
     result = service.spreadsheets().values().update(
         spreadsheetId=spreadsheet_id,
         range=range,
@@ -597,7 +581,6 @@ def update_sheet_impl(spreadsheet_id: str, range: str, values: list, token_data:
 
 def instantly_get_emails_impl(lead_email: str, limit: int = 10) -> dict:
     """Get email conversation history from Instantly."""
-    import requests
 
     api_key = os.getenv("INSTANTLY_API_KEY")
     if not api_key:
@@ -607,7 +590,7 @@ def instantly_get_emails_impl(lead_email: str, limit: int = 10) -> dict:
     headers = {"Authorization": f"Bearer {api_key}"}
     params = {"limit": limit, "search": lead_email}
 
-    response = requests.get(url, headers=headers, params=params, timeout=30)
+    response = get_http_session().get(url, headers=headers, params=params, timeout=30)
 
     if response.status_code != 200:
         logger.error(f"Instantly API error: {response.status_code} - {response.text}")
@@ -637,7 +620,6 @@ def instantly_get_emails_impl(lead_email: str, limit: int = 10) -> dict:
 
 def instantly_send_reply_impl(eaccount: str, reply_to_uuid: str, subject: str, html_body: str) -> dict:
     """Send a reply via Instantly."""
-    import requests
 
     api_key = os.getenv("INSTANTLY_API_KEY")
     if not api_key:
@@ -655,7 +637,7 @@ def instantly_send_reply_impl(eaccount: str, reply_to_uuid: str, subject: str, h
         "body": {"html": html_body}
     }
 
-    response = requests.post(url, headers=headers, json=payload, timeout=30)
+    response = get_http_session().post(url, headers=headers, json=payload, timeout=30)
 
     if response.status_code not in [200, 201]:
         logger.error(f"Instantly reply error: {response.status_code} - {response.text}")
@@ -667,7 +649,6 @@ def instantly_send_reply_impl(eaccount: str, reply_to_uuid: str, subject: str, h
 
 def web_search_impl(query: str) -> dict:
     """Search the web using DuckDuckGo (no API key needed)."""
-    import requests
 
     # Use DuckDuckGo instant answer API
     url = "https://api.duckduckgo.com/"
@@ -679,7 +660,7 @@ def web_search_impl(query: str) -> dict:
     }
 
     try:
-        response = requests.get(url, params=params, timeout=10)
+        response = get_http_session().get(url, params=params, timeout=10)
         data = response.json()
 
         results = []
@@ -721,13 +702,12 @@ def web_search_impl(query: str) -> dict:
 
 def web_fetch_impl(url: str) -> dict:
     """Fetch and extract text content from a URL."""
-    import requests
 
     try:
         headers = {
             "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36"
         }
-        response = requests.get(url, headers=headers, timeout=15)
+        response = get_http_session().get(url, headers=headers, timeout=15)
         response.raise_for_status()
 
         # Simple HTML to text conversion
@@ -757,7 +737,6 @@ def web_fetch_impl(url: str) -> dict:
 
 def create_proposal_impl(client: dict, project: dict) -> dict:
     """Create a PandaDoc proposal from structured data."""
-    import requests
 
     API_KEY = os.getenv("PANDADOC_API_KEY")
     if not API_KEY:
@@ -809,7 +788,7 @@ def create_proposal_impl(client: dict, project: dict) -> dict:
     }
 
     try:
-        response = requests.post(API_URL, json=payload, headers=headers, timeout=30)
+        response = get_http_session().post(API_URL, json=payload, headers=headers, timeout=30)
         response.raise_for_status()
 
         doc_data = response.json()
@@ -826,7 +805,6 @@ def create_proposal_impl(client: dict, project: dict) -> dict:
 def generate_toolkit_impl(industry: str, struggle: str, revenueRange: str, email: str) -> dict:
     """Generate a personalized Google Doc toolkit."""
     from google.oauth2 import service_account
-    from googleapiclient.discovery import build
     import json
 
     # 1. Load OAuth Token (User Credentials)
@@ -835,26 +813,11 @@ def generate_toolkit_impl(industry: str, struggle: str, revenueRange: str, email
         return {"error": "GOOGLE_TOKEN_JSON secret not found"}
     
     try:
-        from google.oauth2.credentials import Credentials
-        from google.auth.transport.requests import Request
-        
         token_data = json.loads(token_json)
-        creds = Credentials(
-            token=token_data["token"],
-            refresh_token=token_data["refresh_token"],
-            token_uri=token_data["token_uri"],
-            client_id=token_data["client_id"],
-            client_secret=token_data["client_secret"],
-            scopes=token_data["scopes"]
-        )
-        
-        # Refresh if expired
-        if creds.expired:
-            creds.refresh(Request())
-        
+
         # 2. Initialize Docs/Drive API
-        docs_service = build('docs', 'v1', credentials=creds)
-        drive_service = build('drive', 'v3', credentials=creds)
+        docs_service = get_service("docs", "v1", token_data=token_data)
+        drive_service = get_service("drive", "v3", token_data=token_data)
 
         # 2.5 Ensure _ZeniacVault folder exists
         folder_name = "_ZeniacVault"
@@ -967,7 +930,7 @@ Do NOT use markdown formatting (no **, no ##). Use UPPERCASE for headers.
         try:
             api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
             if api_key:
-                genai.configure(api_key=api_key)
+                configure_genai(api_key)
             model = genai.GenerativeModel('gemini-1.5-flash')
             response = model.generate_content(prompt)
             ai_content = response.text
@@ -1063,26 +1026,105 @@ TOOL_IMPLEMENTATIONS = {
 # Tools that need token_data
 TOOLS_NEEDING_TOKEN = {"send_email", "read_sheet", "update_sheet"}
 
+# Calls of one tool allowed at once in this container (across directives); side-effecting
+# tools run one at a time, the Apify-backed ones are capped to stay under actor limits
+TOOL_CONCURRENCY = {
+    "send_email": 1,
+    "update_sheet": 1,
+    "instantly_send_reply": 1,
+    "create_proposal": 1,
+    "generate_toolkit": 1,
+    "firecrawl_scrape": 3,
+    "analyze_social_presence": 2,
+    "scrape_competitors": 2,
+}
+TOOL_DEFAULT_CONCURRENCY = 4
+
+# Seconds a directive waits for one tool call before answering the model with a timeout error
+TOOL_TIMEOUTS = {
+    "web_search": 30,
+    "web_fetch": 30,
+    "pagespeed_analyze": 90,
+    "firecrawl_scrape": 180,
+    "analyze_social_presence": 300,
+    "scrape_competitors": 300,
+    "generate_toolkit": 300,
+}
+TOOL_DEFAULT_TIMEOUT = 120
+
+tool_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="tool")
+_tool_semaphores = {}
+_tool_semaphores_lock = threading.Lock()
+
+
+def _tool_semaphore(tool_name: str) -> threading.BoundedSemaphore:
+    with _tool_semaphores_lock:
+        if tool_name not in _tool_semaphores:
+            limit = TOOL_CONCURRENCY.get(tool_name, TOOL_DEFAULT_CONCURRENCY)
+            _tool_semaphores[tool_name] = threading.BoundedSemaphore(limit)
+        return _tool_semaphores[tool_name]
+
+
+def call_tool(tool_name: str, tool_input: dict, token_data: dict) -> dict:
+    """Call a tool implementation, serving read-only tools from the result cache."""
+    impl = TOOL_IMPLEMENTATIONS[tool_name]
+
+    def run():
+        # Add token_data for tools that need it
+        if tool_name in TOOLS_NEEDING_TOKEN:
+            return impl(**tool_input, token_data=token_data)
+        return impl(**tool_input)
+    return get_tool_cache().call(tool_name, tool_input, run)
+
+
+def execute_tool(tool_name: str, tool_input: dict, token_data: dict) -> tuple:
+    """Run one tool implementation under its concurrency cap; returns (result, is_error)."""
+    if tool_name not in TOOL_IMPLEMENTATIONS:
+        return {"error": f"No implementation for {tool_name}"}, True
+    with _tool_semaphore(tool_name):
+        try:
+            return call_tool(tool_name, tool_input, token_data), False
+        except Exception as e:
+            logger.error(f"Tool error: {e}")
+            return {"error": str(e)}, True
+
+
+def execute_tool_calls(calls: list, token_data: dict) -> list:
+    """
+    Run one turn's tool calls concurrently; returns [(result, is_error)] in the order of `calls`.
+
+    Args:
+        calls: [(tool_name, tool_input)]
+
+    A call that outlives its TOOL_TIMEOUTS entry is reported as an error; its
+    thread can't be interrupted and finishes in the background.
+    """
+    if len(calls) == 1:
+        return [execute_tool(calls[0][0], calls[0][1], token_data)]
+
+    submitted = time.time()
+    futures = [tool_pool.submit(execute_tool, name, tool_input, token_data) for name, tool_input in calls]
+    results = []
+    for (name, _), future in zip(calls, futures):
+        timeout = TOOL_TIMEOUTS.get(name, TOOL_DEFAULT_TIMEOUT)
+        try:
+            results.append(future.result(timeout=max(0, submitted + timeout - time.time())))
+        except FuturesTimeout:
+            logger.error(f"Tool {name} timed out after {timeout}s")
+            results.append(({"error": f"Tool '{name}' timed out after {timeout}s"}, True))
+    return results
+
 # ============================================================================
 # SLACK NOTIFICATIONS
 # ============================================================================
 
 def slack_notify(message: str, blocks: list = None):
-    """Send notification to Slack."""
+    """Queue a Slack notification; a background thread posts it (merged with others sent around the same time)."""
     webhook_url = os.getenv("SLACK_WEBHOOK_URL")
     if not webhook_url:
         return
 
-    payload = {"text": message}
-    if blocks:
-        payload["blocks"] = blocks
-
-    try:
-        data = json.dumps(payload).encode("utf-8")
-        req = urllib.request.Request(webhook_url, data=data, headers={"Content-Type": "application/json"})
-        urllib.request.urlopen(req, timeout=5)
-    except Exception as e:
-        logger.error(f"Slack failed: {e}")
+    get_slack_notifier(webhook_url).send(message, blocks=blocks)
 
 
 def slack_directive_start(slug: str, directive: str, input_data: dict):
@@ -1138,6 +1180,24 @@ def slack_error(error: str):
     slack_notify(f"Error", blocks=blocks)
 
 
+def slack_flush():
+    """Post every queued Slack message now (the atexit flush doesn't run when Modal stops a container)."""
+    webhook_url = os.getenv("SLACK_WEBHOOK_URL")
+    if webhook_url:
+        get_slack_notifier(webhook_url).flush()
+
+
+def flushes_slack(fn):
+    """Flush queued Slack messages when a Modal function returns or raises."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            slack_flush()
+    return wrapper
+
+
 # ============================================================================
 # PROCEDURAL SCRIPT REGISTRY
 # ============================================================================
@@ -1146,26 +1206,28 @@ def slack_error(error: str):
 # Scripts must have a run(payload, token_data, slack_notify) -> dict function
 PROCEDURAL_SCRIPTS = {
     "instantly_autoreply": "execution.instantly_autoreply",
+    "analyze_social_presence": "execution.analyze_social_presence",
+    "scrape_apify_parallel": "execution.scrape_apify_parallel",
 }
 
+# Each script module is executed once per container and reused until its file changes
+SCRIPTS_DIR = "/app/execution" if os.path.isdir("/app/execution") else os.path.dirname(os.path.abspath(__file__))
+script_modules = ScriptModuleCache(SCRIPTS_DIR, log=logger.info)
+
+# webhooks.json, directives and script descriptions are parsed once and re-read only when they change
+DIRECTIVES_DIR = "/app/directives" if os.path.isdir("/app/directives") else os.path.join(os.path.dirname(SCRIPTS_DIR), "directives")
+file_registry = FileRegistry(log=logger.info)
+
 
 def run_procedural_script(script_name: str, payload: dict, token_data: dict) -> dict:
     """
     Execute a procedural Python script.
     Scripts are deterministic - Gemini is only called for specific creative tasks within.
     """
-    import importlib.util
-    import sys
-
-    # Add execution dir to path
-    sys.path.insert(0, "/app")
-
-    script_path = f"/app/execution/{script_name}.py"
+    script_path = script_modules.path(script_name)
 
     try:
-        spec = importlib.util.spec_from_file_location(script_name, script_path)
-        module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(module)
+        module = script_modules.load(script_name)
 
         # Call the run() function
         if hasattr(module, "run"):
@@ -1180,40 +1242,45 @@ def run_procedural_script(script_name: str, payload: dict, token_data: dict) ->
         return {"error": str(e)}
 
 
+# Pay the procedural scripts' import cost at container start rather than on the first request
+if not modal.is_local() and os.getenv("PREWARM_SCRIPTS", "1") != "0":
+    logger.info(f"[scripts] Pre-warmed: {script_modules.prewarm(list(PROCEDURAL_SCRIPTS))}")
+
+
 # ============================================================================
 # ANALYSIS & SUPABASE
 # ============================================================================
 
 def get_supabase():
-    """Get Supabase client."""
-    from supabase import create_client, Client
-    
-    url = os.getenv("SUPABASE_URL")
-    key = os.getenv("SUPABASE_KEY")
-    
-    if not url or not key:
+    """Get the container's shared Supabase client."""
+    client = get_supabase_client()
+    if client is None:
         logger.error("❌ Supabase credentials missing")
-        return None
-        
-    return create_client(url, key)
+    return client
 
-def check_recent_analysis(url: str):
-    """Check Supabase for recent analysis (10 days)."""
+ANALYSIS_FRESH_DAYS = int(os.getenv("ANALYSIS_FRESH_DAYS", "10"))  # Stored reports younger than this are reused
+ANALYSIS_CLAIM_TTL = 600   # Seconds before another container may take over an unfinished analysis
+ANALYSIS_WAIT_POLL = 5     # Seconds between checks while another container runs the analysis
+
+def check_recent_analysis(url: str, max_age: timedelta = None):
+    """
+    Check Supabase for a recent analysis of exactly this domain (default: ANALYSIS_FRESH_DAYS).
+
+    Matches the normalized domain with equality, so the (domain, created_at)
+    index serves it (see supabase/analysis_cache_index.sql).
+    """
     supabase = get_supabase()
     if not supabase:
         return None
         
     try:
-        # Normalize domain
-        normalized = url.lower().replace("https://", "").replace("http://", "").replace("www.", "").rstrip("/")
-        
-        # 10 days ago
-        ten_days_ago = (datetime.utcnow() - timedelta(days=10)).isoformat()
+        normalized = normalize_domain(url)
+        since = (datetime.utcnow() - (max_age or timedelta(days=ANALYSIS_FRESH_DAYS))).isoformat()
         
         response = supabase.table("analyses") \
             .select("*") \
-            .ilike("domain", f"%{normalized}%") \
-            .gt("created_at", ten_days_ago) \
+            .eq("domain", normalized) \
+            .gt("created_at", since) \
             .order("created_at", desc=True) \
             .limit(1) \
             .execute()
@@ -1255,18 +1322,123 @@ def save_analysis(user_id: str, url: str, data: dict, user_name: str = None, use
     except Exception as e:
         logger.error(f"Supabase save failed: {e}")
 
+# Requests per container; the stages are I/O-bound and run on worker threads
+ANALYZE_CONCURRENCY = int(os.getenv("ANALYZE_CONCURRENCY", "8"))
+
+# Sized for blocking I/O (several stages per request), not for the container's CPU count
+# like asyncio's default executor
+analyze_pool = ThreadPoolExecutor(max_workers=ANALYZE_CONCURRENCY * 4, thread_name_prefix="analyze")
+
+
+def run_blocking(fn, *args, **kwargs):
+    """Run a blocking call on the analysis pool; returns an awaitable."""
+    return asyncio.get_running_loop().run_in_executor(analyze_pool, functools.partial(fn, *args, **kwargs))
+
+
+_inflight_analyses = {}  # domain -> asyncio.Future of the analysis running in this container
+
+
+def claim_analysis(domain: str) -> bool:
+    """Claim a domain across containers; False while another container's claim is live."""
+    claim = {"expires": time.time() + ANALYSIS_CLAIM_TTL}
+    try:
+        if analysis_claims.put(domain, claim, skip_if_exists=True):
+            return True
+        current = analysis_claims.get(domain)
+        if not current or current.get("expires", 0) < time.time():
+            # Left behind by a container that died mid-run
+            analysis_claims[domain] = claim
+            return True
+        return False
+    except Exception as e:
+        logger.warning(f"[ANALYZE] Claim store unavailable ({e}), analyzing without coalescing")
+        return True
+
+
+def release_analysis(domain: str):
+    try:
+        analysis_claims.pop(domain)
+    except Exception:
+        pass
+
+
+def wait_for_analysis(domain: str, url: str):
+    """Wait for another container's analysis of domain; its stored row, or None if it failed or timed out."""
+    started = time.time()
+    while time.time() - started < ANALYSIS_CLAIM_TTL:
+        time.sleep(ANALYSIS_WAIT_POLL)
+        try:
+            if analysis_claims.get(domain) is None:
+                break
+        except Exception:
+            break
+    return check_recent_analysis(url, max_age=timedelta(seconds=time.time() - started + 60))
+
+
+async def get_or_run_analysis(url: str, force: bool, run):
+    """
+    The analysis for url's domain, running the paid pipeline (`run`) at most once at a time.
+
+    Returns (analysis_data, source): "cache" for a stored report younger than
+    ANALYSIS_FRESH_DAYS (skipped when force is set), "coalesced" when another
+    request for the domain was already running it, here or in another container,
+    and "fresh" when this request ran it.
+    """
+    domain = normalize_domain(url)
+    if not force:
+        row = await run_blocking(check_recent_analysis, url)
+        if row:
+            return row["report_data"], "cache"
+
+    pending = _inflight_analyses.get(domain)
+    if pending is not None:
+        logger.info(f"[ANALYZE] Joining the analysis of {domain} already running in this container")
+        return await asyncio.shield(pending), "coalesced"
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight_analyses[domain] = future
+    claimed = False
+    try:
+        claimed = await run_blocking(claim_analysis, domain)
+        if not claimed:
+            logger.info(f"[ANALYZE] {domain} is being analyzed by another container, waiting for it")
+            row = await run_blocking(wait_for_analysis, domain, url)
+            if row:
+                future.set_result(row["report_data"])
+                return row["report_data"], "coalesced"
+            logger.info(f"[ANALYZE] No result for {domain} from the other container, running it here")
+
+        data = await run()
+        future.set_result(data)
+        return data, "fresh"
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        if not future.done():
+            future.set_exception(e)
+            future.exception()  # Mark retrieved when nobody joined
+        raise
+    finally:
+        _inflight_analyses.pop(domain, None)
+        if claimed:
+            await run_blocking(release_analysis, domain)
+
+
 @app.function(image=image, secrets=ALL_SECRETS, timeout=600)
+@modal.concurrent(max_inputs=ANALYZE_CONCURRENCY)
 @modal.fastapi_endpoint(method="POST", label="analyze")
 async def analyze_endpoint(item: dict):
     """
     Autonomous Analysis Endpoint:
+    0. Reuse a fresh stored report, or join an analysis of the same domain already running
     1. Scrape (Firecrawl + Apify Fallback)
     2. PageSpeed Analysis
     3. Social Analysis (Apify)
     4. Construct Data & Score
-    5. Generate PDF Report
-    6. Send Email with PDF
-    7. Save to Supabase
+    5. Save to Supabase
+    6. Generate PDF Report
+    7. Send Email with PDF
     """
     url = item.get("url")
     user_id = item.get("userId")
@@ -1284,17 +1456,17 @@ async def analyze_endpoint(item: dict):
         
     logger.info(f"[ANALYZE] Starting autonomous analysis for {url} (User: {user_id}, Email: {email}, Force: {force})")
     
-    # Cache checking is handled by the Next.js layer (route.ts) via getRecentAnalysis.
-    # Modal always performs a fresh analysis when called.
+    # The Next.js layer (route.ts) checks the cache too; checking here also covers direct
+    # calls and concurrent scans of one domain, which share a single pipeline run
     
     # 0. Create async helpers
-    import asyncio
-    
-    async def get_scrape(): return firecrawl_scrape_impl(url)
-    async def get_pagespeed(): return pagespeed_analyze_impl(url)
-    async def get_social(name, loc): return analyze_social_presence_impl(name, loc)
+    # The scrapers are blocking (requests, Apify SDK), so each runs on a worker thread;
+    # calling them directly from async helpers would run them one after another on the event loop
+    async def get_scrape(): return await run_blocking(firecrawl_scrape_impl, url)
+    async def get_pagespeed(): return await run_blocking(pagespeed_analyze_impl, url)
+    async def get_social(name, loc): return await run_blocking(analyze_social_presence_impl, name, loc)
     
-    try:
+    async def run_pipeline():
         # A. Parallel Execution of Scrapers
         logger.info(f"[ANALYZE] Triggering parallel scans for {url}...")
         
@@ -1306,8 +1478,6 @@ async def analyze_endpoint(item: dict):
         scrape_task = asyncio.create_task(get_scrape())
         pagespeed_task = asyncio.create_task(get_pagespeed())
         
-        social_result = None
-        
         # 2. If we HAVE a business name, start Social immediately too!
         if initial_name and initial_name != "Business":
             logger.info(f"[ANALYZE] Starting Social analysis in parallel for '{initial_name}'")
@@ -1332,44 +1502,43 @@ async def analyze_endpoint(item: dict):
             if loc_match:
                 location = "Nairobi, Kenya"
 
-        # 4. If Social wasn't started, start it now
+        # 4. If Social wasn't started, start it now (PageSpeed keeps running meanwhile)
         if not social_task:
             logger.info(f"[ANALYZE] Starting Social analysis now for '{initial_name}'")
-            social_result = await get_social(initial_name, location)
-        else:
-            # Otherwise just wait for it and pagespeed
-            social_result, pagespeed_result = await asyncio.gather(
-                social_task,
-                pagespeed_task
-            )
-        
-        business_name = initial_name
-        # Note: we need pagespeed_result if it wasn't awaited yet
-        if 'pagespeed_result' not in locals():
-            pagespeed_result = await pagespeed_task
-
+            social_task = asyncio.create_task(get_social(initial_name, location))
 
+        social_result, pagespeed_result = await asyncio.gather(social_task, pagespeed_task)
         
         # B. Data Construction
         analysis_data = construct_analysis_data(
             url, 
-            business_name, 
+            initial_name, 
             scrape_result if "error" not in scrape_result else {"data": []}, 
             social_result if "error" not in social_result else {},
             pagespeed_result if "error" not in pagespeed_result else {}
         )
         
-        # C. PDF Generation
+        # C. Save to Supabase (before waiters in other containers look for it)
+        await run_blocking(save_analysis_to_supabase, analysis_data, user_id)
+        return analysis_data
+
+    try:
+        analysis_data, source = await get_or_run_analysis(url, force, run_pipeline)
+        business_name = analysis_data.get("businessName") or business_name
+        logger.info(f"[ANALYZE] Analysis for {url} ({source})")
+        
+        # D. PDF Generation (per request, cheap compared to the pipeline)
         report_uuid = uuid.uuid4().hex[:8]
         report_path = f"/tmp/Audit_Report_{report_uuid}.pdf"
-        generate_pdf_report(analysis_data, report_path)
+        await run_blocking(generate_pdf_report, analysis_data, report_path)
         logger.info(f"[PDF] Report generated at {report_path}")
         
-        # D. Email Sending
+        # E. Email Sending
         email_status = "skipped"
         if email:
             if token_data:
-                send_email_with_attachment_impl(
+                await run_blocking(
+                    send_email_with_attachment_impl,
                     to=email,
                     subject=f"Digital Dominance Audit for {business_name}",
                     body="Please find your comprehensive digital audit attached.",
@@ -1380,15 +1549,13 @@ async def analyze_endpoint(item: dict):
             else:
                  logger.warning("[WARN] No token_data provided, skipping Email.")
                  email_status = "skipped_no_token"
-                 
-        # E. Save to Supabase
-        save_analysis_to_supabase(analysis_data, user_id)
         
         # F. Return Data
         return {
             "success": True, 
             "data": analysis_data, 
-            "message": "Analysis completed.",
+            "message": "Analysis completed." if source == "fresh" else "Recent analysis reused.",
+            "source": source,
             "email_status": email_status,
             "report_url": "PDF sent via email" # We don't host it unless we upload to Supabase Storage
         }
@@ -1403,14 +1570,14 @@ async def analyze_endpoint(item: dict):
 # ============================================================================
 
 def load_webhook_config() -> dict:
-    """Load webhook configuration from webhooks.json."""
+    """Load webhook configuration from webhooks.json (parsed once, re-read when the file changes)."""
     paths = ["/app/webhooks.json", "/app/execution/webhooks.json", "webhooks.json", "execution/webhooks.json"]
     
     for p in paths:
         try:
-            config_path = Path(p)
-            if config_path.exists():
-                return json.loads(config_path.read_text())
+            config = file_registry.file(p, json.loads)
+            if config is not None:
+                return config
         except Exception as e:
             logger.error(f"Error loading {p}: {e}")
             
@@ -1418,10 +1585,10 @@ def load_webhook_config() -> dict:
 
 def load_directive(directive_name: str) -> str:
     """Load a directive file. Returns content or raises error."""
-    directive_path = Path(f"/app/directives/{directive_name}.md")
-    if not directive_path.exists():
+    content = file_registry.file(f"{DIRECTIVES_DIR}/{directive_name}.md")
+    if content is None:
         raise FileNotFoundError(f"Directive not found: {directive_name}")
-    return directive_path.read_text()
+    return content
 
 
 def run_directive(
@@ -1430,9 +1597,10 @@ def run_directive(
     input_data: dict,
     allowed_tools: list,
     token_data: dict,
-    max_turns: int = 15
+    max_turns: int = 15,
+    job: JobContext = None
 ) -> dict:
-    """Execute a directive with scoped tools using Gemini."""
+    """Execute a directive with scoped tools using Gemini (reporting each turn to `job`, if given)."""
     # Build prompt with directive + input
     prompt = f"""You are executing a specific directive. Follow it precisely.
 
@@ -1464,9 +1632,10 @@ Execute the directive now."""
         }
     
     os.environ["GOOGLE_API_KEY"] = api_key # Gemini SDK often expects this
-    genai.configure(api_key=api_key)
+    configure_genai(api_key)
     model = genai.GenerativeModel('gemini-flash-latest', tools=tools)
     chat = model.start_chat()
+    compactor = ContextCompactor()
 
     conversation_log = []
     total_input_tokens = 0
@@ -1482,8 +1651,11 @@ Execute the directive now."""
 
     while response.candidates[0].content.parts[0].function_call and turn_count < max_turns:
         turn_count += 1
+        if job:
+            job.stage("turn", turn_count, max_turns, f"Turn {turn_count}")
         
-        tool_results = []
+        # Collect this turn's calls; the permitted ones run concurrently
+        calls = []     # (tool_name, tool_input, conversation_log entry or None if refused)
         for part in response.candidates[0].content.parts:
             if fn := part.function_call:
                 tool_name = fn.name
@@ -1491,48 +1663,49 @@ Execute the directive now."""
 
                 # Security check: only execute allowed tools
                 if tool_name not in allowed_tools:
-                    result = {"error": f"Tool '{tool_name}' not permitted for this directive"}
-                    is_error = True
+                    calls.append((tool_name, tool_input, None))
                 else:
                     slack_tool_call(turn_count, tool_name, tool_input)
-                    conversation_log.append({"turn": turn_count, "tool": tool_name, "input": tool_input})
+                    entry = {"turn": turn_count, "tool": tool_name, "input": tool_input}
+                    conversation_log.append(entry)
+                    calls.append((tool_name, tool_input, entry))
 
-                    # Execute tool
-                    is_error = False
-                    try:
-                        impl = TOOL_IMPLEMENTATIONS.get(tool_name)
-                        if impl:
-                            # Add token_data for tools that need it
-                            if tool_name in TOOLS_NEEDING_TOKEN:
-                                result = impl(**tool_input, token_data=token_data)
-                            else:
-                                result = impl(**tool_input)
-                        else:
-                            result = {"error": f"No implementation for {tool_name}"}
-                            is_error = True
-                    except Exception as e:
-                        logger.error(f"Tool error: {e}")
-                        result = {"error": str(e)}
-                        is_error = True
-
-                    conversation_log[-1]["result"] = json.dumps(result)
-                    slack_tool_result(turn_count, tool_name, json.dumps(result), is_error)
+        permitted = [(name, tool_input) for name, tool_input, entry in calls if entry is not None]
+        outcomes = iter(execute_tool_calls(permitted, token_data))
 
-                tool_results.append(genai.protos.Part(
-                    function_response=genai.protos.FunctionResponse(
-                        name=tool_name,
-                        response=result
-                    )
-                ))
+        # Responses go back in the order the model asked for them
+        tool_results = []
+        sent = []
+        for tool_name, tool_input, entry in calls:
+            if entry is None:
+                result = {"error": f"Tool '{tool_name}' not permitted for this directive"}
+            else:
+                result, is_error = next(outcomes)
+                entry["result"] = json.dumps(result)
+                slack_tool_result(turn_count, tool_name, json.dumps(result), is_error)
+
+            # The model sees a version cut to the tool's budget; the log keeps the full result
+            result = compactor.shape(tool_name, result)
+            sent.append((tool_name, result))
+            tool_results.append(genai.protos.Part(
+                function_response=genai.protos.FunctionResponse(
+                    name=tool_name,
+                    response=result
+                )
+            ))
 
+        compactor.record_turn(turn_count, sent)
         response = chat.send_message(tool_results)
         total_input_tokens += response.usage_metadata.prompt_token_count
         total_output_tokens += response.usage_metadata.candidates_token_count
+        # Later turns resend only digests of results older than the last few turns
+        compactor.compact(chat)
 
     # Extract final response
     final_text = response.text
 
-    usage = {"input_tokens": total_input_tokens, "output_tokens": total_output_tokens, "turns": turn_count}
+    usage = {"input_tokens": total_input_tokens, "output_tokens": total_output_tokens, "turns": turn_count,
+             "context": compactor.stats}
     slack_complete(final_text, usage)
 
     return {
@@ -1549,6 +1722,7 @@ Execute the directive now."""
 
 @app.function(image=image, secrets=ALL_SECRETS, timeout=600)
 @modal.fastapi_endpoint(method="POST")
+@flushes_slack
 def directive(slug: str, payload: dict = None):
     """
     Execute a specific directive by slug.
@@ -1559,8 +1733,36 @@ def directive(slug: str, payload: dict = None):
 
     URL: POST /directive?slug={slug}
     Body: {"data": {...}}  (input data for the directive)
+          {"data": {...}, "async": true}  → returns a job_id at once; poll GET /jobs?job_id=...
     """
     payload = payload or {}
+    if payload.get("async"):
+        webhooks = load_webhook_config().get("webhooks", {})
+        if slug not in webhooks:
+            return {"status": "error", "error": f"Unknown webhook slug: {slug}", "available": list(webhooks.keys())}
+        job = start_job("directive", {"slug": slug, "payload": {k: v for k, v in payload.items() if k != "async"}})
+        return {"status": "accepted", "slug": slug, "job_id": job["id"], "status_url": f"/jobs?job_id={job['id']}"}
+    return execute_directive(slug, payload)
+
+
+@app.function(image=image, secrets=ALL_SECRETS, timeout=600, max_containers=JOB_CONCURRENCY)
+@flushes_slack
+def directive_background(slug: str, payload: dict, job_id: str = None):
+    """Background task: a directive run started with {"async": true}, reporting to job `job_id`."""
+    job = JobContext(job_store, job_id)
+    try:
+        job.start()
+        result = execute_directive(slug, payload, job=job)
+    except JobCancelled:
+        slack_notify(f"🛑 *{slug}* cancelled")
+        job.cancelled()
+        return {"status": "cancelled", "job_id": job_id}
+    job.finish(result)
+    return result
+
+
+def execute_directive(slug: str, payload: dict, job: JobContext = None) -> dict:
+    """Run the webhook `slug` (procedural script or agentic directive) and return the response body."""
     input_data = payload.get("data", payload)  # Support both {"data": ...} and flat payload
     max_turns = payload.get("max_turns", 15)
 
@@ -1594,6 +1796,8 @@ def directive(slug: str, payload: dict = None):
         slack_notify(f"🔧 *Procedural:* `{slug}` → `{script_name}.py`")
 
         try:
+            if job:
+                job.stage("script", 1, 1, f"Running {script_name}.py")
             result = run_procedural_script(script_name, input_data, token_data)
 
             # Notify completion
@@ -1608,6 +1812,8 @@ def directive(slug: str, payload: dict = None):
                 "result": result,
                 "timestamp": datetime.utcnow().isoformat()
             }
+        except JobCancelled:
+            raise
         except Exception as e:
             logger.error(f"Script error: {e}")
             slack_error(str(e))
@@ -1631,7 +1837,8 @@ def directive(slug: str, payload: dict = None):
                 input_data=input_data,
                 allowed_tools=allowed_tools,
                 token_data=token_data,
-                max_turns=max_turns
+                max_turns=max_turns,
+                job=job
             )
             return {
                 "status": "success",
@@ -1644,6 +1851,8 @@ def directive(slug: str, payload: dict = None):
                 "usage": result["usage"],
                 "timestamp": datetime.utcnow().isoformat()
             }
+        except JobCancelled:
+            raise
         except Exception as e:
             logger.error(f"Directive error: {e}")
             slack_error(str(e))
@@ -1663,7 +1872,7 @@ def list_webhooks():
     try:
         api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
         if api_key:
-            genai.configure(api_key=api_key)
+            configure_genai(api_key)
             for m in genai.list_models():
                 if 'generateContent' in m.supported_generation_methods:
                     models.append(m.name)
@@ -1682,55 +1891,39 @@ def list_webhooks():
 
 def list_available_directives() -> list[dict]:
     """List all available directives with their descriptions."""
-    directives_dir = Path("/app/directives")
-    directives = []
-
-    for f in directives_dir.glob("*.md"):
-        content = f.read_text()
-        # Extract first heading as title
-        title = f.stem.replace("_", " ").title()
-        # Extract goal/description from content
-        desc = ""
-        for line in content.split("\n"):
-            if line.startswith("## Goal") or line.startswith("## Description"):
-                # Get the next non-empty line
-                idx = content.find(line)
-                remaining = content[idx + len(line):].strip()
-                desc = remaining.split("\n")[0].strip()
-                break
-
-        directives.append({
-            "name": f.stem,
-            "title": title,
+    return [
+        {
+            "name": name,
+            "title": name.replace("_", " ").title(),
             "description": desc[:200] if desc else "No description"
-        })
-
-    return directives
+        }
+        # Goal/description line of each directive, parsed once per file version
+        for name, desc in file_registry.scan(DIRECTIVES_DIR, "*.md", directive_summary).items()
+    ]
 
 
 def list_available_scripts() -> list[dict]:
     """List all available execution scripts."""
-    scripts_dir = Path("/app/execution")
-    scripts = []
-
-    for f in scripts_dir.glob("*.py"):
-        if f.stem.startswith("_"):
-            continue
-        # Read first docstring
-        content = f.read_text()
-        desc = ""
-        if '"""' in content:
-            start = content.find('"""') + 3
-            end = content.find('"""', start)
-            if end > start:
-                desc = content[start:end].strip().split("\n")[0]
-
-        scripts.append({
-            "name": f.stem,
+    return [
+        {
+            "name": name,
             "description": desc[:150] if desc else "No description"
-        })
+        }
+        # First docstring line of each script, parsed once per file version
+        for name, desc in file_registry.scan(SCRIPTS_DIR, "*.py", docstring_summary).items()
+        if not name.startswith("_")
+    ]
+
 
-    return scripts
+# Build the registry at container start so the first request finds everything parsed
+if not modal.is_local() and os.getenv("PREWARM_SCRIPTS", "1") != "0":
+    for webhook in load_webhook_config().get("webhooks", {}).values():
+        if webhook.get("directive"):
+            try:
+                load_directive(webhook["directive"])
+            except FileNotFoundError:
+                pass
+    logger.info(f"[registry] Loaded {len(list_available_directives())} directives, {len(list_available_scripts())} scripts")
 
 
 AGENT_TOOLS = {
@@ -1820,11 +2013,7 @@ def run_agent_tool(tool_name: str, tool_input: dict, token_data: dict) -> dict:
 
     # Fall back to standard tool implementations
     elif tool_name in TOOL_IMPLEMENTATIONS:
-        impl = TOOL_IMPLEMENTATIONS[tool_name]
-        if tool_name in TOOLS_NEEDING_TOKEN:
-            return impl(**tool_input, token_data=token_data)
-        else:
-            return impl(**tool_input)
+        return call_tool(tool_name, tool_input, token_data)
 
     return {"error": f"Unknown tool: {tool_name}"}
 
@@ -1860,7 +2049,7 @@ def general_agent(query: str = "", format: str = "json"):
     if not api_key:
         return JSONResponse({"error": "GEMINI_API_KEY not set"}, status_code=500)
     
-    genai.configure(api_key=api_key)
+    configure_genai(api_key)
 
     # Get Google token
     try:
@@ -1962,22 +2151,7 @@ def load_cron_config() -> dict:
 
 def append_to_sheet(spreadsheet_id: str, values: list, token_data: dict) -> dict:
     """Append rows to a Google Sheet."""
-    from google.oauth2.credentials import Credentials
-    from googleapiclient.discovery import build
-    from google.auth.transport.requests import Request
-
-    creds = Credentials(
-        token=token_data["token"],
-        refresh_token=token_data["refresh_token"],
-        token_uri=token_data["token_uri"],
-        client_id=token_data["client_id"],
-        client_secret=token_data["client_secret"],
-        scopes=token_data["scopes"]
-    )
-    if creds.expired:
-        creds.refresh(Request())
-
-    service = build("sheets", "v4", credentials=creds)
+    service = get_service("sheets", "v4", token_data=token_data)
 
     result = service.spreadsheets().values().append(
         spreadsheetId=spreadsheet_id,
@@ -1996,14 +2170,11 @@ def append_to_sheet(spreadsheet_id: str, values: list, token_data: dict) -> dict
     timeout=60,
     # schedule=modal.Cron("*/5 * * * *")  # Disabled
 )
+@flushes_slack
 def scheduled_welcome_email():
     """
     Scheduled cron job to send a welcome email every 5 minutes.
     """
-    from google.oauth2.credentials import Credentials
-    from googleapiclient.discovery import build
-    from google.auth.transport.requests import Request
-
     slack_notify("📧 *Scheduled Welcome Email* - Sending to nick@leftclick.ai")
 
     try:
@@ -2013,18 +2184,7 @@ def scheduled_welcome_email():
             slack_error("Welcome email: No Google token configured")
             return {"status": "error", "error": "No Google token"}
 
-        creds = Credentials(
-            token=token_data["token"],
-            refresh_token=token_data["refresh_token"],
-            token_uri=token_data["token_uri"],
-            client_id=token_data["client_id"],
-            client_secret=token_data["client_secret"],
-            scopes=token_data["scopes"]
-        )
-        if creds.expired:
-            creds.refresh(Request())
-
-        service = build("gmail", "v1", credentials=creds)
+        service = get_service("gmail", "v1", token_data=token_data)
 
         # Build welcome email
         timestamp = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S UTC")
@@ -2062,12 +2222,12 @@ Your Automation System""")
     timeout=300,
     # schedule=modal.Cron("0 * * * *")  # DISABLED - uncomment to re-enable hourly scraping
 )
+@flushes_slack
 def hourly_lead_scraper():
     """
     Hourly cron job to scrape leads and append to Google Sheet.
     Runs at the top of every hour.
     """
-    from apify_client import ApifyClient
 
     config = load_cron_config()
     scraper_config = config.get("hourly_scraper", {})
@@ -2090,7 +2250,7 @@ def hourly_lead_scraper():
         slack_error("APIFY_API_TOKEN not configured")
         return {"status": "error", "error": "No Apify token"}
 
-    client = ApifyClient(api_token)
+    client = get_apify_client(api_token)
 
     full_search = f"{search_query} in {location}"
     run_input = {
@@ -2153,31 +2313,33 @@ def hourly_lead_scraper():
 # ============================================================================
 
 # Background function for full lead scraping workflow
-@app.function(image=image, secrets=ALL_SECRETS, timeout=1800)  # 30 min timeout for full workflow
-def scrape_leads_background(query: str, location: str, limit: int, sheet_id: str, sheet_url: str):
+@app.function(image=image, secrets=ALL_SECRETS, timeout=1800, max_containers=JOB_CONCURRENCY)  # 30 min timeout for full workflow
+@flushes_slack
+def scrape_leads_background(query: str, location: str, limit: int, sheet_id: str, sheet_url: str, job_id: str = None):
     """
     Background task: Full lead scraping workflow.
     1. Scrape leads via Apify
     2. Upload to Google Sheet
     3. Enrich with AnyMailFinder
     4. Casualize company names
+
+    Progress goes to job `job_id` (see GET /jobs), which can cancel it between steps.
     """
-    from apify_client import ApifyClient
     import gspread
-    import anthropic
-    from google.oauth2.credentials import Credentials as UserCredentials
-    from google.auth.transport.requests import Request
-    import requests as http_requests
 
+    job = JobContext(job_store, job_id)
     try:
+        job.start()
+
         # ===== STEP 1: Scrape with Apify =====
         slack_notify(f"📥 *Step 1/4: Scraping*\nQuery: {query}\nLimit: {limit}")
+        job.stage("scrape", 1, 4, f"Scraping: {query}")
 
         api_token = os.getenv("APIFY_API_TOKEN")
         if not api_token:
             raise ValueError("APIFY_API_TOKEN not configured")
 
-        apify_client = ApifyClient(api_token)
+        apify_client = get_apify_client(api_token)
 
         run_input = {
             "fetch_count": limit,
@@ -2189,102 +2351,86 @@ def scrape_leads_background(query: str, location: str, limit: int, sheet_id: str
 
         run = apify_client.actor("code_crafter/leads-finder").call(run_input=run_input)
 
+        # Opt-in (SUPABASE_LEADS_TABLE): stream leads into Postgres in batches as they arrive
+        leads_sink = get_sink(LEADS_TABLE, on_conflict=LEADS_CONFLICT, log=logger.info) \
+            if os.getenv("SUPABASE_LEADS_TABLE") else None
+
         results = []
         for item in apify_client.dataset(run["defaultDatasetId"]).iterate_items():
             results.append(item)
+            if leads_sink:
+                leads_sink.extend(lead_rows([item], source="apify"))
 
         logger.info(f"Scraped {len(results)} leads")
+        job.partial("scrape", {"leads_found": len(results)})
+        if leads_sink:
+            leads_sink.flush()
+            logger.info(f"Supabase leads: {leads_sink.stats}")
 
         if not results:
             slack_notify(f"⚠️ *No leads found for query: {query}*")
-            return {"status": "no_results", "leads_found": 0}
+            result = {"status": "no_results", "leads_found": 0}
+            job.finish(result)
+            return result
 
         # ===== STEP 2: Upload to Google Sheet =====
         slack_notify(f"📤 *Step 2/4: Uploading {len(results)} leads to Sheet*")
-
-        import pandas as pd
+        job.stage("upload", 2, 4, f"Uploading {len(results)} leads to Sheet")
 
         token_data = json.loads(os.getenv("GOOGLE_TOKEN_JSON"))
-        creds = UserCredentials(
-            token=token_data["token"],
-            refresh_token=token_data["refresh_token"],
-            token_uri=token_data["token_uri"],
-            client_id=token_data["client_id"],
-            client_secret=token_data["client_secret"],
-            scopes=token_data["scopes"]
-        )
-        if creds.expired:
-            creds.refresh(Request())
 
-        gc = gspread.authorize(creds)
+        gc = get_gspread_client(token_data=token_data)
         sh = gc.open_by_key(sheet_id)
         worksheet = sh.get_worksheet(0)
 
-        # Use pandas to flatten JSON like the real update_sheet.py does
-        df = pd.json_normalize(results)
-
-        # Add three casual columns for first_name, company_name, city
-        # Insert casual_first_name after first_name
-        if "first_name" in df.columns:
-            idx = df.columns.get_loc("first_name")
-            df.insert(idx + 1, "casual_first_name", "")
-
-        # Insert casual_company_name after company_name
-        if "company_name" in df.columns:
-            idx = df.columns.get_loc("company_name")
-            df.insert(idx + 1, "casual_company_name", "")
-
-        # Insert casual_city_name after city
-        if "city" in df.columns:
-            idx = df.columns.get_loc("city")
-            df.insert(idx + 1, "casual_city_name", "")
-
-        # Convert NaN to empty strings for gspread
-        df = df.fillna("")
-
-        # Prepare data: headers + rows
-        headers = df.columns.tolist()
-        rows = [headers] + df.values.tolist()
-
-        # Resize worksheet if needed
-        required_rows = len(rows)
-        required_cols = len(headers)
-        if required_rows > worksheet.row_count or required_cols > worksheet.col_count:
-            worksheet.resize(rows=max(required_rows, worksheet.row_count), cols=max(required_cols, worksheet.col_count))
+        # Flatten nested Apify fields one record at a time (registry keeps column order stable),
+        # with an empty casual column after first_name, company_name and city
+        flattener = RowFlattener("scrape_leads", insert_after={
+            "first_name": "casual_first_name",
+            "company_name": "casual_company_name",
+            "city": "casual_city_name",
+        })
 
-        # Upload all data
-        worksheet.update(values=rows, range_name="A1")
+        # Header + rows, streamed in parallel chunks under the Sheets write quota
+        upload_stats = upload_row_stream(worksheet, flattener.table(results), log=logger.info)
+        if flattener.late_columns:
+            worksheet.update(values=[flattener.columns], range_name="A1")
+        logger.info(f"Sheet upload: {upload_stats}")
+        job.partial("upload", upload_stats)
 
         # ===== STEP 3: Enrich with AnyMailFinder =====
         slack_notify(f"📧 *Step 3/4: Enriching emails with AnyMailFinder*")
+        job.stage("enrich", 3, 4, "Enriching emails with AnyMailFinder")
 
         amf_api_key = os.getenv("ANYMAILFINDER_API_KEY")
         if not amf_api_key:
             slack_notify("⚠️ ANYMAILFINDER_API_KEY not configured, skipping enrichment")
         else:
-            # Get rows that need enrichment (no email)
-            all_data = worksheet.get_all_values()
-            header_row = all_data[0]
+            # Get rows that need enrichment (no email), streaming only the columns used here
+            header_row = worksheet.row_values(1)
 
             # Find column indices
             email_col = header_row.index("email") if "email" in header_row else -1
-            company_col = header_row.index("company_name") if "company_name" in header_row else -1
-            contact_col = header_row.index("contact_name") if "contact_name" in header_row else -1
-            website_col = header_row.index("website") if "website" in header_row else -1
+            wanted = [c for c in ("email", "company_name", "contact_name", "website") if c in header_row]
 
-            enriched_count = 0
-            for row_idx, row in enumerate(all_data[1:], start=2):  # Skip header, 1-indexed in sheets
-                if email_col >= 0 and row[email_col]:  # Already has email
+            found_emails = {}  # (row, col) -> email, written together after the loop
+            suppression = get_suppression_store()  # Domains already uploaded to Instantly
+            suppressed = 0
+            for row_idx, row in iter_rows(worksheet, wanted, headers=header_row):
+                if row.get("email"):  # Already has email
                     continue
 
-                company_name = row[company_col] if company_col >= 0 else ""
-                contact_name = row[contact_col] if contact_col >= 0 else ""
-                website = row[website_col] if website_col >= 0 else ""
+                company_name = row.get("company_name", "")
+                contact_name = row.get("contact_name", "")
+                website = row.get("website", "")
 
                 # Extract domain from website
                 domain = ""
                 if website:
                     domain = website.replace("https://", "").replace("http://", "").replace("www.", "").split("/")[0]
+                if domain and suppression.contains_domain(domain):
+                    suppressed += 1
+                    continue
 
                 # Parse contact name
                 name_parts = contact_name.split() if contact_name else []
@@ -2309,141 +2455,104 @@ def scrape_leads_background(query: str, location: str, limit: int, sheet_id: str
                         amf_body["company_name"] = company_name
 
                     if (first_name or contact_name) and (domain or company_name):
-                        resp = http_requests.post(amf_url, json=amf_body, headers=amf_headers, timeout=30)
+                        resp = get_http_session().post(amf_url, json=amf_body, headers=amf_headers, timeout=30)
                         if resp.status_code == 200:
                             data = resp.json()
                             email = data.get("email", "")
-                            if email:
-                                # Update cell
-                                cell = f"{chr(65 + email_col)}{row_idx}"
-                                worksheet.update_acell(cell, email)
-                                enriched_count += 1
+                            if email and email_col >= 0:
+                                found_emails[(row_idx, email_col)] = email
                 except Exception as e:
                     logger.warning(f"AMF error for {contact_name}: {e}")
 
+            # Only the found emails, coalesced into ranges in one batch_update
+            if found_emails:
+                batch_write(worksheet, coalesce_cells(found_emails))
+            enriched_count = len(found_emails)
+            if suppressed:
+                logger.info(f"Skipped {suppressed} rows whose domain is already suppressed")
             slack_notify(f"✅ Enriched {enriched_count} emails")
+            job.partial("enrich", {"emails_found": enriched_count})
 
         # ===== STEP 4: Casualize first names, company names, and cities =====
         slack_notify(f"✨ *Step 4/4: Casualizing names (first, company, city)*")
+        job.stage("casualize", 4, 4, "Casualizing names (first, company, city)")
 
         gemini_key = os.getenv("GEMINI_API_KEY")
         if not gemini_key:
             slack_notify("⚠️ GEMINI_API_KEY not configured, skipping casualization")
         else:
-            genai.configure(api_key=gemini_key)
+            configure_genai(gemini_key)
             model = genai.GenerativeModel('gemini-flash-latest')
 
-            # Re-fetch data
-            all_data = worksheet.get_all_values()
-            header_row = all_data[0]
+            # Re-fetch only the input and casual columns
+            header_row = worksheet.row_values(1)
 
             # Find column indices
-            first_name_col = header_row.index("first_name") if "first_name" in header_row else -1
-            company_col = header_row.index("company_name") if "company_name" in header_row else -1
-            city_col = header_row.index("city") if "city" in header_row else -1
             casual_first_col = header_row.index("casual_first_name") if "casual_first_name" in header_row else -1
             casual_company_col = header_row.index("casual_company_name") if "casual_company_name" in header_row else -1
             casual_city_col = header_row.index("casual_city_name") if "casual_city_name" in header_row else -1
 
-            # Batch process 50 at a time
-            BATCH_SIZE = 50
-            data_rows = all_data[1:]
-            total_batches = (len(data_rows) + BATCH_SIZE - 1) // BATCH_SIZE
-
-            for batch_num, batch_start in enumerate(range(0, len(data_rows), BATCH_SIZE), 1):
-                batch_end = min(batch_start + BATCH_SIZE, len(data_rows))
-                batch_rows = data_rows[batch_start:batch_end]
-
-                # Build records for this batch
-                records = []
-                for row in batch_rows:
-                    first_name = row[first_name_col] if first_name_col >= 0 and len(row) > first_name_col else ""
-                    company_name = row[company_col] if company_col >= 0 and len(row) > company_col else ""
-                    city = row[city_col] if city_col >= 0 and len(row) > city_col else ""
-                    records.append({
-                        "first_name": first_name,
-                        "company_name": company_name,
-                        "city": city
-                    })
-
-                if not any(r["first_name"] or r["company_name"] or r["city"] for r in records):
-                    continue
-
-                # Format as compact JSON
-                records_json = json.dumps([
-                    {"id": i+1, "first_name": r["first_name"], "company_name": r["company_name"], "city": r["city"]}
-                    for i, r in enumerate(records)
-                ])
-
-                prompt = f"""Convert to casual forms for cold emails. Return ONLY valid JSON array.
-
-Rules:
-- first_name: Common nicknames (William→Will, Jennifer→Jen), keep if no nickname
-- company_name: Remove "The", legal suffixes (LLC/Inc/Corp/Ltd), generic words (Realty/Real Estate/Group/Services). Use "you guys" if too generic
-- city: Local nicknames (San Francisco→SF, Philadelphia→Philly), keep if none
-
-Input: {records_json}
-
-Output JSON only (no markdown, no explanations):"""
-
-                try:
-                    response = model.generate_content(prompt)
-                    response_text = response.text.strip()
-
-                    # Remove markdown code blocks if present
-                    if "```json" in response_text:
-                        response_text = response_text.split("```json")[1].split("```")[0].strip()
-                    elif "```" in response_text:
-                        response_text = response_text.split("```")[1].split("```")[0].strip()
-
-                    # Parse JSON response
-                    results_json = json.loads(response_text)
-
-                    # Update cells in batch
-                    updates = []
-                    for i, result in enumerate(results_json):
-                        row_num = batch_start + i + 2  # +2 for header and 1-indexing
-
-                        if casual_first_col >= 0:
-                            casual_first = result.get("casual_first_name", result.get("first_name", ""))
-                            cell = f"{column_letter(casual_first_col)}{row_num}"
-                            updates.append({"range": cell, "values": [[casual_first]]})
-
-                        if casual_company_col >= 0:
-                            casual_company = result.get("casual_company_name", result.get("company_name", ""))
-                            cell = f"{column_letter(casual_company_col)}{row_num}"
-                            updates.append({"range": cell, "values": [[casual_company]]})
-
-                        if casual_city_col >= 0:
-                            casual_city = result.get("casual_city_name", result.get("city", ""))
-                            cell = f"{column_letter(casual_city_col)}{row_num}"
-                            updates.append({"range": cell, "values": [[casual_city]]})
-
-                    if updates:
-                        worksheet.batch_update(updates)
-
-                    logger.info(f"Batch {batch_num}/{total_batches} complete")
+            casual_names = ("casual_first_name", "casual_company_name", "casual_city_name")
+            wanted = [c for c in ("first_name", "company_name", "city") + casual_names if c in header_row]
+
+            # Rules, shared cache and adaptive Gemini batches (see casualize_engine.py)
+            row_indexes, records, existing = [], [], {}
+            for row_num, row in iter_rows(worksheet, wanted, headers=header_row):
+                existing[row_num - 1] = {c: row[c] for c in casual_names if c in row}
+                record = {
+                    "first_name": row.get("first_name", ""),
+                    "company_name": row.get("company_name", ""),
+                    "city": row.get("city", ""),
+                }
+                if any(record.values()):
+                    row_indexes.append(row_num - 1)
+                    records.append(record)
 
-                except Exception as e:
-                    logger.warning(f"Casualization batch {batch_num} error: {e}")
+            engine = CasualizeEngine(
+                model, COMBINED_SPEC, cache=CasualizeCache(backend=casualize_cache_dict), log=logger.info
+            )
+            outputs = engine.run(records)
+
+            # Every casual column in one batched write
+            columns = {
+                name: col for name, col in (
+                    ("casual_first_name", casual_first_col),
+                    ("casual_company_name", casual_company_col),
+                    ("casual_city_name", casual_city_col),
+                ) if col >= 0
+            }
+            updates = build_column_updates(existing, dict(zip(row_indexes, outputs)), columns)
+            if updates:
+                worksheet.batch_update(updates)
+            logger.info(f"Casualization stats: {engine.stats.as_dict()}")
+            job.partial("casualize", engine.stats.as_dict())
 
         # ===== COMPLETE =====
         slack_notify(f"✅ *Lead Scraping Complete!*\nLeads: {len(results)}\nSheet: {sheet_url}")
 
-        return {
+        result = {
             "status": "success",
             "leads_found": len(results),
             "sheet_url": sheet_url
         }
+        job.finish(result)
+        return result
 
+    except JobCancelled:
+        slack_notify(f"🛑 *Lead scraping cancelled*\nQuery: {query}\nSheet: {sheet_url}")
+        job.cancelled()
+        return {"status": "cancelled", "job_id": job_id}
     except Exception as e:
         logger.error(f"Background scrape error: {e}")
         slack_error(f"Lead scraping failed: {str(e)}")
+        job.fail(str(e))
         return {"status": "error", "error": str(e)}
 
 
-# @app.function(image=image, secrets=ALL_SECRETS, timeout=60)
-# @modal.fastapi_endpoint(method="GET")
+@app.function(image=image, secrets=ALL_SECRETS, timeout=60)
+@modal.fastapi_endpoint(method="GET")
+@flushes_slack
+def scrape_leads(query: str = "", location: str = "United States", limit: int = 100):
     """
     Execution-only: Scrape leads with full workflow.
 
@@ -2456,12 +2565,10 @@ Output JSON only (no markdown, no explanations):"""
     3. Enriches emails with AnyMailFinder
     4. Casualizes company names
 
-    Monitor progress via Slack notifications.
+    Poll GET /jobs?job_id=... (returned here) for progress; Slack still gets notifications.
     """
     from fastapi.responses import JSONResponse
     import gspread
-    from google.oauth2.credentials import Credentials as UserCredentials
-    from google.auth.transport.requests import Request
 
     if not query:
         return JSONResponse({
@@ -2473,18 +2580,8 @@ Output JSON only (no markdown, no explanations):"""
     try:
         # Create Google Sheet immediately
         token_data = json.loads(os.getenv("GOOGLE_TOKEN_JSON"))
-        creds = UserCredentials(
-            token=token_data["token"],
-            refresh_token=token_data["refresh_token"],
-            token_uri=token_data["token_uri"],
-            client_id=token_data["client_id"],
-            client_secret=token_data["client_secret"],
-            scopes=token_data["scopes"]
-        )
-        if creds.expired:
-            creds.refresh(Request())
 
-        gc = gspread.authorize(creds)
+        gc = get_gspread_client(token_data=token_data)
 
         sheet_name = f"Leads - {query} - {datetime.utcnow().strftime('%Y-%m-%d %H:%M')}"
         sh = gc.create(sheet_name)
@@ -2494,13 +2591,16 @@ Output JSON only (no markdown, no explanations):"""
         # Don't add headers yet - background task will set them based on actual Apify response fields
         slack_notify(f"🚀 *Lead Scraping Started*\nQuery: {query}\nLocation: {location}\nLimit: {limit}\nSheet: {sheet_url}")
 
-        # Spawn background task
-        scrape_leads_background.spawn(query, location, limit, sheet_id, sheet_url)
+        # Spawn background task as a job
+        job = start_job("scrape_leads", {"query": query, "location": location, "limit": limit,
+                                         "sheet_id": sheet_id, "sheet_url": sheet_url})
 
         # Return 201 immediately
         return JSONResponse({
             "status": "accepted",
-            "message": "Lead scraping started. Monitor Slack for progress.",
+            "message": "Lead scraping started. Poll status_url for progress.",
+            "job_id": job["id"],
+            "status_url": f"/jobs?job_id={job['id']}",
             "sheet_url": sheet_url,
             "sheet_name": sheet_name,
             "workflow": [
@@ -2574,7 +2674,6 @@ def generate_proposal(request_body: dict = None):
     slack_notify(f"📄 *Proposal Generation Started*\nClient: {request_body.get('client', {}).get('company', 'Unknown')}")
 
     try:
-        import requests
 
         API_KEY = os.getenv("PANDADOC_API_KEY")
         if not API_KEY:
@@ -2627,7 +2726,7 @@ def generate_proposal(request_body: dict = None):
             "Content-Type": "application/json"
         }
 
-        response = requests.post(API_URL, json=payload, headers=headers)
+        response = get_http_session().post(API_URL, json=payload, headers=headers)
         response.raise_for_status()
 
         doc_data = response.json()
@@ -2710,8 +2809,6 @@ def create_proposal_from_transcript(transcript: str = "sales", demo: bool = True
     - demo: If true, uses stored demo transcripts (default: true)
     """
     from fastapi.responses import JSONResponse
-    import anthropic
-    import requests
 
     transcript_map = {
         "kickoff": "/app/demo_kickoff_call_transcript.md",
@@ -2739,7 +2836,7 @@ def create_proposal_from_transcript(transcript: str = "sales", demo: bool = True
         if not gemini_key:
             raise ValueError("GEMINI_API_KEY not configured")
 
-        genai.configure(api_key=gemini_key)
+        configure_genai(gemini_key)
         model = genai.GenerativeModel('gemini-flash-latest')
 
         extraction_prompt = f"""Analyze this sales call transcript and extract the following information. Return ONLY valid JSON.
@@ -2853,7 +2950,7 @@ Return ONLY the JSON, no markdown code blocks or explanations."""
             "Content-Type": "application/json"
         }
 
-        response = requests.post(API_URL, json=payload, headers=headers, timeout=30)
+        response = get_http_session().post(API_URL, json=payload, headers=headers, timeout=30)
         response.raise_for_status()
 
         doc_data = response.json()
@@ -2899,14 +2996,13 @@ def scrape_youtube_with_apify(keywords: list, max_per_keyword: int, days_back: i
     FAST YouTube search using streamers/youtube-scraper.
     ~15 seconds for 3 results. Pay-per-result pricing.
     """
-    from apify_client import ApifyClient
 
     apify_token = os.getenv("APIFY_API_TOKEN")
     if not apify_token:
         slack_notify("Error: APIFY_API_TOKEN not set")
         return []
 
-    client = ApifyClient(apify_token)
+    client = get_apify_client(apify_token)
     all_videos = []
 
     for keyword in keywords:
@@ -3011,7 +3107,8 @@ Do not use any markdown formatting (no asterisks, no bullet points, no headers w
         return f"Error summarizing: {e}"
 
 
-@app.function(image=image, secrets=ALL_SECRETS, timeout=1800)
+@app.function(image=image, secrets=ALL_SECRETS, timeout=1800, max_containers=JOB_CONCURRENCY)
+@flushes_slack
 def youtube_outliers_background(
     keywords: list,
     days_back: int,
@@ -3019,21 +3116,23 @@ def youtube_outliers_background(
     top_n: int,
     min_score: float,
     sheet_id: str,
-    sheet_url: str
+    sheet_url: str,
+    job_id: str = None
 ):
     """
     Background task: Full YouTube outlier detection workflow.
+    Progress goes to job `job_id` (see GET /jobs), which can cancel it between steps.
     """
     from concurrent.futures import ThreadPoolExecutor, as_completed
-    from apify_client import ApifyClient
-    import anthropic
     import gspread
-    from google.oauth2.credentials import Credentials as UserCredentials
-    from google.auth.transport.requests import Request
 
+    job = JobContext(job_store, job_id)
     try:
+        job.start()
+
         # Step 1: Scrape Videos using Apify (yt-dlp blocked on cloud IPs)
         slack_notify(f"Step 1/5: Scraping YouTube via Apify\nKeywords: {len(keywords)}, Days: {days_back}")
+        job.stage("scrape", 1, 5, "Scraping YouTube via Apify")
 
         all_videos = scrape_youtube_with_apify(keywords, max_videos_per_keyword, days_back)
 
@@ -3041,16 +3140,20 @@ def youtube_outliers_background(
         videos = list(unique_videos)
 
         slack_notify(f"Found {len(videos)} unique videos")
+        job.partial("scrape", {"videos_found": len(videos)})
 
         if not videos:
             slack_notify("No videos found - check Apify actor availability")
-            return {"status": "no_results", "videos_found": 0}
+            result = {"status": "no_results", "videos_found": 0}
+            job.finish(result)
+            return result
 
         # Step 2: Skip channel stats (too slow with Apify) - use absolute view ranking instead
         slack_notify("Step 2/5: Ranking by view count (skipping channel stats for speed)")
 
         # Step 3: Rank videos by view count (simple but effective)
         slack_notify("Step 3/5: Selecting top videos by views")
+        job.stage("rank", 3, 5, "Selecting top videos by views")
 
         # Filter videos with view counts and sort by views
         videos_with_views = [v for v in videos if v.get("view_count") and v.get("view_count") > 0]
@@ -3065,20 +3168,24 @@ def youtube_outliers_background(
             video["channel_avg"] = 0  # Not calculated
 
         slack_notify(f"Selected top {len(top_outliers)} videos by view count")
+        job.partial("rank", {"outliers": len(top_outliers)})
 
         if not top_outliers:
             slack_notify("No outliers found above threshold")
-            return {"status": "no_outliers", "videos_found": len(videos)}
+            result = {"status": "no_outliers", "videos_found": len(videos)}
+            job.finish(result)
+            return result
 
         # Step 4: Fetch Transcripts & Summarize
         slack_notify("Step 4/5: Fetching transcripts & summarizing")
+        job.stage("summarize", 4, 5, "Fetching transcripts & summarizing")
 
         apify_token = os.getenv("APIFY_API_TOKEN")
         anthropic_key = os.getenv("ANTHROPIC_API_KEY")
 
         if apify_token and anthropic_key:
-            apify_client = ApifyClient(apify_token)
-            claude_client = anthropic.Anthropic(api_key=anthropic_key)
+            apify_client = get_apify_client(apify_token)
+            claude_client = get_anthropic_client(anthropic_key)
 
             def process_outlier(video):
                 video_id = video.get("video_id")
@@ -3098,20 +3205,11 @@ def youtube_outliers_background(
 
         # Step 5: Upload to Google Sheet
         slack_notify(f"Step 5/5: Uploading {len(top_outliers)} outliers to Sheet")
+        job.stage("upload", 5, 5, f"Uploading {len(top_outliers)} outliers to Sheet")
 
         token_data = json.loads(os.getenv("GOOGLE_TOKEN_JSON"))
-        creds = UserCredentials(
-            token=token_data["token"],
-            refresh_token=token_data["refresh_token"],
-            token_uri=token_data["token_uri"],
-            client_id=token_data["client_id"],
-            client_secret=token_data["client_secret"],
-            scopes=token_data["scopes"]
-        )
-        if creds.expired:
-            creds.refresh(Request())
 
-        gc = gspread.authorize(creds)
+        gc = get_gspread_client(token_data=token_data)
         sh = gc.open_by_key(sheet_id)
         ws = sh.get_worksheet(0)
 
@@ -3136,16 +3234,24 @@ def youtube_outliers_background(
 
         slack_notify(f"YouTube Outliers Complete!\nOutliers: {len(top_outliers)}\nSheet: {sheet_url}")
 
-        return {"status": "success", "videos_scraped": len(videos), "outliers_found": len(top_outliers), "sheet_url": sheet_url}
+        result = {"status": "success", "videos_scraped": len(videos), "outliers_found": len(top_outliers), "sheet_url": sheet_url}
+        job.finish(result)
+        return result
 
+    except JobCancelled:
+        slack_notify(f"YouTube outliers cancelled\nSheet: {sheet_url}")
+        job.cancelled()
+        return {"status": "cancelled", "job_id": job_id}
     except Exception as e:
         logger.error(f"YouTube outliers error: {e}")
         slack_error(f"YouTube outliers failed: {str(e)}")
+        job.fail(str(e))
         return {"status": "error", "error": str(e)}
 
 
-# @app.function(image=image, secrets=ALL_SECRETS, timeout=60)
-# @modal.fastapi_endpoint(method="GET")
+@app.function(image=image, secrets=ALL_SECRETS, timeout=60)
+@modal.fastapi_endpoint(method="GET")
+@flushes_slack
 def youtube_outliers(
     keywords: str = "",
     days: int = 7,
@@ -3160,12 +3266,10 @@ def youtube_outliers(
 
     Returns 201 immediately with Google Sheet URL. Background task scrapes,
     calculates scores, fetches transcripts, summarizes, and uploads to Sheet.
-    Monitor progress via Slack.
+    Poll GET /jobs?job_id=... (returned here) for progress.
     """
     from fastapi.responses import JSONResponse
     import gspread
-    from google.oauth2.credentials import Credentials as UserCredentials
-    from google.auth.transport.requests import Request
 
     default_keywords = [
         "agentic workflows",
@@ -3182,18 +3286,8 @@ def youtube_outliers(
 
     try:
         token_data = json.loads(os.getenv("GOOGLE_TOKEN_JSON"))
-        creds = UserCredentials(
-            token=token_data["token"],
-            refresh_token=token_data["refresh_token"],
-            token_uri=token_data["token_uri"],
-            client_id=token_data["client_id"],
-            client_secret=token_data["client_secret"],
-            scopes=token_data["scopes"]
-        )
-        if creds.expired:
-            creds.refresh(Request())
 
-        gc = gspread.authorize(creds)
+        gc = get_gspread_client(token_data=token_data)
         sheet_name = f"YouTube Outliers {datetime.utcnow().strftime('%Y-%m-%d %H:%M')}"
         sh = gc.create(sheet_name)
         sheet_id = sh.id
@@ -3201,11 +3295,16 @@ def youtube_outliers(
 
         slack_notify(f"YouTube Outliers Started\nKeywords: {', '.join(keyword_list[:3])}{'...' if len(keyword_list) > 3 else ''}\nDays: {days}\nSheet: {sheet_url}")
 
-        youtube_outliers_background.spawn(keyword_list, days, max_per_keyword, top_n, min_score, sheet_id, sheet_url)
+        job = start_job("youtube_outliers", {
+            "keywords": keyword_list, "days_back": days, "max_videos_per_keyword": max_per_keyword,
+            "top_n": top_n, "min_score": min_score, "sheet_id": sheet_id, "sheet_url": sheet_url,
+        })
 
         return JSONResponse({
             "status": "accepted",
-            "message": "YouTube outlier detection started. Monitor Slack for progress.",
+            "message": "YouTube outlier detection started. Poll status_url for progress.",
+            "job_id": job["id"],
+            "status_url": f"/jobs?job_id={job['id']}",
             "sheet_url": sheet_url,
             "sheet_name": sheet_name,
             "keywords": keyword_list,
@@ -3225,6 +3324,85 @@ def youtube_outliers(
         return JSONResponse({"status": "error", "error": str(e)}, status_code=500)
 
 
+# ============================================================================
+# BACKGROUND JOBS
+# ============================================================================
+
+def start_job(kind: str, params: dict) -> dict:
+    """Create a job record and spawn its background function; returns the record (poll GET /jobs?job_id=...)."""
+    record = job_store.create(kind, params)
+    _spawn_job(record)
+    return record
+
+
+def _spawn_job(record: dict):
+    functions = {
+        "scrape_leads": scrape_leads_background,
+        "youtube_outliers": youtube_outliers_background,
+        "directive": directive_background,
+    }
+    call = functions[record["kind"]].spawn(**record["params"], job_id=record["id"])
+    job_store.set_call_id(record["id"], call.object_id)
+
+
+@app.function(image=image, secrets=ALL_SECRETS)
+@modal.fastapi_endpoint(method="GET")
+def jobs(job_id: str = "", kind: str = "", limit: int = 20, action: str = ""):
+    """
+    Status of background jobs (read-only; cancel and retry are POST /job-action).
+
+    GET /jobs                          - recent jobs (optionally &kind=scrape_leads)
+    GET /jobs?job_id=ID                - one job: status, progress, partial results per stage, result
+    """
+    from fastapi.responses import JSONResponse
+
+    if action:
+        return JSONResponse({"status": "error", "error": "Job actions need POST /job-action?job_id=ID&action=" + action},
+                            status_code=405)
+    if not job_id:
+        return {"jobs": job_store.list(kind or None, limit)}
+
+    record = job_store.get(job_id)
+    if record is None:
+        return JSONResponse({"status": "error", "error": f"Job not found: {job_id}"}, status_code=404)
+    return record
+
+
+@app.function(image=image, secrets=ALL_SECRETS)
+@modal.fastapi_endpoint(method="POST")
+def job_action(job_id: str, action: str):
+    """
+    Change a background job.
+
+    POST /job-action?job_id=ID&action=cancel  - stop it (a running job stops at its next stage)
+    POST /job-action?job_id=ID&action=retry   - run a finished job again with the same parameters
+    """
+    from fastapi.responses import JSONResponse
+
+    if action == "cancel":
+        record = job_store.cancel(job_id)
+        if record and record["status"] == "cancelled" and job_store.call_id(job_id):
+            # Still queued: drop the pending call instead of starting a container just to exit
+            try:
+                modal.FunctionCall.from_id(job_store.call_id(job_id)).cancel()
+            except Exception as e:
+                logger.warning(f"Could not cancel call for job {job_id}: {e}")
+    elif action == "retry":
+        if job_store.get(job_id) is None:
+            return JSONResponse({"status": "error", "error": f"Job not found: {job_id}"}, status_code=404)
+        record = job_store.retry(job_id)
+        if record is None:
+            return JSONResponse({"status": "error", "error": "Only finished jobs can be retried",
+                                 "job": job_store.get(job_id)}, status_code=409)
+        _spawn_job(record)
+    else:
+        return JSONResponse({"status": "error", "error": f"Unknown action: {action}"}, status_code=400)
+
+    if record is None:
+        return JSONResponse({"status": "error", "error": f"Job not found: {job_id}"}, status_code=404)
+    return record
+
+
 @app.local_entrypoint()
 def main():
     print("Modal Gemini Orchestrator - Directive Edition")
@@ -3236,6 +3414,8 @@ def main():
     print("  POST /directive?slug={slug}  - Execute a directive")
     print("  GET  /agent?query=...        - General-purpose agent (proof of concept)")
     print("  GET  /list-webhooks          - List available slugs")
+    print("  GET  /jobs?job_id=...        - Background job status")
+    print("  POST /job-action?job_id=...&action=cancel|retry - Cancel or re-run a job")
     print("  GET  /test-email             - Test email")
     print("")
     print("Execution-Only Endpoints (for local agent orchestration):")
@@ -22,9 +22,11 @@ import time
 import glob
 from datetime import datetime
 from pathlib import Path
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from google.auth.transport.requests import Request
+
+try:
+    from execution.google_clients import get_service
+except ImportError:
+    from google_clients import get_service
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("onboarding-post-kickoff")
@@ -34,28 +36,12 @@ KB_SPREADSHEET_ID = "1QS7MYDm6RUTzzTWoMfX-0G9NzT5EoE2KiCE7iR1DBLM"
 WORKSPACE_DIR = Path(__file__).parent.parent
 
 
-def get_google_creds(token_data: dict) -> Credentials:
-    """Get Google credentials from token data."""
-    creds = Credentials(
-        token=token_data["token"],
-        refresh_token=token_data["refresh_token"],
-        token_uri=token_data["token_uri"],
-        client_id=token_data["client_id"],
-        client_secret=token_data["client_secret"],
-        scopes=token_data["scopes"]
-    )
-    if creds.expired:
-        creds.refresh(Request())
-    return creds
-
-
 def send_email(to: str, subject: str, body: str, token_data: dict) -> dict:
     """Send email via Gmail API as HTML."""
     from email.mime.text import MIMEText
     import base64
 
-    creds = get_google_creds(token_data)
-    service = build("gmail", "v1", credentials=creds)
+    service = get_service("gmail", "v1", token_data=token_data)
 
     # Convert plain text to HTML with proper line breaks
     html_body = body.replace('\n', '<br>')
@@ -74,8 +60,7 @@ def send_email(to: str, subject: str, body: str, token_data: dict) -> dict:
 
 def update_knowledge_base(client_name: str, service_type: str, offers: list, social_proof: str, token_data: dict) -> bool:
     """Add entry to auto-reply knowledge base."""
-    creds = get_google_creds(token_data)
-    service = build("sheets", "v4", credentials=creds)
+    service = get_service("sheets", "v4", token_data=token_data)
 
     # Build knowledge base content
     offers_text = "\n".join([f"- {offer}" for offer in offers])
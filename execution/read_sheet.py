@@ -9,11 +9,9 @@ import json
 import argparse
 from datetime import datetime
 from dotenv import load_dotenv
-import gspread
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-import pickle
+
+from google_clients import get_gspread_client
+from sheet_reader import iter_records, UNFORMATTED
 
 # Load environment variables
 load_dotenv()
@@ -34,60 +32,20 @@ def extract_sheet_id(url):
     return url  # Assume it's already just the ID
 
 
-def get_credentials():
-    """
-    Get OAuth2 credentials for Google Sheets API.
-    Uses token.json if available, otherwise prompts for authorization.
-
-    Returns:
-        Credentials object
-    """
-    scopes = [
-        'https://www.googleapis.com/auth/spreadsheets',
-        'https://www.googleapis.com/auth/drive'
-    ]
-
-    creds = None
-
-    # Check if token.json exists
-    if os.path.exists('token.json'):
-        try:
-            with open('token.json', 'r') as token:
-                token_data = json.load(token)
-                creds = Credentials.from_authorized_user_info(token_data, scopes)
-        except Exception as e:
-            print(f"Error loading token: {e}")
-
-    # If credentials are invalid or don't exist, get new ones
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            creds_file = os.getenv("GOOGLE_APPLICATION_CREDENTIALS", "credentials.json")
-            flow = InstalledAppFlow.from_client_secrets_file(creds_file, scopes)
-            creds = flow.run_local_server(port=0)
-
-        # Save credentials for next run
-        with open('token.json', 'w') as token:
-            token.write(creds.to_json())
-
-    return creds
-
-
-def read_google_sheet(sheet_url, worksheet_name=None):
+def read_google_sheet(sheet_url, worksheet_name=None, columns=None):
     """
     Read data from a Google Sheet.
 
     Args:
         sheet_url: Google Sheets URL or ID
         worksheet_name: Name of the specific worksheet (default: first sheet)
+        columns: Header names to read (default: all columns)
 
     Returns:
         List of dictionaries containing lead data
     """
     try:
-        creds = get_credentials()
-        client = gspread.authorize(creds)
+        client = get_gspread_client()
 
         # Open the spreadsheet
         sheet_id = extract_sheet_id(sheet_url)
@@ -99,8 +57,8 @@ def read_google_sheet(sheet_url, worksheet_name=None):
         else:
             worksheet = spreadsheet.sheet1  # First sheet by default
 
-        # Get all records as dictionaries
-        records = worksheet.get_all_records()
+        # Stream records as dictionaries, fetching only the requested columns
+        records = list(iter_records(worksheet, columns, render=UNFORMATTED))
 
         print(f"Successfully read {len(records)} leads from Google Sheet")
         return records
@@ -142,11 +100,12 @@ def main():
     parser = argparse.ArgumentParser(description="Read leads from Google Sheets")
     parser.add_argument("--url", required=True, help="Google Sheets URL or ID")
     parser.add_argument("--worksheet", help="Name of the worksheet (default: first sheet)")
+    parser.add_argument("--columns", nargs="*", help="Only read these columns (default: all)")
     parser.add_argument("--output_prefix", default="leads_input", help="Prefix for output file")
 
     args = parser.parse_args()
 
-    leads = read_google_sheet(args.url, args.worksheet)
+    leads = read_google_sheet(args.url, args.worksheet, args.columns)
 
     if leads:
         filename = save_leads(leads, prefix=args.output_prefix)
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Streaming flattener for nested scrape records (a replacement for pandas.json_normalize).
+
+json_normalize needs the whole dataset in memory and makes several copies of
+it, and its column order depends on which fields happen to show up in a run.
+RowFlattener instead:
+1. Flattens nested dicts one record at a time ({"a": {"b": 1}} -> {"a.b": 1})
+2. Derives the column schema from a sample of the first records, ordered by a
+   schema registry (.tmp/schemas.json) so the same source always yields the same
+   column order across runs
+3. Emits each record as a row list aligned to that schema. Columns first seen
+   after the sample are appended on the right and registered for next time
+
+Lists and leftover nested values become JSON strings; None becomes "".
+
+Usage:
+    from record_flattener import RowFlattener
+    flattener = RowFlattener("apify_leads")
+    for row in flattener.rows(records):   # generator; header is flattener.columns
+        ...
+
+    python3 execution/record_flattener.py leads.json --schema apify_leads --output .tmp/leads.csv
+    python3 execution/record_flattener.py --show apify_leads
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import itertools
+import threading
+from typing import Dict, Iterable, Iterator, List
+
+SCHEMA_REGISTRY_PATH = os.getenv("SCHEMA_REGISTRY_PATH", os.path.join(".tmp", "schemas.json"))
+SAMPLE_SIZE = 500
+SEPARATOR = "."
+
+
+def flatten_record(record: dict, sep: str = SEPARATOR, prefix: str = "", out: dict = None) -> dict:
+    """Flatten nested dicts into dotted keys, in the record's own key order."""
+    out = {} if out is None else out
+    for key, value in record.items():
+        name = f"{prefix}{sep}{key}" if prefix else str(key)
+        if isinstance(value, dict) and value:
+            flatten_record(value, sep, name, out)
+        else:
+            out[name] = value
+    return out
+
+
+def cell_value(value):
+    """Sheet-safe cell: None -> "", lists and empty dicts -> JSON, everything else as is."""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value != value:  # NaN
+        return ""
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+class SchemaRegistry:
+    """Column order per source, persisted as JSON so every run lays out columns the same way."""
+
+    def __init__(self, path: str = SCHEMA_REGISTRY_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._schemas = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r") as f:
+                    self._schemas = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Schema registry unreadable ({e}), starting fresh", file=sys.stderr)
+
+    def columns(self, name: str) -> List[str]:
+        return list(self._schemas.get(name, {}).get("columns", []))
+
+    def register(self, name: str, columns: List[str]) -> List[str]:
+        """Append columns the registry hasn't seen; returns the full registered order."""
+        with self._lock:
+            entry = self._schemas.setdefault(name, {"columns": []})
+            known = set(entry["columns"])
+            added = [c for c in columns if c not in known]
+            if added:
+                entry["columns"].extend(added)
+                entry["updated_at"] = time.time()
+                self._save()
+            return list(entry["columns"])
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(self._schemas, f, indent=2)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass  # Read-only filesystem; the in-memory order still applies to this run
+
+
+class RowFlattener:
+    """Turns a stream of nested records into row lists with a stable, registry-ordered header."""
+
+    def __init__(self, schema: str = None, registry: SchemaRegistry = None, sample_size: int = SAMPLE_SIZE,
+                 insert_after: Dict[str, str] = None, sep: str = SEPARATOR):
+        """
+        Args:
+            schema: Registry name for this source (None: first-seen order, nothing persisted)
+            sample_size: Records read ahead to fix the column order
+            insert_after: Extra empty columns to place after an existing one,
+                e.g. {"first_name": "casual_first_name"}
+        """
+        self.schema = schema
+        self.registry = registry if registry is not None else (SchemaRegistry() if schema else None)
+        self.sample_size = sample_size
+        self.insert_after = insert_after or {}
+        self.sep = sep
+        self.columns: List[str] = []
+        self._index: Dict[str, int] = {}
+        self.late_columns: List[str] = []
+        self.count = 0
+
+    def prime(self, sample: List[dict]) -> List[str]:
+        """Fix the column order from a sample of (unflattened) records."""
+        seen = {}
+        for record in sample:
+            for name in flatten_record(record, self.sep):
+                seen.setdefault(name, None)
+        present = list(seen)
+        if self.registry is not None:
+            # Registered order first (only columns this run has), then new ones
+            registered = self.registry.register(self.schema, present)
+            present = [c for c in registered if c in seen]
+
+        columns = []
+        for name in present:
+            columns.append(name)
+            extra = self.insert_after.get(name)
+            if extra and extra not in seen:
+                columns.append(extra)
+        self.columns = columns
+        self._index = {name: i for i, name in enumerate(columns)}
+        return columns
+
+    def row(self, record: dict) -> list:
+        """One record as a row aligned to self.columns (new columns are appended on the fly)."""
+        flat = flatten_record(record, self.sep)
+        for name in flat:
+            if name not in self._index:
+                self._index[name] = len(self.columns)
+                self.columns.append(name)
+                self.late_columns.append(name)
+        values = [""] * len(self.columns)
+        for name, value in flat.items():
+            values[self._index[name]] = cell_value(value)
+        self.count += 1
+        return values
+
+    def rows(self, records: Iterable[dict]) -> Iterator[list]:
+        """Prime on the first sample_size records, then yield one row per record."""
+        iterator = iter(records)
+        sample = list(itertools.islice(iterator, self.sample_size))
+        self.prime(sample)
+        for record in itertools.chain(sample, iterator):
+            yield self.row(record)
+        if self.late_columns and self.registry is not None:
+            self.registry.register(self.schema, self.late_columns)
+
+    def table(self, records: Iterable[dict]) -> Iterator[list]:
+        """
+        The header row, then one row per record.
+
+        If late_columns is non-empty afterwards, the header sent first is
+        missing them and should be rewritten with self.columns.
+        """
+        rows = self.rows(records)
+        first = next(rows, None)  # Primes the schema
+        yield list(self.columns)
+        if first is not None:
+            yield first
+        yield from rows
+
+    def records(self, records: Iterable[dict]) -> Iterator[dict]:
+        """Like rows(), as flat dicts keyed by column."""
+        for values in self.rows(records):
+            yield dict(zip(self.columns, values))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flatten nested JSON records into a stable column layout")
+    parser.add_argument("json_file", nargs="?", help="JSON list of records")
+    parser.add_argument("--schema", help="Schema registry name for this source")
+    parser.add_argument("--output", help="Write rows to this CSV file")
+    parser.add_argument("--show", metavar="SCHEMA", help="Print the registered columns for a schema")
+    args = parser.parse_args()
+
+    if args.show:
+        print(json.dumps(SchemaRegistry().columns(args.show), indent=2))
+        return 0
+    if not args.json_file:
+        parser.error("json_file is required unless --show is given")
+
+    with open(args.json_file, "r") as f:
+        records = json.load(f)
+
+    flattener = RowFlattener(args.schema)
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            rows = flattener.rows(records)
+            first = next(rows, None)
+            writer.writerow(flattener.columns)
+            if first is not None:
+                writer.writerow(first)
+            writer.writerows(rows)
+        print(f"Wrote {flattener.count} rows x {len(flattener.columns)} columns to {args.output}")
+        if flattener.late_columns:
+            # The header was written before these appeared; the next run picks them up from the registry
+            print(f"Columns found after the sample (not in this file's header): {flattener.late_columns}")
+    else:
+        for row in flattener.rows(records):
+            pass
+        print(json.dumps({"rows": flattener.count, "columns": flattener.columns,
+                          "late_columns": flattener.late_columns}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
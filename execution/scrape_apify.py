@@ -11,12 +11,17 @@ from datetime import datetime
 from dotenv import load_dotenv
 from apify_client import ApifyClient
 
+from supabase_sink import SupabaseSink, lead_rows, LEADS_TABLE, LEADS_CONFLICT
+from lead_store import get_lead_store
+
 # Load environment variables
 load_dotenv()
 
-def scrape_leads(query, location, max_items, job_titles=None, company_keywords=None, require_email=True):
+def scrape_leads(query, location, max_items, job_titles=None, company_keywords=None, require_email=True, sink=None):
     """
     Run the Apify actor to scrape leads.
+
+    With a SupabaseSink, each lead is also streamed into it as the dataset is read.
     """
     api_token = os.getenv("APIFY_API_TOKEN")
     if not api_token:
@@ -60,6 +65,8 @@ def scrape_leads(query, location, max_items, job_titles=None, company_keywords=N
     results = []
     for item in client.dataset(run["defaultDatasetId"]).iterate_items():
         results.append(item)
+        if sink:
+            sink.extend(lead_rows([item], source="apify"))
             
     return results
 
@@ -83,6 +90,13 @@ def save_results(results, prefix="leads"):
     print(f"Results saved to {filename}")
     return filename
 
+def save_to_list(results, list_name):
+    """Upsert results into a lead store list, for enrich_emails.py / casualize --list and publishing."""
+    saved = get_lead_store().import_records(list_name, results)
+    print(f"Lead store '{list_name}': {saved['inserted']} new, {saved['updated']} updated, "
+          f"{saved['unchanged']} unchanged")
+    return saved
+
 def main():
     parser = argparse.ArgumentParser(description="Scrape leads using Apify")
     parser.add_argument("--query", required=True, help="Search query (e.g., 'Plumbers')")
@@ -92,15 +106,23 @@ def main():
     parser.add_argument("--job_titles", nargs='+', help="Specific job titles to target (e.g., CEO Founder)")
     parser.add_argument("--company_keywords", nargs='+', help="Company keywords to filter (e.g., 'software' 'SaaS')")
     parser.add_argument("--no-email-filter", action="store_true", help="Don't filter by validated emails (faster, larger results)")
+    parser.add_argument("--supabase", action="store_true", help=f"Also upsert leads into the Supabase '{LEADS_TABLE}' table")
+    parser.add_argument("--list", help="Also save leads to this lead store list")
 
     args = parser.parse_args()
 
     require_email = not args.no_email_filter
-    results = scrape_leads(args.query, args.location, args.max_items, args.job_titles, args.company_keywords, require_email)
+    sink = SupabaseSink(LEADS_TABLE, on_conflict=LEADS_CONFLICT) if args.supabase else None
+    results = scrape_leads(args.query, args.location, args.max_items, args.job_titles, args.company_keywords, require_email, sink)
+    if sink:
+        sink.close()
+        print(f"Supabase: {sink.stats['written']} leads written, {sink.stats['failed']} failed")
     
     if results:
         print(f"Found {len(results)} leads.")
         save_results(results, prefix=args.output_prefix)
+        if args.list:
+            save_to_list(results, args.list)
     else:
         print("No leads found or error occurred.")
         sys.exit(1)
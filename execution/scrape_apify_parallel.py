@@ -15,6 +15,11 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 import hashlib
 import time
 
+try:
+    from execution.lead_store import get_lead_store
+except ImportError:
+    from lead_store import get_lead_store
+
 # Load environment variables
 load_dotenv()
 
@@ -550,6 +555,7 @@ def main():
     parser.add_argument("--output_prefix", default="leads", help="Prefix for the output file")
     parser.add_argument("--company_keywords", nargs='+', help="Company keywords to filter (leads mode only)")
     parser.add_argument("--no-email-filter", action="store_true", help="Don't filter by validated emails (leads mode only)")
+    parser.add_argument("--list", help="Also save leads to this lead store list (leads mode only)")
     
     # Competitor research arguments
     parser.add_argument("--industry", help="Industry/business type - Required for competitors mode")
@@ -626,6 +632,9 @@ def main():
         print(f"💰 Cost: SAME as sequential ({args.total_count} total leads)")
 
         save_results(results, prefix=args.output_prefix)
+        if args.list:
+            saved = get_lead_store().import_records(args.list, results)
+            print(f"Lead store '{args.list}': {saved['inserted']} new, {saved['updated']} updated")
     else:
         print("\n❌ No leads found or error occurred.")
         sys.exit(1)
@@ -15,6 +15,8 @@ from datetime import datetime
 from dotenv import load_dotenv
 from apify_client import ApifyClient
 
+from supabase_sink import SupabaseSink, lead_rows, LEADS_TABLE, LEADS_CONFLICT
+
 load_dotenv()
 
 ACTOR_ID = "compass/crawler-google-places"
@@ -25,6 +27,7 @@ def scrape_google_maps(
     max_results: int = 10,
     location: str = None,
     language: str = "en",
+    sink: SupabaseSink = None,
 ) -> list[dict]:
     """
     Run the Apify Google Maps scraper actor.
@@ -34,6 +37,7 @@ def scrape_google_maps(
         max_results: Maximum number of places to scrape
         location: Optional location to focus the search
         language: Language code (default: en)
+        sink: Optional SupabaseSink; each place is streamed into it as the dataset is read
 
     Returns:
         List of business dictionaries with scraped data
@@ -75,6 +79,8 @@ def scrape_google_maps(
     results = []
     for item in client.dataset(run["defaultDatasetId"]).iterate_items():
         results.append(item)
+        if sink:
+            sink.extend(lead_rows([item], source="gmaps_raw", key_column="placeId"))
 
     print(f"Retrieved {len(results)} businesses from Google Maps")
     return results
@@ -107,15 +113,21 @@ def main():
     parser.add_argument("--language", default="en", help="Language code (default: en)")
     parser.add_argument("--output", default="gmaps", help="Output file prefix (default: gmaps)")
     parser.add_argument("--json", action="store_true", help="Output results as JSON to stdout")
+    parser.add_argument("--supabase", action="store_true", help=f"Also upsert places into the Supabase '{LEADS_TABLE}' table")
 
     args = parser.parse_args()
 
+    sink = SupabaseSink(LEADS_TABLE, on_conflict=LEADS_CONFLICT) if args.supabase else None
     results = scrape_google_maps(
         search_query=args.search,
         max_results=args.limit,
         location=args.location,
         language=args.language,
+        sink=sink,
     )
+    if sink:
+        sink.close()
+        print(f"Supabase: {sink.stats['written']} places written, {sink.stats['failed']} failed", file=sys.stderr)
 
     if not results:
         print("No results found or error occurred.")
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Cached loading of procedural script modules.
+
+run_procedural_script used to exec the script file on every call, re-running
+its top-level imports (apify_client, reportlab, google.generativeai, ...).
+ScriptModuleCache executes each script once per process and hands back the
+same module object until the file changes:
+- a stat() per call compares mtime and size with the loaded version
+- if those moved, a content hash decides whether the script actually changed
+  (a touched or re-copied file keeps its module)
+- a per-script lock means concurrent first calls execute the module only once
+
+prewarm() loads a list of scripts up front, e.g. at container start.
+
+Usage:
+    from script_loader import ScriptModuleCache
+    scripts = ScriptModuleCache("/app/execution")
+    scripts.prewarm(["instantly_autoreply"])
+    module = scripts.load("instantly_autoreply")   # cached after the first call
+
+    python3 execution/script_loader.py instantly_autoreply analyze_social_presence
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+import importlib.util
+from typing import Dict, List
+
+
+def _file_hash(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+class ScriptModuleCache:
+    """Modules loaded from <directory>/<name>.py, reloaded only when the file's content changes."""
+
+    def __init__(self, directory: str, log=print):
+        self.directory = directory
+        self.log = log
+        self._entries: Dict[str, dict] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "loads": 0, "reloads": 0}
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.py")
+
+    def _name_lock(self, name: str) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(name, threading.Lock())
+
+    def load(self, name: str):
+        """
+        The module for script `name`, executing it only if it isn't loaded or its file changed.
+
+        Raises FileNotFoundError if the script doesn't exist; errors raised while
+        executing the module propagate and nothing is cached.
+        """
+        path = self.path(name)
+        st = os.stat(path)
+        stamp = (st.st_mtime_ns, st.st_size)
+
+        entry = self._entries.get(name)
+        if entry is not None and entry["stamp"] == stamp:
+            self.stats["hits"] += 1
+            return entry["module"]
+
+        with self._name_lock(name):
+            entry = self._entries.get(name)
+            if entry is not None and entry["stamp"] == stamp:
+                self.stats["hits"] += 1
+                return entry["module"]
+
+            digest = _file_hash(path)
+            if entry is not None and entry["hash"] == digest:
+                # Touched or re-copied without changes
+                entry["stamp"] = stamp
+                self.stats["hits"] += 1
+                return entry["module"]
+
+            start = time.time()
+            spec = importlib.util.spec_from_file_location(name, path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            elapsed = time.time() - start
+
+            self.stats["reloads" if entry is not None else "loads"] += 1
+            self._entries[name] = {"module": module, "stamp": stamp, "hash": digest,
+                                   "loaded_at": time.time(), "load_seconds": elapsed}
+            self.log(f"[scripts] {'Reloaded' if entry is not None else 'Loaded'} {name} in {elapsed:.2f}s")
+            return module
+
+    def prewarm(self, names: List[str]) -> Dict[str, object]:
+        """Load each script now; returns {name: load seconds, or the error message}."""
+        results = {}
+        for name in names:
+            start = time.time()
+            try:
+                self.load(name)
+                results[name] = round(time.time() - start, 3)
+            except Exception as e:
+                results[name] = f"error: {e}"
+                self.log(f"[scripts] Could not pre-warm {name}: {e}")
+        return results
+
+    def invalidate(self, name: str = None):
+        """Drop one cached module (or all); the next load() executes it again."""
+        with self._lock:
+            if name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(name, None)
+
+    def loaded(self) -> Dict[str, dict]:
+        return {name: {"hash": e["hash"][:12], "load_seconds": round(e["load_seconds"], 3),
+                       "loaded_at": e["loaded_at"]} for name, e in self._entries.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time cold vs cached loads of procedural scripts")
+    parser.add_argument("scripts", nargs="+", help="Script names (without .py)")
+    parser.add_argument("--dir", default=os.path.dirname(os.path.abspath(__file__)), help="Scripts directory")
+    args = parser.parse_args()
+
+    sys.path.insert(0, args.dir)
+    cache = ScriptModuleCache(args.dir)
+    cold = cache.prewarm(args.scripts)
+    start = time.time()
+    for name in args.scripts:
+        if not isinstance(cold[name], str):
+            cache.load(name)
+    warm = time.time() - start
+    print(json.dumps({"cold": cold, "warm_total_seconds": round(warm, 6), "stats": cache.stats}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Shared, process-wide API clients (the non-Google counterpart of google_clients.py).
+
+Request handlers used to build a new SDK client, and with it a new connection
+pool and TLS handshake, on every call. These getters create each client once
+per process (once per Modal container) on first use and hand back the same
+object afterwards, so keep-alive connections are reused across requests:
+- get_http_session(): requests.Session with a pooled, keep-alive adapter
+- configure_genai(): google.generativeai configured once per API key
+- get_anthropic_client(), get_apify_client(), get_firecrawl_app()
+- get_supabase_client() lives in supabase_sink.py
+
+Clients are keyed by their credential, so rotating a key builds a new client.
+
+Usage:
+    from service_clients import get_http_session, configure_genai, get_apify_client
+    resp = get_http_session().get(url, timeout=30)
+    configure_genai(os.getenv("GEMINI_API_KEY"))
+    client = get_apify_client(os.getenv("APIFY_API_TOKEN"))
+
+    python3 execution/service_clients.py
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+
+POOL_CONNECTIONS = 20  # Hosts kept in the pool
+POOL_MAXSIZE = 50      # Connections per host (threaded scrapes and enrichment share one session)
+
+_lock = threading.Lock()
+_clients = {}  # (kind, credential) -> client
+_created = {}  # (kind, credential) -> seconds spent building it
+
+
+def _get_or_create(kind: str, credential, factory):
+    key = (kind, credential)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            start = time.time()
+            client = factory()
+            _clients[key] = client
+            _created[key] = time.time() - start
+        return client
+
+
+def get_http_session():
+    """requests.Session with keep-alive connection pooling, shared by the whole process."""
+    def build():
+        import requests
+        from requests.adapters import HTTPAdapter
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+    return _get_or_create("http", None, build)
+
+
+def configure_genai(api_key: str):
+    """Configure google.generativeai once per key (configure() rebuilds its client on every call)."""
+    def build():
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        return genai
+    with _lock:
+        # Only one key can be active in the SDK; drop others so switching back reconfigures
+        for key in [k for k in _clients if k[0] == "genai" and k[1] != api_key]:
+            del _clients[key]
+    return _get_or_create("genai", api_key, build)
+
+
+def get_anthropic_client(api_key: str = None):
+    api_key = api_key or os.getenv("ANTHROPIC_API_KEY")
+
+    def build():
+        import anthropic
+        return anthropic.Anthropic(api_key=api_key)
+    return _get_or_create("anthropic", api_key, build)
+
+
+def get_apify_client(token: str = None):
+    token = token or os.getenv("APIFY_API_TOKEN") or os.getenv("APIFY_API_KEY")
+
+    def build():
+        from apify_client import ApifyClient
+        return ApifyClient(token)
+    return _get_or_create("apify", token, build)
+
+
+def get_firecrawl_app(api_key: str = None):
+    api_key = api_key or os.getenv("FIRECRAWL_API_KEY")
+
+    def build():
+        from firecrawl import FirecrawlApp
+        return FirecrawlApp(api_key=api_key)
+    return _get_or_create("firecrawl", api_key, build)
+
+
+def loaded() -> dict:
+    """Which clients exist in this process and what they cost to build."""
+    return {kind: round(seconds, 3) for (kind, _), seconds in _created.items()}
+
+
+def main():
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    getters = {
+        "http": get_http_session,
+        "anthropic": get_anthropic_client,
+        "apify": get_apify_client,
+        "firecrawl": get_firecrawl_app,
+    }
+    timings = {}
+    for name, getter in getters.items():
+        try:
+            start = time.time()
+            getter()
+            cold = time.time() - start
+            start = time.time()
+            getter()
+            timings[name] = {"first": round(cold, 4), "cached": round(time.time() - start, 6)}
+        except Exception as e:
+            timings[name] = {"error": str(e)}
+    print(json.dumps(timings, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
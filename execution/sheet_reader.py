@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Streaming, column-projected reads from a Google Sheet.
+
+get_all_values()/get_all_records() download every column of every row. These
+helpers read the header once, then fetch only the requested columns (as A1
+ranges, adjacent columns merged) in row windows with one batchGet request per
+window, yielding records lazily.
+
+Usage:
+    from sheet_reader import iter_records, iter_rows
+    for record in iter_records(worksheet, ["email", "first_name"]):
+        ...
+    for row_num, record in iter_rows(worksheet, ["email"]):   # 1-based sheet row
+        ...
+
+    python3 execution/sheet_reader.py --url SHEET_URL --columns email first_name --limit 5
+"""
+
+import sys
+import json
+import argparse
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+ROW_WINDOW = 5000
+
+FORMATTED = "FORMATTED_VALUE"      # What get_all_values() returns (strings as displayed)
+UNFORMATTED = "UNFORMATTED_VALUE"  # Numbers and booleans as typed values
+
+
+def column_letter(n):
+    """Convert column index (0-based) to Excel-style column letter (A, B, ... Z, AA, AB, ...)."""
+    result = ""
+    while n >= 0:
+        result = chr(65 + (n % 26)) + result
+        n = n // 26 - 1
+    return result
+
+
+def _column_runs(indexes: List[int]) -> List[Tuple[int, int]]:
+    """[0, 1, 2, 5, 7, 8] -> [(0, 2), (5, 5), (7, 8)]"""
+    runs = []
+    for idx in sorted(set(indexes)):
+        if runs and runs[-1][1] == idx - 1:
+            runs[-1] = (runs[-1][0], idx)
+        else:
+            runs.append((idx, idx))
+    return runs
+
+
+def _quoted_title(title: str) -> str:
+    return "'" + title.replace("'", "''") + "'"
+
+
+def iter_rows(worksheet, columns: Optional[List[str]] = None, window: int = ROW_WINDOW,
+              render: str = FORMATTED, types: Optional[Dict[str, Callable]] = None,
+              headers: Optional[List[str]] = None, skip_empty: bool = True,
+              start_row: int = 2, end_row: Optional[int] = None) -> Iterator[Tuple[int, dict]]:
+    """
+    Yield (sheet_row_number, record) for each data row, fetching only `columns`.
+
+    Args:
+        worksheet: gspread Worksheet
+        columns: Header names to fetch (default: every column). Missing names raise ValueError.
+        window: Rows per request
+        render: FORMATTED (strings, like get_all_values) or UNFORMATTED (typed numbers/bools)
+        types: Optional {column: converter} applied to non-empty values
+        headers: Header row if the caller already has it (saves one request)
+        skip_empty: Skip rows where every projected column is empty
+        start_row, end_row: 1-based sheet rows to read (default: row 2 to the end of the grid)
+    """
+    headers = headers if headers is not None else worksheet.row_values(1)
+    columns = columns or [h for h in headers if h]
+    missing = [c for c in columns if c not in headers]
+    if missing:
+        raise ValueError(f"Columns not in sheet header: {missing}")
+
+    wanted = {c: headers.index(c) for c in columns}
+    runs = _column_runs(list(wanted.values()))
+    # For each run, the (column, offset within run) pairs to pick out of it
+    picks = [[(c, i - start) for c, i in wanted.items() if start <= i <= end] for start, end in runs]
+    types = types or {}
+    title = _quoted_title(worksheet.title)
+    spreadsheet = worksheet.spreadsheet
+
+    last = min(end_row, worksheet.row_count) if end_row else worksheet.row_count
+    top = max(start_row, 2)
+    while top <= last:
+        bottom = min(top + window - 1, last)
+        ranges = [f"{title}!{column_letter(s)}{top}:{column_letter(e)}{bottom}" for s, e in runs]
+        response = spreadsheet.values_batch_get(
+            ranges, params={"majorDimension": "ROWS", "valueRenderOption": render}
+        )
+        blocks = [vr.get("values", []) for vr in response.get("valueRanges", [])]
+        # Trailing empty rows are omitted, so a window can come back short or empty;
+        # keep going to the end of the grid since other columns may still hold data
+        height = max((len(b) for b in blocks), default=0)
+        for offset in range(height):
+            record = {}
+            for block, run_picks in zip(blocks, picks):
+                row = block[offset] if offset < len(block) else []
+                for column, pos in run_picks:
+                    value = row[pos] if pos < len(row) else ""
+                    if value != "" and column in types:
+                        value = types[column](value)
+                    record[column] = value
+            if skip_empty and all(v == "" for v in record.values()):
+                continue
+            yield top + offset, record
+        top = bottom + 1
+
+
+def iter_records(worksheet, columns: Optional[List[str]] = None, **kwargs) -> Iterator[dict]:
+    """Like iter_rows, without the row numbers."""
+    for _, record in iter_rows(worksheet, columns, **kwargs):
+        yield record
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream selected columns from a Google Sheet")
+    parser.add_argument("--url", required=True, help="Google Sheets URL or ID")
+    parser.add_argument("--worksheet", help="Name of the worksheet (default: first sheet)")
+    parser.add_argument("--columns", nargs="*", help="Header names to read (default: all)")
+    parser.add_argument("--limit", type=int, help="Stop after N records")
+    parser.add_argument("--typed", action="store_true", help="Return numbers/booleans as typed values")
+    args = parser.parse_args()
+
+    from google_clients import get_gspread_client
+    from read_sheet import extract_sheet_id
+
+    spreadsheet = get_gspread_client().open_by_key(extract_sheet_id(args.url))
+    worksheet = spreadsheet.worksheet(args.worksheet) if args.worksheet else spreadsheet.sheet1
+    render = UNFORMATTED if args.typed else FORMATTED
+    for i, record in enumerate(iter_records(worksheet, args.columns, render=render)):
+        if args.limit and i >= args.limit:
+            break
+        print(json.dumps(record, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
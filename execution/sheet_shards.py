@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+Transparent sharding of one logical lead table across worksheets and spreadsheets.
+
+A single worksheet slows down sharply as it grows and a spreadsheet stops at
+10M cells. A ShardedSheet splits a table into shards of at most MAX_ROWS_PER_SHARD
+rows, optionally partitioned by a field (region, state, ...) or by month of a
+date field, and opens a new spreadsheet before the cell budget of the current
+one runs out. Every call touches one small shard, so latency stays flat as the
+total lead count grows.
+
+State lives in .tmp/shards/:
+- <name>.json  manifest: headers, key column, partitioning, and every shard's
+               spreadsheet, worksheet, partition and row count
+- <name>.db    key index (key -> shard) used for dedup and lookups
+
+Reads, appends and dedup all go through the manifest; nothing scans every shard
+except `reindex`, which rebuilds the key index from the sheets.
+
+Usage:
+    from sheet_shards import ShardedSheet
+    table = ShardedSheet.open("gmaps-leads", key_column="lead_id", partition_by="state")
+    table.append(records)
+    for record in table.iter_records(partition="TX"):
+        ...
+
+    python3 execution/sheet_shards.py append leads.json --name gmaps-leads --key lead_id --partition-by state
+    python3 execution/sheet_shards.py list --name gmaps-leads
+    python3 execution/sheet_shards.py export --name gmaps-leads --output .tmp/all_leads.json
+    python3 execution/sheet_shards.py reindex --name gmaps-leads
+"""
+
+import os
+import re
+import sys
+import json
+import sqlite3
+import argparse
+import threading
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+try:
+    from execution.google_clients import get_gspread_client
+    from execution.sheet_uploader import upload_rows, ensure_grid
+    from execution.sheet_reader import iter_records as iter_sheet_records
+except ImportError:
+    from google_clients import get_gspread_client
+    from sheet_uploader import upload_rows, ensure_grid
+    from sheet_reader import iter_records as iter_sheet_records
+
+SHARD_DIR = os.getenv("SHEET_SHARD_DIR", os.path.join(".tmp", "shards"))
+MAX_ROWS_PER_SHARD = int(os.getenv("SHEET_SHARD_MAX_ROWS", "50000"))
+SPREADSHEET_CELL_BUDGET = 9_000_000  # Headroom under the 10M-cell spreadsheet limit
+DEFAULT_PARTITION = "leads"
+
+
+def partition_value(record: dict, partition_by: Optional[str]) -> str:
+    """
+    Partition of a record.
+
+    partition_by is None (one partition), a field name ("state"), or
+    "month:<field>" to partition by the YYYY-MM of a date field.
+    """
+    if not partition_by:
+        return DEFAULT_PARTITION
+    if partition_by.startswith("month:"):
+        value = str(record.get(partition_by.split(":", 1)[1]) or "")
+        match = re.match(r"(\d{4})-(\d{2})", value)
+        return f"{match.group(1)}-{match.group(2)}" if match else datetime.now().strftime("%Y-%m")
+    value = str(record.get(partition_by) or "").strip()
+    return value or DEFAULT_PARTITION
+
+
+def _worksheet_title(partition: str, sequence: int) -> str:
+    # Sheet titles can't contain []:*?/\ and are capped at 100 characters
+    safe = re.sub(r"[\[\]:*?/\\']", "-", partition)[:90]
+    return f"{safe}-{sequence:03d}"
+
+
+class ShardedSheet:
+    """One logical table spread over many worksheets, addressed through a manifest."""
+
+    def __init__(self, name: str, manifest: dict, directory: str = SHARD_DIR, client=None, log=print):
+        self.name = name
+        self.manifest = manifest
+        self.directory = directory
+        self.log = log
+        self._client = client
+        self._spreadsheets = {}
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(os.path.join(directory, f"{name}.db"), check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS shard_keys ("
+            " key TEXT PRIMARY KEY,"
+            " shard_id TEXT NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        self.db.commit()
+
+    @classmethod
+    def open(cls, name: str, key_column: str = None, partition_by: str = None,
+             max_rows: int = MAX_ROWS_PER_SHARD, directory: str = SHARD_DIR, client=None, log=print):
+        """Load a table's manifest, or start a new one (key_column is required then)."""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{name}.json")
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                manifest = json.load(f)
+            if key_column and key_column != manifest["key_column"]:
+                raise ValueError(f"Table {name!r} is keyed by {manifest['key_column']!r}, not {key_column!r}")
+            if partition_by and partition_by != manifest["partition_by"]:
+                raise ValueError(f"Table {name!r} is partitioned by {manifest['partition_by']!r}, not {partition_by!r}")
+        else:
+            if not key_column:
+                raise ValueError(f"No shard manifest for {name!r}; pass key_column to create it")
+            manifest = {
+                "name": name,
+                "key_column": key_column,
+                "partition_by": partition_by,
+                "max_rows": max_rows,
+                "headers": [],
+                "shards": [],
+                "created_at": datetime.now().isoformat(),
+            }
+        return cls(name, manifest, directory=directory, client=client, log=log)
+
+    # -------------------------------------------------------------- manifest
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = get_gspread_client()
+        return self._client
+
+    def save(self):
+        path = os.path.join(self.directory, f"{self.name}.json")
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp, path)
+
+    @property
+    def shards(self) -> List[dict]:
+        return self.manifest["shards"]
+
+    def _spreadsheet(self, spreadsheet_id: str):
+        spreadsheet = self._spreadsheets.get(spreadsheet_id)
+        if spreadsheet is None:
+            spreadsheet = self._spreadsheets[spreadsheet_id] = self.client.open_by_key(spreadsheet_id)
+        return spreadsheet
+
+    def worksheet(self, shard: dict):
+        return self._spreadsheet(shard["spreadsheet_id"]).worksheet(shard["worksheet"])
+
+    def _cells_reserved(self, spreadsheet_id: str) -> int:
+        # Every shard can still grow to max_rows, so reserve its full size
+        full = (self.manifest["max_rows"] + 1) * max(1, len(self.manifest["headers"]))
+        return sum(max(s["grid_cells"], full) for s in self.shards if s["spreadsheet_id"] == spreadsheet_id)
+
+    def _new_shard(self, partition: str, rows_needed: int) -> dict:
+        """Create a worksheet for a partition, in a new spreadsheet when the current one is near its cell budget."""
+        width = max(1, len(self.manifest["headers"]))
+        grid_rows = min(rows_needed, self.manifest["max_rows"]) + 1
+        sequence = sum(1 for s in self.shards if s["partition"] == partition) + 1
+        title = _worksheet_title(partition, sequence)
+
+        spreadsheet_id = self.shards[-1]["spreadsheet_id"] if self.shards else None
+        full_cells = (self.manifest["max_rows"] + 1) * width
+        if spreadsheet_id is None or self._cells_reserved(spreadsheet_id) + full_cells > SPREADSHEET_CELL_BUDGET:
+            part = len({s["spreadsheet_id"] for s in self.shards}) + 1
+            spreadsheet = self.client.create(f"{self.name} (part {part})")
+            # Reuse the default Sheet1 as the first shard instead of leaving it as dead cells
+            worksheet = spreadsheet.sheet1
+            worksheet.update_title(title)
+            worksheet.resize(rows=grid_rows, cols=width)
+            user_email = os.getenv("USER_EMAIL")
+            if user_email:
+                spreadsheet.share(user_email, perm_type='user', role='writer')
+            self._spreadsheets[spreadsheet.id] = spreadsheet
+            spreadsheet_id = spreadsheet.id
+            self.log(f"Created spreadsheet part {part}: {spreadsheet.url}")
+        else:
+            worksheet = self._spreadsheet(spreadsheet_id).add_worksheet(title=title, rows=grid_rows, cols=width)
+
+        worksheet.update(values=[self.manifest["headers"]], range_name="A1")
+        shard = {
+            "id": f"{spreadsheet_id}:{title}",
+            "spreadsheet_id": spreadsheet_id,
+            "worksheet": title,
+            "partition": partition,
+            "rows": 0,
+            "grid_cells": grid_rows * width,
+            "created_at": datetime.now().isoformat(),
+        }
+        self.shards.append(shard)
+        self.log(f"New shard {title} for partition '{partition}'")
+        return shard
+
+    def _extend_headers(self, records: List[dict]):
+        headers = self.manifest["headers"]
+        new = [field for record in records for field in record if field not in headers]
+        added = list(dict.fromkeys(new))
+        if not added:
+            return
+        headers.extend(added)
+        # Existing shards get the new columns in their header row
+        for shard in self.shards:
+            worksheet = self.worksheet(shard)
+            ensure_grid(worksheet, shard["rows"] + 1, len(headers))
+            worksheet.update(values=[headers], range_name="A1")
+            shard["grid_cells"] = max(shard["grid_cells"], (shard["rows"] + 1) * len(headers))
+
+    # ----------------------------------------------------------------- keys
+
+    def _key(self, record: dict) -> str:
+        return str(record.get(self.manifest["key_column"], "")).strip().lower()
+
+    def _known_keys(self, keys: List[str]) -> Dict[str, str]:
+        found = {}
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            found.update(self.db.execute(
+                f"SELECT key, shard_id FROM shard_keys WHERE key IN ({placeholders})", chunk
+            ).fetchall())
+        return found
+
+    def locate(self, key: str) -> Optional[dict]:
+        """Shard holding a key, from the local index (no sheet reads)."""
+        row = self.db.execute("SELECT shard_id FROM shard_keys WHERE key = ?", (str(key).strip().lower(),)).fetchone()
+        if row is None:
+            return None
+        return next((s for s in self.shards if s["id"] == row[0]), None)
+
+    def reindex(self) -> int:
+        """Rebuild the key index and row counts by reading each shard's key column."""
+        key_column = self.manifest["key_column"]
+        rows = []
+        for shard in self.shards:
+            count = 0
+            for record in iter_sheet_records(self.worksheet(shard), [key_column]):
+                key = self._key(record)
+                if key:
+                    rows.append((key, shard["id"]))
+                count += 1
+            shard["rows"] = count
+        with self.db:
+            self.db.execute("DELETE FROM shard_keys")
+            self.db.executemany("INSERT OR REPLACE INTO shard_keys (key, shard_id) VALUES (?, ?)", rows)
+        self.save()
+        self.log(f"Reindexed {len(rows)} keys across {len(self.shards)} shards")
+        return len(rows)
+
+    # --------------------------------------------------------------- writes
+
+    def append(self, records: List[dict]) -> dict:
+        """
+        Append records that aren't already in the table, routed to their partition's open shard.
+
+        Returns {'added', 'duplicates', 'skipped', 'shards_written', 'shards_created'}.
+        """
+        with self._lock:
+            keyed, skipped = {}, 0
+            for record in records:
+                key = self._key(record)
+                if not key:
+                    skipped += 1
+                    continue
+                keyed.setdefault(key, record)  # First occurrence wins
+            known = self._known_keys(list(keyed))
+            new = [(key, record) for key, record in keyed.items() if key not in known]
+            result = {"added": 0, "duplicates": len(keyed) - len(new), "skipped": skipped,
+                      "shards_written": 0, "shards_created": 0}
+            if not new:
+                return result
+
+            self._extend_headers([record for _, record in new])
+            headers = self.manifest["headers"]
+
+            by_partition = {}
+            for key, record in new:
+                by_partition.setdefault(partition_value(record, self.manifest["partition_by"]), []).append((key, record))
+
+            max_rows = self.manifest["max_rows"]
+            for partition, items in by_partition.items():
+                while items:
+                    shard = next((s for s in reversed(self.shards)
+                                  if s["partition"] == partition and s["rows"] < max_rows), None)
+                    if shard is None:
+                        shard = self._new_shard(partition, len(items))
+                        result["shards_created"] += 1
+                    take = items[:max_rows - shard["rows"]]
+                    items = items[len(take):]
+
+                    worksheet = self.worksheet(shard)
+                    rows = [[record.get(h, "") for h in headers] for _, record in take]
+                    # Rows go at a known offset, so chunks can upload in parallel
+                    upload_rows(worksheet, rows, start_row=shard["rows"] + 2, log=self.log)
+                    shard["rows"] += len(take)
+                    shard["grid_cells"] = max(shard["grid_cells"], (shard["rows"] + 1) * len(headers))
+                    with self.db:
+                        self.db.executemany(
+                            "INSERT OR REPLACE INTO shard_keys (key, shard_id) VALUES (?, ?)",
+                            [(key, shard["id"]) for key, _ in take]
+                        )
+                    self.save()
+                    result["added"] += len(take)
+                    result["shards_written"] += 1
+            return result
+
+    # ---------------------------------------------------------------- reads
+
+    def iter_records(self, partition: str = None, columns: List[str] = None) -> Iterator[dict]:
+        """Stream records shard by shard (optionally one partition, optionally projected)."""
+        for shard in self.shards:
+            if partition is not None and shard["partition"] != partition:
+                continue
+            if shard["rows"] == 0:
+                continue
+            yield from iter_sheet_records(self.worksheet(shard), columns)
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "key_column": self.manifest["key_column"],
+            "partition_by": self.manifest["partition_by"],
+            "rows": sum(s["rows"] for s in self.shards),
+            "shards": len(self.shards),
+            "spreadsheets": len({s["spreadsheet_id"] for s in self.shards}),
+            "partitions": sorted({s["partition"] for s in self.shards}),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded lead tables across worksheets and spreadsheets")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    append_parser = subparsers.add_parser("append", help="Append new records from a JSON file")
+    append_parser.add_argument("json_file", help="JSON list of records")
+    append_parser.add_argument("--key", help="Key column (required for a new table)")
+    append_parser.add_argument("--partition-by", help="Field, or month:<date field>, to partition on")
+    append_parser.add_argument("--max-rows", type=int, default=MAX_ROWS_PER_SHARD, help="Rows per shard")
+    list_parser = subparsers.add_parser("list", help="Show the shard manifest")
+    export_parser = subparsers.add_parser("export", help="Read every shard into one JSON file")
+    export_parser.add_argument("--output", required=True)
+    export_parser.add_argument("--partition", help="Only this partition")
+    reindex_parser = subparsers.add_parser("reindex", help="Rebuild the key index from the sheets")
+    for sub in (append_parser, list_parser, export_parser, reindex_parser):
+        sub.add_argument("--name", required=True, help="Logical table name")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    if args.command == "append":
+        table = ShardedSheet.open(args.name, key_column=args.key, partition_by=args.partition_by,
+                                  max_rows=args.max_rows)
+        with open(args.json_file, "r") as f:
+            records = json.load(f)
+        print(json.dumps(table.append(records), indent=2))
+    elif args.command == "list":
+        table = ShardedSheet.open(args.name)
+        print(json.dumps(table.stats(), indent=2))
+        for shard in table.shards:
+            print(f"  {shard['partition']:<20} {shard['worksheet']:<30} {shard['rows']:>8} rows  {shard['spreadsheet_id']}")
+    elif args.command == "export":
+        table = ShardedSheet.open(args.name)
+        records = list(table.iter_records(partition=args.partition))
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(records, f, indent=2)
+        print(f"Exported {len(records)} records to {args.output}")
+    else:
+        ShardedSheet.open(args.name).reindex()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
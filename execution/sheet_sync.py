@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+"""
+Row-hash delta sync between local records and a Google Sheet.
+
+Keeps a content hash and the cell values of every row last written to a
+worksheet (SQLite, .tmp/sheet_sync.db). A sync diffs the local records
+against that state and writes only the cells that changed, coalesced into
+rectangular ranges and sent as one batch_update, so an incremental update
+costs calls proportional to what changed rather than to the sheet size.
+
+Rows are matched by a key column (email, lead_id, place_id, ...), or by
+position when no key is given. New keys are appended below the last synced
+row and new fields become new columns on the right; existing columns never move.
+Only the fields a record actually has are compared: a column the record lacks
+keeps whatever is in the sheet (pass blank_absent to clear it instead).
+
+If the sheet was edited by hand, run `rebuild` to re-read it into the state.
+
+Usage:
+    from sheet_sync import SheetSync, coalesce_cells
+    SheetSync(worksheet, key_column="email").sync(records)
+    worksheet.batch_update(coalesce_cells({(row, col): value, ...}))
+
+    python3 execution/sheet_sync.py push leads.json --url SHEET_URL --key email
+    python3 execution/sheet_sync.py push leads.json --url SHEET_URL --key email --dry-run
+    python3 execution/sheet_sync.py rebuild --url SHEET_URL --key email
+    python3 execution/sheet_sync.py stats
+"""
+
+import os
+import sys
+import json
+import time
+import math
+import sqlite3
+import hashlib
+import argparse
+import threading
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from execution.sheet_uploader import TokenBucket, ensure_grid, column_letter, _with_retries, _default_limiter, MAX_BYTES_PER_CHUNK
+    from execution.sheet_reader import iter_rows, UNFORMATTED
+except ImportError:
+    from sheet_uploader import TokenBucket, ensure_grid, column_letter, _with_retries, _default_limiter, MAX_BYTES_PER_CHUNK
+    from sheet_reader import iter_rows, UNFORMATTED
+
+SYNC_PATH = os.getenv("SHEET_SYNC_PATH", os.path.join(".tmp", "sheet_sync.db"))
+
+
+def normalize_cell(value) -> str:
+    """Canonical text of a cell, so 5, 5.0 and "5" hash the same whichever way they were read."""
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        if math.isnan(value):
+            return ""
+        if value.is_integer():
+            return str(int(value))
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False, sort_keys=True)
+    return str(value)
+
+
+def write_value(value):
+    """Value to send to the API: numbers stay numbers, NaN/None become blank, nested values JSON."""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def row_hash(cells: List[str]) -> str:
+    return hashlib.sha1("\x1f".join(cells).encode("utf-8")).hexdigest()
+
+
+def coalesce_cells(cells: Dict[Tuple[int, int], object]) -> List[dict]:
+    """
+    Merge changed cells into as few rectangular ranges as possible.
+
+    Args:
+        cells: {(1-based row, 0-based column): value}
+
+    Returns:
+        A list of {'range', 'values'} dicts for worksheet.batch_update(). Cells
+        adjacent in a row form a run; identical runs on consecutive rows stack
+        into one rectangle.
+    """
+    by_row = {}
+    for (row, col), value in cells.items():
+        by_row.setdefault(row, {})[col] = value
+
+    open_blocks = {}   # Runs ending on the previous row: (start, end) -> [first_row, last_row, values]
+    blocks = []
+    for row in sorted(by_row):
+        cols = by_row[row]
+        runs = []
+        for col in sorted(cols):
+            if runs and runs[-1][1] == col - 1:
+                runs[-1][1] = col
+            else:
+                runs.append([col, col])
+        current = {}
+        for start, end in runs:
+            values = [cols[c] for c in range(start, end + 1)]
+            block = open_blocks.get((start, end))
+            if block and block[1] == row - 1:
+                block[1] = row
+                block[2].append(values)
+            else:
+                block = [row, row, [values]]
+                blocks.append(((start, end), block))
+            current[(start, end)] = block
+        open_blocks = current
+
+    return [
+        {"range": f"{column_letter(start)}{first}:{column_letter(end)}{last}", "values": values}
+        for (start, end), (first, last, values) in sorted(blocks, key=lambda b: (b[1][0], b[0][0]))
+    ]
+
+
+def batch_write(worksheet, updates: List[dict], value_input_option: str = "RAW",
+                limiter: TokenBucket = None, max_bytes: int = MAX_BYTES_PER_CHUNK) -> int:
+    """
+    Send ranges with as few batch_update calls as the payload limit allows (usually one).
+
+    Returns the number of requests made.
+    """
+    limiter = limiter or _default_limiter
+    stats = {"retries": 0, "lock": threading.Lock()}
+    requests_made, batch, size = 0, [], 0
+    for update in updates + [None]:
+        update_bytes = len(json.dumps(update, default=str)) if update else 0
+        if batch and (update is None or size + update_bytes > max_bytes):
+            _with_retries(
+                lambda b=batch: worksheet.batch_update(b, value_input_option=value_input_option),
+                limiter, stats
+            )
+            requests_made += 1
+            batch, size = [], 0
+        if update is not None:
+            batch.append(update)
+            size += update_bytes
+    return requests_made
+
+
+class SheetSync:
+    """Delta sync of records to one worksheet, with per-row hashes persisted in SQLite."""
+
+    def __init__(self, worksheet, key_column: str = None, path: str = SYNC_PATH,
+                 value_input_option: str = "RAW", log=print):
+        self.worksheet = worksheet
+        self.key_column = key_column
+        self.value_input_option = value_input_option
+        self.log = log
+        self.sheet_key = f"{worksheet.spreadsheet.id}:{worksheet.id}"
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS sync_sheets ("
+            " sheet_key TEXT PRIMARY KEY,"
+            " headers TEXT NOT NULL,"
+            " key_column TEXT,"
+            " synced_at REAL"
+            ")"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS sync_rows ("
+            " sheet_key TEXT NOT NULL,"
+            " row_key TEXT NOT NULL,"
+            " row_num INTEGER NOT NULL,"
+            " row_hash TEXT NOT NULL,"
+            " cells TEXT NOT NULL,"
+            " PRIMARY KEY (sheet_key, row_key)"
+            ") WITHOUT ROWID"
+        )
+        self.db.commit()
+
+    # ------------------------------------------------------------------ state
+
+    def _load(self) -> Tuple[Optional[List[str]], Dict[str, tuple]]:
+        row = self.db.execute(
+            "SELECT headers, key_column FROM sync_sheets WHERE sheet_key = ?", (self.sheet_key,)
+        ).fetchone()
+        if row is None:
+            return None, {}
+        headers, key_column = json.loads(row[0]), row[1]
+        if key_column != self.key_column:
+            raise ValueError(f"Sheet was synced with key column {key_column!r}, not {self.key_column!r}; run rebuild")
+        state = {
+            key: (row_num, digest, cells)
+            for key, row_num, digest, cells in self.db.execute(
+                "SELECT row_key, row_num, row_hash, cells FROM sync_rows WHERE sheet_key = ?", (self.sheet_key,)
+            )
+        }
+        return headers, state
+
+    def _save(self, headers: List[str], rows: Dict[str, tuple], replace: bool = False):
+        with self.db:
+            if replace:
+                self.db.execute("DELETE FROM sync_rows WHERE sheet_key = ?", (self.sheet_key,))
+            self.db.execute(
+                "INSERT OR REPLACE INTO sync_sheets (sheet_key, headers, key_column, synced_at) VALUES (?, ?, ?, ?)",
+                (self.sheet_key, json.dumps(headers), self.key_column, time.time())
+            )
+            self.db.executemany(
+                "INSERT OR REPLACE INTO sync_rows (sheet_key, row_key, row_num, row_hash, cells) VALUES (?, ?, ?, ?, ?)",
+                [(self.sheet_key, key, row_num, row_hash(cells), json.dumps(cells))
+                 for key, (row_num, cells) in rows.items()]
+            )
+
+    def _row_key(self, record: dict, position: int) -> str:
+        if self.key_column is None:
+            return f"#{position}"
+        key = normalize_cell(record.get(self.key_column)).strip().lower()
+        if not key:
+            raise ValueError(f"Record {position} has no value for key column {self.key_column!r}")
+        return key
+
+    def rebuild(self) -> int:
+        """Re-read the sheet into the sync state (after manual edits, or to adopt an existing sheet)."""
+        headers = self.worksheet.row_values(1)
+        if self.key_column and headers and self.key_column not in headers:
+            raise ValueError(f"Key column {self.key_column!r} not in sheet header")
+        rows = {}
+        if headers:
+            for row_num, record in iter_rows(self.worksheet, headers=headers, render=UNFORMATTED):
+                cells = [normalize_cell(record.get(h, "")) for h in headers]
+                position = row_num - 2
+                if self.key_column and not cells[headers.index(self.key_column)].strip():
+                    continue
+                rows[self._row_key(dict(zip(headers, cells)), position)] = (row_num, cells)
+        self._save(headers, rows, replace=True)
+        self.log(f"Rebuilt sync state: {len(rows)} rows, {len(headers)} columns")
+        return len(rows)
+
+    # ------------------------------------------------------------------- sync
+
+    def diff(self, records: List[dict], clear_missing: bool = False, blank_absent: bool = False) -> dict:
+        """
+        Compare records with the last synced state without writing anything.
+
+        Columns a record has no key for keep their synced value unless
+        blank_absent is set, so fields filled in on the sheet survive a push
+        of records that never had them.
+
+        Returns {'headers', 'cells', 'rows', 'new', 'changed', 'unchanged', 'missing'},
+        where cells is {(row, col): value} of everything that must be written and
+        rows the state to persist once the write succeeds.
+        """
+        headers, state = self._load()
+        if headers is None:
+            # Never synced: adopt whatever is already in the sheet
+            self.rebuild()
+            headers, state = self._load()
+
+        synced_headers, headers = headers, list(headers)
+        for record in records:
+            for name in record:
+                if name not in headers:
+                    headers.append(name)
+        if self.key_column and self.key_column not in headers:
+            raise ValueError(f"Key column {self.key_column!r} not in records")
+
+        cells = {}
+        for col, name in enumerate(headers):
+            if col >= len(synced_headers) or synced_headers[col] != name:
+                cells[(1, col)] = name
+
+        next_row = max([row_num for row_num, _, _ in state.values()], default=1) + 1
+        rows, seen = {}, set()
+        counts = {"new": 0, "changed": 0, "unchanged": 0}
+        for position, record in enumerate(records):
+            key = self._row_key(record, position)
+            if key in seen:
+                continue  # First occurrence wins, like append_to_sheet's ID dedup
+            seen.add(key)
+            previous = state.get(key)
+            if previous is None:
+                row_num, old_cells = next_row, []
+                next_row += 1
+                counts["new"] += 1
+            else:
+                row_num, digest, old = previous
+                old_cells = json.loads(old)
+            row_cells = [
+                normalize_cell(record.get(h)) if blank_absent or h in record
+                else (old_cells[col] if col < len(old_cells) else "")
+                for col, h in enumerate(headers)
+            ]
+            if previous is not None and digest == row_hash(row_cells) and len(old_cells) == len(row_cells):
+                counts["unchanged"] += 1
+                continue
+            changed = 0
+            for col, value in enumerate(row_cells):
+                old_value = old_cells[col] if col < len(old_cells) else ""
+                if value != old_value:
+                    cells[(row_num, col)] = write_value(record.get(headers[col]))
+                    changed += 1
+            if previous is not None:
+                # A new column alone changes the hash but not what's in the sheet
+                counts["changed" if changed else "unchanged"] += 1
+            rows[key] = (row_num, row_cells)
+
+        missing = [key for key in state if key not in seen]
+        if clear_missing:
+            for key in missing:
+                row_num, _, old = state[key]
+                for col, value in enumerate(json.loads(old)):
+                    if value != "":
+                        cells[(row_num, col)] = ""
+                rows[key] = (row_num, [""] * len(headers))
+
+        return {"headers": headers, "cells": cells, "rows": rows, "missing": len(missing), **counts}
+
+    def sync(self, records: List[dict], clear_missing: bool = False, dry_run: bool = False,
+             limiter: TokenBucket = None, blank_absent: bool = False) -> dict:
+        """
+        Write only the cells that differ from the last sync, in one batch_update.
+
+        Args:
+            records: Flat dicts (nested values are written as JSON)
+            clear_missing: Blank rows whose key is no longer in records (default: leave them)
+            blank_absent: Blank columns a record has no key for (default: leave them)
+            dry_run: Report the diff without writing
+
+        Returns {'new', 'changed', 'unchanged', 'missing', 'cells', 'ranges', 'requests', 'elapsed'}.
+        """
+        start = time.time()
+        plan = self.diff(records, clear_missing=clear_missing, blank_absent=blank_absent)
+        updates = coalesce_cells(plan["cells"])
+        result = {
+            "new": plan["new"], "changed": plan["changed"], "unchanged": plan["unchanged"],
+            "missing": plan["missing"], "cells": len(plan["cells"]), "ranges": len(updates), "requests": 0,
+        }
+        if updates and not dry_run:
+            last_row = max(row for row, _ in plan["cells"])
+            ensure_grid(self.worksheet, last_row, len(plan["headers"]))
+            result["requests"] = batch_write(self.worksheet, updates, self.value_input_option, limiter)
+            self._save(plan["headers"], plan["rows"])
+        result["elapsed"] = round(time.time() - start, 2)
+        self.log(
+            f"Delta sync: {result['new']} new, {result['changed']} changed, {result['unchanged']} unchanged rows; "
+            f"{result['cells']} cells in {result['ranges']} ranges, {result['requests']} request(s)"
+        )
+        return result
+
+    def stats(self) -> dict:
+        row = self.db.execute(
+            "SELECT headers, synced_at FROM sync_sheets WHERE sheet_key = ?", (self.sheet_key,)
+        ).fetchone()
+        count = self.db.execute("SELECT COUNT(*) FROM sync_rows WHERE sheet_key = ?", (self.sheet_key,)).fetchone()[0]
+        return {
+            "sheet": self.sheet_key,
+            "key_column": self.key_column,
+            "columns": len(json.loads(row[0])) if row else 0,
+            "rows": count,
+            "synced_at": row[1] if row else None,
+        }
+
+    def close(self):
+        self.db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delta-sync records to a Google Sheet")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    push = subparsers.add_parser("push", help="Write only changed cells from a JSON file")
+    push.add_argument("json_file", help="JSON list of records")
+    rebuild = subparsers.add_parser("rebuild", help="Re-read the sheet into the sync state")
+    for sub in (push, rebuild):
+        sub.add_argument("--url", required=True, help="Google Sheets URL or ID")
+        sub.add_argument("--worksheet", help="Name of the worksheet (default: first sheet)")
+        sub.add_argument("--key", help="Column identifying a row (default: row position)")
+    push.add_argument("--clear_missing", action="store_true", help="Blank rows no longer in the file")
+    push.add_argument("--blank_absent", action="store_true", help="Blank columns a record has no field for")
+    push.add_argument("--dry-run", action="store_true", help="Show what would be written")
+
+    stats = subparsers.add_parser("stats", help="Show sync state for every sheet")
+    stats.add_argument("--path", default=SYNC_PATH)
+    args = parser.parse_args()
+
+    if args.command == "stats":
+        if not os.path.exists(args.path):
+            print("No sync state yet")
+            return 0
+        db = sqlite3.connect(args.path)
+        for sheet_key, key_column, synced_at, rows in db.execute(
+            "SELECT s.sheet_key, s.key_column, s.synced_at, COUNT(r.row_key) FROM sync_sheets s"
+            " LEFT JOIN sync_rows r ON r.sheet_key = s.sheet_key GROUP BY s.sheet_key"
+        ):
+            print(json.dumps({"sheet": sheet_key, "key_column": key_column, "rows": rows, "synced_at": synced_at}))
+        return 0
+
+    from dotenv import load_dotenv
+    from google_clients import get_gspread_client
+    from read_sheet import extract_sheet_id
+    load_dotenv()
+
+    spreadsheet = get_gspread_client().open_by_key(extract_sheet_id(args.url))
+    worksheet = spreadsheet.worksheet(args.worksheet) if args.worksheet else spreadsheet.sheet1
+    syncer = SheetSync(worksheet, key_column=args.key)
+
+    if args.command == "rebuild":
+        syncer.rebuild()
+        return 0
+
+    with open(args.json_file, "r") as f:
+        records = json.load(f)
+    result = syncer.sync(records, clear_missing=args.clear_missing, dry_run=args.dry_run,
+                         blank_absent=args.blank_absent)
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
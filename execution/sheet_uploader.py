@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Quota-aware parallel uploader for large Google Sheets writes.
+
+Splits rows into chunks sized by cell count and payload bytes, resizes the
+grid once up front, then sends the chunks in parallel through a token bucket
+tuned to the Sheets write quota (60 write requests per minute per user by
+default). 429s and 5xx responses are retried with jittered exponential backoff;
+appends, which aren't idempotent, are retried on 429 only.
+
+Usage:
+    from sheet_uploader import upload_rows, append_rows
+    upload_rows(worksheet, [headers] + rows)
+    upload_row_stream(worksheet, row_iterator)
+    append_rows(worksheet, rows)
+"""
+
+import os
+import json
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+WRITE_REQUESTS_PER_MINUTE = int(os.getenv("SHEETS_WRITES_PER_MINUTE", "60"))
+UPLOAD_WORKERS = 8
+MAX_CELLS_PER_CHUNK = 40_000
+MAX_BYTES_PER_CHUNK = 2_000_000  # Well under the API's request size limit
+MAX_RETRIES = 6
+RETRY_STATUS = {429, 500, 502, 503, 504}
+APPEND_RETRY_STATUS = {429}  # A 5xx may arrive after the rows were appended; retrying would add them twice
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per `per` seconds, up to `burst` at once."""
+
+    def __init__(self, rate: float, per: float = 60.0, burst: int = None):
+        self.interval = per / rate
+        self.capacity = burst or max(1, int(rate // 6))  # ~10s worth of requests
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) / self.interval)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) * self.interval
+            time.sleep(wait)
+
+
+# Shared by every upload in the process, since the quota is per user, not per sheet
+_default_limiter = TokenBucket(WRITE_REQUESTS_PER_MINUTE)
+
+
+def column_letter(n):
+    """Convert column index (0-based) to Excel-style column letter (A, B, ... Z, AA, AB, ...)."""
+    result = ""
+    while n >= 0:
+        result = chr(65 + (n % 26)) + result
+        n = n // 26 - 1
+    return result
+
+
+def plan_chunks(rows: list, max_cells: int = MAX_CELLS_PER_CHUNK, max_bytes: int = MAX_BYTES_PER_CHUNK) -> list:
+    """Greedy split into (offset, count) chunks that stay under both the cell and byte budgets."""
+    chunks = []
+    start, cells, size = 0, 0, 0
+    for i, row in enumerate(rows):
+        row_cells = max(1, len(row))
+        row_bytes = len(json.dumps(row, default=str))
+        if i > start and (cells + row_cells > max_cells or size + row_bytes > max_bytes):
+            chunks.append((start, i - start))
+            start, cells, size = i, 0, 0
+        cells += row_cells
+        size += row_bytes
+    if start < len(rows):
+        chunks.append((start, len(rows) - start))
+    return chunks
+
+
+def ensure_grid(worksheet, rows: int, cols: int):
+    """Grow the worksheet in a single resize call (never shrinks it)."""
+    if rows > worksheet.row_count or cols > worksheet.col_count:
+        worksheet.resize(rows=max(rows, worksheet.row_count), cols=max(cols, worksheet.col_count))
+
+
+def _status_code(error: Exception):
+    response = getattr(error, "response", None)
+    code = getattr(response, "status_code", None) or getattr(error, "code", None)
+    if code is None and "429" in str(error):
+        code = 429
+    return code
+
+
+def _with_retries(call, limiter: TokenBucket, stats: dict, retry_status: set = RETRY_STATUS):
+    """Run one write request under the limiter, retrying `retry_status` errors with jittered backoff."""
+    for attempt in range(MAX_RETRIES + 1):
+        limiter.acquire()
+        try:
+            return call()
+        except Exception as e:
+            if _status_code(e) not in retry_status or attempt == MAX_RETRIES:
+                raise
+            delay = min(64, 2 ** attempt) * random.uniform(0.5, 1.5)
+            with stats["lock"]:
+                stats["retries"] += 1
+            time.sleep(delay)
+
+
+def upload_rows(worksheet, rows: list, start_row: int = 1, start_col: int = 0,
+                value_input_option: str = "RAW", workers: int = UPLOAD_WORKERS,
+                limiter: TokenBucket = None, resize: bool = True, log=print) -> dict:
+    """
+    Write `rows` (a list of row lists) starting at (start_row, start_col) in parallel chunks.
+
+    Returns {'rows', 'chunks', 'retries', 'elapsed'}.
+    """
+    limiter = limiter or _default_limiter
+    start = time.time()
+    if not rows:
+        return {"rows": 0, "chunks": 0, "retries": 0, "elapsed": 0.0}
+
+    width = max(len(row) for row in rows)
+    if resize:
+        ensure_grid(worksheet, start_row + len(rows) - 1, start_col + width)
+
+    first_col, last_col = column_letter(start_col), column_letter(start_col + width - 1)
+    chunks = plan_chunks(rows)
+    stats = {"retries": 0, "lock": threading.Lock()}
+    if len(chunks) > 1:
+        log(f"Uploading {len(rows)} rows in {len(chunks)} chunks ({min(workers, len(chunks))} workers)...")
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(chunks)))) as executor:
+        futures = []
+        for offset, count in chunks:
+            top = start_row + offset
+            range_name = f"{first_col}{top}:{last_col}{top + count - 1}"
+            values = rows[offset:offset + count]
+            futures.append(executor.submit(
+                _with_retries,
+                lambda r=range_name, v=values: worksheet.update(
+                    values=v, range_name=r, value_input_option=value_input_option
+                ),
+                limiter, stats
+            ))
+        for future in futures:
+            future.result()
+
+    elapsed = time.time() - start
+    if len(chunks) > 1:
+        log(f"  Uploaded {len(rows)} rows in {elapsed:.1f}s ({stats['retries']} retries)")
+    return {"rows": len(rows), "chunks": len(chunks), "retries": stats["retries"], "elapsed": elapsed}
+
+
+def upload_row_stream(worksheet, rows, start_row: int = 1, start_col: int = 0,
+                      value_input_option: str = "RAW", workers: int = UPLOAD_WORKERS,
+                      limiter: TokenBucket = None, log=print) -> dict:
+    """
+    Like upload_rows, for an iterator of rows: chunks are cut as rows arrive and
+    at most `workers` chunks are in memory or in flight at once.
+
+    The grid grows ahead of the writes in a few resizes and is trimmed to the
+    rows actually written at the end. Returns {'rows', 'chunks', 'retries', 'elapsed'}.
+    """
+    limiter = limiter or _default_limiter
+    start = time.time()
+    stats = {"retries": 0, "lock": threading.Lock()}
+    total, chunks, grown = 0, 0, False
+    top = start_row
+
+    def submit(executor, chunk):
+        nonlocal grown, top, chunks
+        width = max(len(row) for row in chunk)
+        bottom = top + len(chunk) - 1
+        if bottom > worksheet.row_count or start_col + width > worksheet.col_count:
+            # Grow for the chunks already in flight plus this one, not one resize per chunk
+            ensure_grid(worksheet, bottom + len(chunk) * workers, start_col + width)
+            grown = True
+        range_name = f"{column_letter(start_col)}{top}:{column_letter(start_col + width - 1)}{bottom}"
+        top = bottom + 1
+        chunks += 1
+        return executor.submit(
+            _with_retries,
+            lambda: worksheet.update(values=chunk, range_name=range_name, value_input_option=value_input_option),
+            limiter, stats
+        )
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        pending = set()
+        chunk, cells, size = [], 0, 0
+        for row in rows:
+            row_cells, row_bytes = max(1, len(row)), len(json.dumps(row, default=str))
+            if chunk and (cells + row_cells > MAX_CELLS_PER_CHUNK or size + row_bytes > MAX_BYTES_PER_CHUNK):
+                if len(pending) >= workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                pending.add(submit(executor, chunk))
+                chunk, cells, size = [], 0, 0
+            chunk.append(row)
+            cells += row_cells
+            size += row_bytes
+            total += 1
+        if chunk:
+            pending.add(submit(executor, chunk))
+        for future in pending:
+            future.result()
+
+    last_row = start_row + total - 1
+    if grown and worksheet.row_count > last_row:
+        worksheet.resize(rows=max(last_row, 1))
+
+    elapsed = time.time() - start
+    if chunks > 1:
+        log(f"  Streamed {total} rows in {chunks} chunks, {elapsed:.1f}s ({stats['retries']} retries)")
+    return {"rows": total, "chunks": chunks, "retries": stats["retries"], "elapsed": elapsed}
+
+
+def append_rows(worksheet, rows: list, value_input_option: str = "RAW",
+                limiter: TokenBucket = None, log=print) -> dict:
+    """
+    Append `rows` after the last row of the table in quota-sized append_rows batches.
+
+    Batches go out sequentially so rows land in order; each one is a single
+    request regardless of row count. Only 429s are retried: a 5xx raises, and
+    re-running with an ID column (append_to_sheet.py) skips what did land.
+    Returns {'rows', 'chunks', 'retries', 'elapsed'}.
+    """
+    limiter = limiter or _default_limiter
+    start = time.time()
+    chunks = plan_chunks(rows)
+    stats = {"retries": 0, "lock": threading.Lock()}
+    for i, (offset, count) in enumerate(chunks, 1):
+        batch = rows[offset:offset + count]
+        _with_retries(
+            lambda: worksheet.append_rows(
+                batch, value_input_option=value_input_option, insert_data_option="INSERT_ROWS"
+            ),
+            limiter, stats, retry_status=APPEND_RETRY_STATUS
+        )
+        if len(chunks) > 1:
+            log(f"  Appended batch {i}/{len(chunks)} ({count} rows)")
+    return {"rows": len(rows), "chunks": len(chunks), "retries": stats["retries"], "elapsed": time.time() - start}
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Background, coalescing Slack webhook notifier.
+
+slack_notify() posted to the incoming webhook inline, and directives call it
+several times per turn (tool call, tool result, ...), so every request waited
+on Slack round trips. SlackNotifier moves the posts off the request path:
+1. send() only queues the message and returns
+2. a background thread waits up to `window` seconds for more messages and
+   merges the burst into one post (texts joined, blocks concatenated, split
+   at Slack's 50-block limit)
+3. posts are spaced at least `min_interval` apart (webhooks allow about one
+   message per second) and a 429 is retried after its Retry-After
+4. pending messages are flushed at interpreter exit; flush() does it on demand
+
+Usage:
+    from slack_notifier import get_slack_notifier
+    get_slack_notifier(os.getenv("SLACK_WEBHOOK_URL")).send("Directive started", blocks=blocks)
+
+    python3 execution/slack_notifier.py "Test message" --count 5
+"""
+
+import os
+import sys
+import time
+import queue
+import atexit
+import argparse
+import threading
+from typing import List
+
+WINDOW = 1.0         # Seconds a burst is collected before posting
+MIN_INTERVAL = 1.0   # Seconds between posts to one webhook
+MAX_BLOCKS = 50      # Slack's limit per message
+MAX_TEXT = 3000      # Characters per section block
+MAX_PENDING = 1000   # Queued messages before new ones are dropped
+MAX_RETRIES = 3
+
+
+class SlackNotifier:
+    """Queues webhook messages and posts them from a background thread, merged per burst."""
+
+    def __init__(self, webhook_url: str, window: float = WINDOW, min_interval: float = MIN_INTERVAL,
+                 session=None, log=print):
+        self.webhook_url = webhook_url
+        self.window = window
+        self.min_interval = min_interval
+        self.session = session
+        self.log = log
+        self.stats = {"queued": 0, "posts": 0, "dropped": 0, "failed": 0, "rate_limited": 0}
+        self._stats_lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=MAX_PENDING)
+        self._last_post = 0.0
+        self._thread = threading.Thread(target=self._run, name="slack-notifier", daemon=True)
+        self._thread.start()
+
+    def send(self, text: str, blocks: list = None):
+        """Queue a message; never blocks (drops it if MAX_PENDING are already waiting)."""
+        try:
+            self._queue.put_nowait({"text": text, "blocks": blocks})
+            self._count("queued")
+        except queue.Full:
+            self._count("dropped")
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Wait until every queued message has been posted; False if `timeout` ran out first."""
+        deadline = time.time() + timeout
+        while self._queue.unfinished_tasks:
+            if time.time() > deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    # ------------------------------------------------------------- internals
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.time() + self.window
+            while True:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.time())))
+                except queue.Empty:
+                    break
+            try:
+                for payload in merge_messages(batch):
+                    self._post(payload)
+            except Exception as e:
+                self._count("failed")
+                self.log(f"[slack] Post failed: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _post(self, payload: dict):
+        if self.session is None:
+            try:
+                from execution.service_clients import get_http_session
+            except ImportError:
+                from service_clients import get_http_session
+            self.session = get_http_session()
+
+        for attempt in range(MAX_RETRIES + 1):
+            wait = self._last_post + self.min_interval - time.time()
+            if wait > 0:
+                time.sleep(wait)
+            response = self.session.post(self.webhook_url, json=payload, timeout=5)
+            self._last_post = time.time()
+            if response.status_code == 429 and attempt < MAX_RETRIES:
+                self._count("rate_limited")
+                time.sleep(float(response.headers.get("Retry-After", 1)))
+                continue
+            if response.status_code >= 400:
+                self._count("failed")
+                self.log(f"[slack] Webhook returned {response.status_code}: {response.text[:200]}")
+            else:
+                self._count("posts")
+            return
+
+
+def _text_block(text: str) -> dict:
+    return {"type": "section", "text": {"type": "mrkdwn", "text": text[:MAX_TEXT]}}
+
+
+def merge_messages(messages: List[dict]) -> List[dict]:
+    """Merge queued messages into as few webhook payloads as Slack's limits allow, in order."""
+    if not any(m["blocks"] for m in messages):
+        text = "\n".join(m["text"] for m in messages)
+        return [{"text": text[i:i + MAX_TEXT * 10]} for i in range(0, len(text), MAX_TEXT * 10)] or [{"text": ""}]
+
+    payloads, texts, blocks = [], [], []
+    for message in messages:
+        message_blocks = message["blocks"] or [_text_block(message["text"])]
+        if blocks and len(blocks) + len(message_blocks) > MAX_BLOCKS:
+            payloads.append({"text": "\n".join(texts), "blocks": blocks})
+            texts, blocks = [], []
+        texts.append(message["text"])
+        blocks.extend(message_blocks[:MAX_BLOCKS])
+    payloads.append({"text": "\n".join(texts), "blocks": blocks})
+    return payloads
+
+
+_notifiers = {}
+_notifiers_lock = threading.Lock()
+
+
+def get_slack_notifier(webhook_url: str) -> SlackNotifier:
+    """Process-wide notifier per webhook URL, flushed at interpreter exit."""
+    with _notifiers_lock:
+        notifier = _notifiers.get(webhook_url)
+        if notifier is None:
+            notifier = _notifiers[webhook_url] = SlackNotifier(webhook_url)
+            atexit.register(notifier.flush)
+        return notifier
+
+
+def main():
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Send test messages through the coalescing Slack notifier")
+    parser.add_argument("message", help="Message text")
+    parser.add_argument("--count", type=int, default=1, help="Messages to queue in one burst")
+    args = parser.parse_args()
+
+    webhook_url = os.getenv("SLACK_WEBHOOK_URL")
+    if not webhook_url:
+        print("Error: SLACK_WEBHOOK_URL not set", file=sys.stderr)
+        return 1
+
+    notifier = get_slack_notifier(webhook_url)
+    start = time.time()
+    for i in range(args.count):
+        notifier.send(f"{args.message} ({i + 1}/{args.count})")
+    queued = time.time() - start
+    notifier.flush()
+    print(f"Queued {args.count} messages in {queued * 1000:.2f}ms; {notifier.stats}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
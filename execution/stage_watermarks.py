@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Per-stage processing watermarks for incremental sheet stages.
+
+Enrichment and casualization used to scan every row on every run to find the
+few that still needed work. A watermark records, per worksheet and stage:
+- the last sheet row the stage processed
+- a hash of that row's input cells (the anchor), to notice rows being
+  inserted, deleted or re-sorted above it
+- the stage version (prompt/model version), so a version bump reprocesses
+  everything
+- a hash of each processed row's input cells
+
+A normal rerun checks the anchor row, then reads just the input columns above
+the watermark and compares them with the stored hashes. It resumes from the
+first changed row (or below the watermark if none changed), so a daily top-up
+costs one narrow read plus reads proportional to the new rows, and edits such
+as an email filled in after casualization are still picked up. A rescan reads
+every row from the top. Rows a run could not finish (mark.retry) get no hash,
+so the next run treats them as changed. State lives in .tmp/watermarks.db.
+
+Usage:
+    from stage_watermarks import StageWatermark
+    mark = StageWatermark(worksheet, "casualize_first_name", "v1", ["email", "first_name"])
+    start = mark.resume(full=args.rescan)
+    for row_num, row in iter_rows(worksheet, columns, headers=headers, start_row=start):
+        mark.seen(row_num, row)
+        if mark.is_done(row_num, row):
+            continue
+        ...
+    mark.retry(failed_row)   # for rows whose lookup errored
+    mark.commit()            # after the sheet write succeeded
+
+    python3 execution/stage_watermarks.py stats
+    python3 execution/stage_watermarks.py reset --url SHEET_URL --stage casualize_first_name
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import threading
+from typing import Dict, List, Optional
+
+try:
+    from execution.sheet_reader import iter_rows
+    from execution.sheet_sync import normalize_cell, row_hash
+except ImportError:
+    from sheet_reader import iter_rows
+    from sheet_sync import normalize_cell, row_hash
+
+WATERMARK_PATH = os.getenv("WATERMARK_PATH", os.path.join(".tmp", "watermarks.db"))
+
+
+class WatermarkStore:
+    """SQLite-backed watermark state, one row per (worksheet, stage)."""
+
+    def __init__(self, path: str = WATERMARK_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS stage_watermarks ("
+            " sheet_key TEXT NOT NULL,"
+            " stage TEXT NOT NULL,"
+            " version TEXT NOT NULL,"
+            " columns TEXT NOT NULL,"
+            " last_row INTEGER NOT NULL,"
+            " anchor_hash TEXT,"
+            " updated_at REAL,"
+            " PRIMARY KEY (sheet_key, stage)"
+            ")"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS stage_rows ("
+            " sheet_key TEXT NOT NULL,"
+            " stage TEXT NOT NULL,"
+            " row_num INTEGER NOT NULL,"
+            " row_hash TEXT NOT NULL,"
+            " PRIMARY KEY (sheet_key, stage, row_num)"
+            ") WITHOUT ROWID"
+        )
+        self.db.commit()
+
+    def get(self, sheet_key: str, stage: str) -> Optional[dict]:
+        row = self.db.execute(
+            "SELECT version, columns, last_row, anchor_hash, updated_at FROM stage_watermarks"
+            " WHERE sheet_key = ? AND stage = ?", (sheet_key, stage)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"version": row[0], "columns": json.loads(row[1]), "last_row": row[2],
+                "anchor_hash": row[3], "updated_at": row[4]}
+
+    def row_hashes(self, sheet_key: str, stage: str) -> Dict[int, str]:
+        return dict(self.db.execute(
+            "SELECT row_num, row_hash FROM stage_rows WHERE sheet_key = ? AND stage = ?", (sheet_key, stage)
+        ))
+
+    def save(self, sheet_key: str, stage: str, version: str, columns: List[str], last_row: int,
+             anchor_hash: Optional[str], rows: Dict[int, str], replace: bool = False, drop: List[int] = ()):
+        with self._lock, self.db:
+            if replace:
+                self.db.execute("DELETE FROM stage_rows WHERE sheet_key = ? AND stage = ?", (sheet_key, stage))
+            self.db.executemany(
+                "DELETE FROM stage_rows WHERE sheet_key = ? AND stage = ? AND row_num = ?",
+                [(sheet_key, stage, row_num) for row_num in drop]
+            )
+            self.db.execute(
+                "INSERT OR REPLACE INTO stage_watermarks"
+                " (sheet_key, stage, version, columns, last_row, anchor_hash, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (sheet_key, stage, version, json.dumps(columns), last_row, anchor_hash, time.time())
+            )
+            self.db.executemany(
+                "INSERT OR REPLACE INTO stage_rows (sheet_key, stage, row_num, row_hash) VALUES (?, ?, ?, ?)",
+                [(sheet_key, stage, row_num, digest) for row_num, digest in rows.items()]
+            )
+
+    def reset(self, sheet_key: str, stage: str = None) -> int:
+        """Forget a stage's watermark (or every stage of a sheet); the next run starts from row 2."""
+        where, params = "sheet_key = ?", [sheet_key]
+        if stage:
+            where, params = where + " AND stage = ?", params + [stage]
+        with self._lock, self.db:
+            self.db.execute(f"DELETE FROM stage_rows WHERE {where}", params)
+            return self.db.execute(f"DELETE FROM stage_watermarks WHERE {where}", params).rowcount
+
+    def stats(self) -> List[dict]:
+        return [
+            {"sheet": sheet_key, "stage": stage, "version": version, "last_row": last_row,
+             "rows": self.db.execute(
+                 "SELECT COUNT(*) FROM stage_rows WHERE sheet_key = ? AND stage = ?", (sheet_key, stage)
+             ).fetchone()[0],
+             "updated_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(updated_at or 0))}
+            for sheet_key, stage, version, last_row, updated_at in self.db.execute(
+                "SELECT sheet_key, stage, version, last_row, updated_at FROM stage_watermarks ORDER BY sheet_key, stage"
+            )
+        ]
+
+    def close(self):
+        self.db.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_watermark_store() -> WatermarkStore:
+    """Process-wide store, opened on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = WatermarkStore()
+        return _store
+
+
+class StageWatermark:
+    """Where one stage left off on one worksheet, and which processed rows changed since."""
+
+    def __init__(self, worksheet, stage: str, version: str, input_columns: List[str],
+                 store: WatermarkStore = None, log=print):
+        """
+        Args:
+            stage: Stage name, e.g. "enrich_emails" or "casualize_first_name"
+            version: Stage version; a different value reprocesses every row
+            input_columns: Columns the stage reads (not the ones it writes). A row
+                counts as changed when one of these cells changes.
+        """
+        self.worksheet = worksheet
+        self.stage = stage
+        self.version = str(version)
+        self.input_columns = list(input_columns)
+        self.store = store or get_watermark_store()
+        self.log = log
+        self.sheet_key = f"{worksheet.spreadsheet.id}:{worksheet.id}"
+        self.start_row = 2
+        self.full = True
+        self._state = None
+        self._hashes: Dict[int, str] = {}
+        self._seen: Dict[int, str] = {}
+        self._retry: Dict[int, str] = {}
+
+    def _hash(self, record: dict) -> str:
+        return row_hash([normalize_cell(record.get(c, "")).strip() for c in self.input_columns])
+
+    def resume(self, full: bool = False, headers: List[str] = None) -> int:
+        """
+        Decide where this run starts reading; returns the first sheet row to read.
+
+        Args:
+            full: Read every row from the top instead of resuming
+            headers: Sheet header, if the caller already has it (saves one request)
+        """
+        state = self.store.get(self.sheet_key, self.stage)
+        replace = False
+        if state is None:
+            self.log(f"No watermark for stage '{self.stage}', scanning every row")
+            full = True
+        elif state["version"] != self.version or state["columns"] != self.input_columns:
+            self.log(f"Stage '{self.stage}' changed ({state['version']} -> {self.version}), reprocessing every row")
+            full, replace = True, True
+        elif state["last_row"] > self.worksheet.row_count or not self._anchor_matches(state, headers):
+            self.log(f"Rows above the '{self.stage}' watermark moved since the last run, rescanning")
+            full, replace = True, True
+
+        self._state = None if replace else state
+        self.full = full
+        self._hashes = self.store.row_hashes(self.sheet_key, self.stage) if self._state else {}
+        if full:
+            self.start_row = 2
+            return self.start_row
+
+        changed = self._changed_rows(state["last_row"], headers)
+        if changed:
+            self.start_row = changed[0]
+            self.log(f"{len(changed)} row(s) above the '{self.stage}' watermark changed or were left for retry, "
+                     f"resuming from row {self.start_row}")
+        else:
+            self.start_row = state["last_row"] + 1
+            self.log(f"Stage '{self.stage}' resumes after row {state['last_row']}")
+        return self.start_row
+
+    def _changed_rows(self, last_row: int, headers: List[str] = None) -> List[int]:
+        """Rows up to last_row whose input cells differ from their stored hash (one narrow read)."""
+        if last_row < 2:
+            return []
+        return [row_num for row_num, record in iter_rows(self.worksheet, self.input_columns, headers=headers,
+                                                         end_row=last_row)
+                if self._hashes.get(row_num) != self._hash(record)]
+
+    def _anchor_matches(self, state: dict, headers: List[str] = None) -> bool:
+        if state["last_row"] < 2:
+            return True
+        rows = list(iter_rows(self.worksheet, self.input_columns, headers=headers, skip_empty=False,
+                              start_row=state["last_row"], end_row=state["last_row"]))
+        record = rows[0][1] if rows else {}
+        return self._hash(record) == state["anchor_hash"]
+
+    def seen(self, row_num: int, record: dict):
+        """Note a row read this run; it is recorded as processed by commit()."""
+        self._seen[row_num] = self._hash(record)
+
+    def retry(self, row_num: int):
+        """Leave a seen row for the next run (e.g. its lookup errored); commit() records no hash for it."""
+        if row_num in self._seen:
+            self._retry[row_num] = self._seen.pop(row_num)
+
+    def is_changed(self, row_num: int, record: dict) -> bool:
+        """True if the row was processed before and its input cells have changed since."""
+        previous = self._hashes.get(row_num)
+        return previous is not None and previous != self._hash(record)
+
+    def is_done(self, row_num: int, record: dict) -> bool:
+        """True if the row was processed at this stage version and its inputs haven't changed."""
+        if row_num < self.start_row:
+            return True
+        previous = self._hashes.get(row_num)
+        return previous is not None and previous == self._hash(record)
+
+    def commit(self, rows: Dict[int, dict] = None) -> int:
+        """
+        Advance the watermark over every row seen this run (call after the sheet write succeeds).
+
+        Rows passed to retry() are read again next run. Returns the new last processed row.
+        """
+        for row_num, record in (rows or {}).items():
+            self.seen(row_num, record)
+        if not self._seen and not self._retry and self._state is not None:
+            return self._state["last_row"]
+        previous = self._state["last_row"] if self._state else 1
+        last_row = max([previous] + list(self._seen) + list(self._retry))
+        anchor = self._seen.get(last_row) or self._retry.get(last_row)
+        if anchor is None:
+            # Last processed row unchanged from the previous run
+            anchor = self._state["anchor_hash"] if self._state else None
+        self.store.save(self.sheet_key, self.stage, self.version, self.input_columns, last_row, anchor,
+                        self._seen, replace=self._state is None, drop=list(self._retry))
+        self._state = {"version": self.version, "columns": self.input_columns, "last_row": last_row,
+                       "anchor_hash": anchor, "updated_at": time.time()}
+        self._hashes.update(self._seen)
+        for row_num in self._retry:
+            self._hashes.pop(row_num, None)
+        self._seen, self._retry = {}, {}
+        return last_row
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or reset incremental stage watermarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="List watermarks")
+    reset = sub.add_parser("reset", help="Forget a watermark so the next run scans every row")
+    reset.add_argument("--url", required=True, help="Google Sheets URL or ID")
+    reset.add_argument("--worksheet", help="Name of the worksheet (default: first sheet)")
+    reset.add_argument("--stage", help="Stage to reset (default: every stage of the sheet)")
+    args = parser.parse_args()
+
+    store = get_watermark_store()
+    if args.command == "stats":
+        print(json.dumps(store.stats(), indent=2))
+        return 0
+
+    from google_clients import get_gspread_client
+    from read_sheet import extract_sheet_id
+
+    spreadsheet = get_gspread_client().open_by_key(extract_sheet_id(args.url))
+    worksheet = spreadsheet.worksheet(args.worksheet) if args.worksheet else spreadsheet.sheet1
+    removed = store.reset(f"{spreadsheet.id}:{worksheet.id}", args.stage)
+    print(f"Reset {removed} watermark(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
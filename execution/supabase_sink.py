@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Bulk Supabase sink for scraped leads and analysis results.
+
+Writing one row per request means one HTTPS round trip (and, before this, one
+new client) per lead. SupabaseSink instead:
+1. Shares one client per process (its HTTP connection pool is reused)
+2. Buffers records in a bounded queue; put() blocks when the queue is full,
+   so a fast scraper can't outrun the database (backpressure)
+3. Flushes from a background thread in batches of up to BATCH_SIZE rows,
+   as one upsert on the table's conflict key (or a plain insert)
+4. Retries failed batches with backoff, then parks them in
+   .tmp/supabase_failed/<table>.jsonl for `replay`
+
+Without SUPABASE_URL and a key in the environment the sink logs once and drops
+records, so callers don't need their own credential checks.
+
+Expected leads table:
+    create table leads (
+        source text not null, lead_key text not null,
+        email text, domain text, data jsonb not null,
+        updated_at timestamptz default now(),
+        primary key (source, lead_key)
+    );
+
+Usage:
+    from supabase_sink import get_sink, lead_rows
+    sink = get_sink("leads", on_conflict="source,lead_key")
+    sink.extend(lead_rows(leads, source="gmaps", key_column="lead_id"))
+    sink.flush()
+
+    python3 execution/supabase_sink.py push .tmp/leads.json --source apify --key email
+    python3 execution/supabase_sink.py replay --table leads --on-conflict source,lead_key
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import random
+import atexit
+import hashlib
+import argparse
+import threading
+from datetime import datetime, timezone
+from typing import Iterable, List
+from urllib.parse import urlparse
+
+BATCH_SIZE = 500      # Rows per upsert request
+MAX_PENDING = 5000    # Rows buffered before put() blocks
+FLUSH_INTERVAL = 1.0  # Seconds a partial batch waits for more rows
+MAX_RETRIES = 4
+LEADS_TABLE = os.getenv("SUPABASE_LEADS_TABLE", "leads")
+LEADS_CONFLICT = "source,lead_key"
+FAILED_DIR = os.path.join(".tmp", "supabase_failed")
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_supabase_client():
+    """Process-wide Supabase client, or None if credentials are missing."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            url = os.getenv("SUPABASE_URL")
+            key = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_KEY")
+            if not url or not key:
+                return None
+            from supabase import create_client
+            _client = create_client(url, key)
+        return _client
+
+
+def normalize_domain(url: str) -> str:
+    """https://www.Example.com/ -> example.com"""
+    return (url or "").lower().replace("https://", "").replace("http://", "").replace("www.", "").rstrip("/")
+
+
+def lead_key(lead: dict, key_column: str = None) -> str:
+    """Stable key for a lead: key_column if given, else email, else a hash of its identifying fields."""
+    if key_column:
+        return str(lead.get(key_column) or "").strip().lower()
+    email = str(lead.get("email") or "").strip().lower()
+    if email:
+        return email
+    identifiers = [str(lead.get(f) or "").strip().lower() for f in
+                   ("first_name", "last_name", "full_name", "company_name", "company_domain", "website",
+                    "phone", "address", "city", "state")]
+    return hashlib.md5("|".join(filter(None, identifiers)).encode()).hexdigest()
+
+
+def lead_rows(leads: Iterable[dict], source: str, key_column: str = None) -> Iterable[dict]:
+    """Map lead dicts to rows of the leads table (the full lead goes in `data`)."""
+    now = datetime.now(timezone.utc).isoformat()
+    for lead in leads:
+        key = lead_key(lead, key_column)
+        if not key:
+            continue
+        website = lead.get("company_domain") or lead.get("company_website") or lead.get("website") or ""
+        domain = normalize_domain(urlparse(website).netloc or website).split("/")[0] if website else ""
+        yield {
+            "source": source,
+            "lead_key": key,
+            "email": str(lead.get("email") or "").strip().lower() or None,
+            "domain": domain or None,
+            "data": lead,
+            "updated_at": now,
+        }
+
+
+def analysis_row(data: dict, user_id: str = None) -> dict:
+    """Row for the 'analyses' table: id, created_at, domain, score, report_data, user_id."""
+    row = {
+        "domain": normalize_domain(data.get("url")),
+        "score": data.get("score"),
+        "report_data": data,
+    }
+    # Only include user_id if it looks like a valid UUID
+    if user_id and len(str(user_id)) > 10:
+        row["user_id"] = user_id
+    return row
+
+
+class SupabaseSink:
+    """Buffered, batched writer for one table. Thread-safe; one background flusher per sink."""
+
+    def __init__(self, table: str, on_conflict: str = None, batch_size: int = BATCH_SIZE,
+                 max_pending: int = MAX_PENDING, flush_interval: float = FLUSH_INTERVAL,
+                 client=None, log=print):
+        """
+        Args:
+            table: Table name
+            on_conflict: Comma-separated conflict columns for upserts (None: plain inserts)
+            batch_size: Rows per request
+            max_pending: Buffered rows before put() blocks
+        """
+        self.table = table
+        self.on_conflict = on_conflict
+        self.conflict_columns = [c.strip() for c in on_conflict.split(",")] if on_conflict else []
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.client = client if client is not None else get_supabase_client()
+        self.log = log
+        self.stats = {"queued": 0, "written": 0, "batches": 0, "retries": 0, "failed": 0}
+        self._stats_lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._stop = threading.Event()
+        self._thread = None
+        if self.client is None:
+            self.log(f"[supabase] Credentials missing, records for '{table}' will not be stored")
+            return
+        self._thread = threading.Thread(target=self._run, name=f"supabase-sink-{table}", daemon=True)
+        self._thread.start()
+
+    @property
+    def enabled(self) -> bool:
+        return self._thread is not None
+
+    def put(self, record: dict, timeout: float = None):
+        """Queue one row; blocks while max_pending rows are already waiting."""
+        if not self.enabled:
+            return
+        self._queue.put(record, timeout=timeout)
+        self._count("queued")
+
+    def extend(self, records: Iterable[dict]) -> int:
+        count = 0
+        for record in records:
+            self.put(record)
+            count += 1
+        return count
+
+    def flush(self):
+        """Block until every queued row has been written (or parked as failed)."""
+        if self.enabled:
+            self._queue.join()
+
+    def close(self):
+        if not self.enabled or self._stop.is_set():
+            return
+        self.flush()
+        self._stop.set()
+        self._thread.join(timeout=5)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ------------------------------------------------------------- internals
+
+    def _count(self, name: str, n: int = 1):
+        with self._stats_lock:
+            self.stats[name] += n
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch = [first]
+            deadline = time.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.time())))
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _dedupe(self, batch: List[dict]) -> List[dict]:
+        """Postgres rejects an upsert that touches the same key twice; keep the last row per key."""
+        if not self.conflict_columns:
+            return batch
+        rows = {}
+        for row in batch:
+            rows[tuple(row.get(c) for c in self.conflict_columns)] = row
+        return list(rows.values())
+
+    def _write(self, batch: List[dict]):
+        rows = self._dedupe(batch)
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                query = self.client.table(self.table)
+                if self.on_conflict:
+                    query.upsert(rows, on_conflict=self.on_conflict).execute()
+                else:
+                    query.insert(rows).execute()
+                self._count("written", len(rows))
+                self._count("batches")
+                return
+            except Exception as e:
+                if attempt == MAX_RETRIES:
+                    self._count("failed", len(rows))
+                    self.log(f"[supabase] Batch of {len(rows)} rows to '{self.table}' failed: {e}")
+                    self._park(rows)
+                    return
+                self._count("retries")
+                time.sleep(min(30, 2 ** attempt) * random.uniform(0.5, 1.5))
+
+    def _park(self, rows: List[dict]):
+        try:
+            os.makedirs(FAILED_DIR, exist_ok=True)
+            with open(os.path.join(FAILED_DIR, f"{self.table}.jsonl"), "a") as f:
+                for row in rows:
+                    f.write(json.dumps(row, default=str) + "\n")
+        except OSError:
+            pass
+
+
+_sinks = {}
+_sinks_lock = threading.Lock()
+
+
+def get_sink(table: str, on_conflict: str = None, log=print) -> SupabaseSink:
+    """Process-wide sink per table, flushed at interpreter exit."""
+    with _sinks_lock:
+        sink = _sinks.get(table)
+        if sink is None:
+            sink = _sinks[table] = SupabaseSink(table, on_conflict=on_conflict, log=log)
+            atexit.register(sink.close)
+        return sink
+
+
+def replay(table: str, on_conflict: str = None) -> dict:
+    """Re-send rows parked in .tmp/supabase_failed/<table>.jsonl."""
+    path = os.path.join(FAILED_DIR, f"{table}.jsonl")
+    if not os.path.exists(path):
+        return {"replayed": 0}
+    pending = f"{path}.replaying"
+    os.replace(path, pending)
+    with SupabaseSink(table, on_conflict=on_conflict) as sink:
+        with open(pending) as f:
+            sink.extend(json.loads(line) for line in f if line.strip())
+    os.remove(pending)
+    return {"replayed": sink.stats["written"], "failed": sink.stats["failed"]}
+
+
+def main():
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Bulk-write leads to Supabase")
+    sub = parser.add_subparsers(dest="command", required=True)
+    push = sub.add_parser("push", help="Upsert a JSON file of leads")
+    push.add_argument("json_file", help="JSON list of leads")
+    push.add_argument("--source", required=True, help="Source label, e.g. apify or gmaps")
+    push.add_argument("--key", help="Field identifying a lead (default: email, else a hash)")
+    push.add_argument("--table", default=LEADS_TABLE, help=f"Table (default: {LEADS_TABLE})")
+    push.add_argument("--batch-size", type=int, default=BATCH_SIZE, help=f"Rows per request (default: {BATCH_SIZE})")
+    rp = sub.add_parser("replay", help="Re-send rows from failed batches")
+    rp.add_argument("--table", default=LEADS_TABLE, help=f"Table (default: {LEADS_TABLE})")
+    rp.add_argument("--on-conflict", help="Conflict columns, e.g. source,lead_key")
+    args = parser.parse_args()
+
+    if get_supabase_client() is None:
+        print("Error: SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY (or SUPABASE_KEY) must be set", file=sys.stderr)
+        return 1
+
+    if args.command == "replay":
+        print(json.dumps(replay(args.table, args.on_conflict), indent=2))
+        return 0
+
+    with open(args.json_file) as f:
+        leads = json.load(f)
+    start = time.time()
+    with SupabaseSink(args.table, on_conflict=LEADS_CONFLICT, batch_size=args.batch_size) as sink:
+        sink.extend(lead_rows(leads, args.source, args.key))
+    elapsed = time.time() - start
+    print(f"Wrote {sink.stats['written']} rows in {sink.stats['batches']} batches, {elapsed:.1f}s "
+          f"({sink.stats['failed']} failed, {sink.stats['retries']} retries)")
+    return 1 if sink.stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,461 @@
+#!/usr/bin/env python3
+"""
+Local contact suppression store.
+
+Keeps every email address and domain we have already uploaded to Instantly or
+emailed, so enrichment (AnyMailFinder credits) and uploads can skip them.
+
+Two layers:
+- Bloom filter (in memory, persisted to bloom.bin) answers "definitely not
+  seen" without touching disk. This is the common case for fresh leads.
+- SQLite table (suppression.db) is the exact backing set. It is only queried
+  when the Bloom filter says "maybe", so false positives never drop a lead.
+
+Usage:
+    python3 execution/suppression_store.py import --csv .tmp/instantly_export.csv
+    python3 execution/suppression_store.py import --json .tmp/leads_20250101_120000.json
+    python3 execution/suppression_store.py import --csv domains.csv --kind domain
+    python3 execution/suppression_store.py import --csv contacts.csv --kind email
+    python3 execution/suppression_store.py sync-instantly
+    python3 execution/suppression_store.py check someone@acme.com acme.com
+    python3 execution/suppression_store.py stats
+"""
+
+import os
+import sys
+import csv
+import json
+import math
+import time
+import sqlite3
+import struct
+import hashlib
+import argparse
+import threading
+from urllib.parse import urlparse
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+SUPPRESSION_DIR = os.getenv("SUPPRESSION_DIR", os.path.join(".tmp", "suppression"))
+DEFAULT_CAPACITY = 5_000_000  # Addresses + domains before the filter is regrown
+DEFAULT_ERROR_RATE = 0.001    # 0.1% of lookups fall through to SQLite
+
+INSTANTLY_API_BASE = "https://api.instantly.ai/api/v2"
+
+BLOOM_MAGIC = b"ZSBF"
+BLOOM_HEADER = struct.Struct("<4sQIQ")  # magic, num_bits, num_hashes, count
+
+EMAIL_COLUMNS = ("email", "emails", "owner_email", "Email", "Email Address")
+DOMAIN_COLUMNS = ("company_domain", "domain", "website", "Website", "Company Domain")
+
+# Hosts many unrelated businesses share (social pages, listing sites, link-in-bio
+# pages, free mail). Suppressing one would suppress every lead that uses it, so
+# normalize_domain() returns '' for them and its subdomains (m.facebook.com, ...).
+SHARED_HOSTS = {
+    "facebook.com", "fb.com", "instagram.com", "twitter.com", "x.com", "linkedin.com", "youtube.com",
+    "tiktok.com", "pinterest.com", "yelp.com", "tripadvisor.com", "yellowpages.com", "bbb.org",
+    "nextdoor.com", "angi.com", "houzz.com", "thumbtack.com", "linktr.ee", "google.com", "goo.gl",
+    "g.page", "business.site", "bit.ly", "gmail.com", "googlemail.com", "yahoo.com", "hotmail.com",
+    "outlook.com", "live.com", "msn.com", "aol.com", "icloud.com", "me.com", "protonmail.com",
+    "proton.me", "gmx.com", "mail.com", "comcast.net",
+}
+
+
+def normalize_email(value) -> str:
+    """Lowercase and trim an email address. Returns '' if it does not look like one."""
+    if not value:
+        return ""
+    email = str(value).strip().strip("<>").lower()
+    if email.startswith("mailto:"):
+        email = email[7:]
+    if "@" not in email or " " in email:
+        return ""
+    return email
+
+
+def is_shared_host(host: str) -> bool:
+    """True for SHARED_HOSTS and their subdomains."""
+    return any(host == shared or host.endswith("." + shared) for shared in SHARED_HOSTS)
+
+
+def normalize_domain(value) -> str:
+    """
+    Reduce a URL, email or bare host to its registrable-looking host (no www., no port).
+
+    Returns '' for shared hosts (see SHARED_HOSTS), which never identify one company.
+    """
+    if not value:
+        return ""
+    raw = str(value).strip().lower()
+    if "@" in raw and "://" not in raw:
+        raw = raw.rsplit("@", 1)[1]
+    if "://" not in raw:
+        raw = "http://" + raw
+    host = urlparse(raw).hostname or ""
+    if host.startswith("www."):
+        host = host[4:]
+    host = host.rstrip(".")
+    return "" if is_shared_host(host) else host
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter using double hashing over one blake2b digest."""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, error_rate: float = DEFAULT_ERROR_RATE,
+                 num_bits: int = None, num_hashes: int = None, bits: bytearray = None, count: int = 0):
+        if num_bits is None:
+            num_bits = max(64, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        if num_hashes is None:
+            num_hashes = max(1, round(num_bits / max(capacity, 1) * math.log(2)))
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.bits = bits if bits is not None else bytearray((num_bits + 7) // 8)
+        self.count = count
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        m = self.num_bits
+        return [(h1 + i * h2) % m for i in range(self.num_hashes)]
+
+    def add(self, key: str) -> bool:
+        """
+        Set the bits for a key. Returns True if any bit was newly set.
+
+        `count` is left to the owner, which knows how many keys are really distinct.
+        """
+        bits = self.bits
+        new = False
+        for pos in self._positions(key):
+            byte, mask = pos >> 3, 1 << (pos & 7)
+            if not bits[byte] & mask:
+                bits[byte] |= mask
+                new = True
+        return new
+
+    def __contains__(self, key: str) -> bool:
+        # Inlined version of _positions() that stops at the first unset bit,
+        # since almost every lookup for a fresh lead is a miss
+        digest = int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest(), "little")
+        h1, h2 = digest & 0xFFFFFFFFFFFFFFFF, (digest >> 64) | 1
+        bits, m = self.bits, self.num_bits
+        for i in range(self.num_hashes):
+            pos = (h1 + i * h2) % m
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+    def capacity_for(self, error_rate: float = DEFAULT_ERROR_RATE) -> int:
+        """Number of keys this filter holds before exceeding error_rate."""
+        return int(-self.num_bits * (math.log(2) ** 2) / math.log(error_rate))
+
+    def save(self, path: str):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(BLOOM_HEADER.pack(BLOOM_MAGIC, self.num_bits, self.num_hashes, self.count))
+            f.write(self.bits)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path, "rb") as f:
+            magic, num_bits, num_hashes, count = BLOOM_HEADER.unpack(f.read(BLOOM_HEADER.size))
+            if magic != BLOOM_MAGIC:
+                raise ValueError(f"Not a suppression Bloom filter: {path}")
+            bits = bytearray(f.read())
+        if len(bits) != (num_bits + 7) // 8:
+            raise ValueError(f"Truncated Bloom filter: {path}")
+        return cls(num_bits=num_bits, num_hashes=num_hashes, bits=bits, count=count)
+
+
+class SuppressionStore:
+    """
+    Bloom filter in front of an exact SQLite set of suppressed emails and domains.
+
+    Keys are stored as "email:<address>" and "domain:<host>" so both kinds share
+    one filter and one table.
+    """
+
+    def __init__(self, directory: str = SUPPRESSION_DIR, capacity: int = DEFAULT_CAPACITY,
+                 error_rate: float = DEFAULT_ERROR_RATE):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.error_rate = error_rate
+        self.bloom_path = os.path.join(directory, "bloom.bin")
+        self.db_path = os.path.join(directory, "suppression.db")
+        self._lock = threading.Lock()
+        self._dirty = False
+
+        self.db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS suppressed ("
+            " key TEXT PRIMARY KEY,"
+            " source TEXT,"
+            " added_at REAL"
+            ") WITHOUT ROWID"
+        )
+        self.db.commit()
+
+        total = self._row_count()
+        self.bloom = None
+        if os.path.exists(self.bloom_path):
+            try:
+                self.bloom = BloomFilter.load(self.bloom_path)
+            except (OSError, ValueError, struct.error) as e:
+                print(f"Suppression Bloom filter unreadable ({e}), rebuilding...", file=sys.stderr)
+        # The SQLite table is the source of truth; rebuild if the filter is missing or stale
+        if self.bloom is None or self.bloom.count != total:
+            self.rebuild(max(capacity, total * 2))
+
+    def _row_count(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM suppressed").fetchone()[0]
+
+    def rebuild(self, capacity: int = None):
+        """Rebuild the Bloom filter from the SQLite table (used on first run and when it fills up)."""
+        capacity = capacity or max(DEFAULT_CAPACITY, self._row_count() * 2)
+        bloom = BloomFilter(capacity=capacity, error_rate=self.error_rate)
+        for (key,) in self.db.execute("SELECT key FROM suppressed"):
+            bloom.add(key)
+            bloom.count += 1
+        self.bloom = bloom
+        self.bloom.save(self.bloom_path)
+        self._dirty = False
+
+    def _contains_key(self, key: str) -> bool:
+        if key not in self.bloom:
+            return False
+        row = self.db.execute("SELECT 1 FROM suppressed WHERE key = ?", (key,)).fetchone()
+        return row is not None
+
+    def contains_email(self, email) -> bool:
+        email = normalize_email(email)
+        return bool(email) and self._contains_key("email:" + email)
+
+    def contains_domain(self, domain) -> bool:
+        domain = normalize_domain(domain)
+        return bool(domain) and self._contains_key("domain:" + domain)
+
+    def is_suppressed(self, email=None, domain=None) -> bool:
+        """True if the email address or the company domain has been suppressed."""
+        return self.contains_email(email) or self.contains_domain(domain)
+
+    def _add_keys(self, keys, source: str) -> int:
+        keys = [k for k in keys if k]
+        if not keys:
+            return 0
+        now = time.time()
+        with self._lock:
+            before = self.db.total_changes
+            self.db.executemany(
+                "INSERT OR IGNORE INTO suppressed (key, source, added_at) VALUES (?, ?, ?)",
+                ((k, source, now) for k in keys)
+            )
+            self.db.commit()
+            added = self.db.total_changes - before
+            for k in keys:
+                self.bloom.add(k)
+            self.bloom.count += added
+            self._dirty = True
+            if self.bloom.count > self.bloom.capacity_for(self.error_rate):
+                self.rebuild(self.bloom.count * 2)
+        return added
+
+    def add_emails(self, emails, source: str = "manual") -> int:
+        """Suppress email addresses. Returns the number that were new."""
+        return self._add_keys(("email:" + e for e in map(normalize_email, emails) if e), source)
+
+    def add_domains(self, domains, source: str = "manual") -> int:
+        """Suppress whole company domains (shared hosts are skipped). Returns the number that were new."""
+        return self._add_keys(("domain:" + d for d in map(normalize_domain, domains) if d), source)
+
+    def add_records(self, records, source: str, include_domains: bool = False) -> int:
+        """
+        Suppress the emails (and optionally domains) found in lead records.
+
+        Understands the column names used by the scrapers and Instantly exports
+        (email, emails, owner_email, company_domain, website, ...).
+        """
+        emails, domains = [], []
+        for record in records:
+            for col in EMAIL_COLUMNS:
+                value = record.get(col)
+                if value:
+                    # "emails" can be a comma-separated list
+                    emails.extend(str(value).replace(";", ",").split(","))
+            if include_domains:
+                # First column naming a company's own domain (a Facebook-page website doesn't)
+                for col in DOMAIN_COLUMNS:
+                    domain = normalize_domain(record.get(col))
+                    if domain:
+                        domains.append(domain)
+                        break
+        added = self.add_emails(emails, source)
+        if domains:
+            added += self.add_domains(domains, source)
+        return added
+
+    def filter_records(self, records, email_key: str = "email", domain_key: str = None):
+        """Split records into (kept, suppressed) lists."""
+        kept, suppressed = [], []
+        for record in records:
+            email = record.get(email_key) if email_key else None
+            domain = record.get(domain_key) if domain_key else None
+            (suppressed if self.is_suppressed(email, domain) else kept).append(record)
+        return kept, suppressed
+
+    def save(self):
+        """Persist the Bloom filter. The SQLite set is committed on every add."""
+        with self._lock:
+            if self._dirty:
+                self.bloom.save(self.bloom_path)
+                self._dirty = False
+
+    def close(self):
+        self.save()
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def stats(self) -> dict:
+        rows = dict(self.db.execute(
+            "SELECT substr(key, 1, instr(key, ':') - 1) AS kind, COUNT(*) FROM suppressed GROUP BY kind"
+        ).fetchall())
+        return {
+            "emails": rows.get("email", 0),
+            "domains": rows.get("domain", 0),
+            "bloom_bits": self.bloom.num_bits,
+            "bloom_hashes": self.bloom.num_hashes,
+            "bloom_capacity": self.bloom.capacity_for(self.error_rate),
+            "path": self.directory,
+        }
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_store() -> SuppressionStore:
+    """Process-wide store shared by enrichment and upload scripts."""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = SuppressionStore()
+        return _default_store
+
+
+def read_records(path: str) -> list:
+    """Load records from a CSV export or a JSON list of lead dicts."""
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            return list(csv.DictReader(f))
+    with open(path, "r") as f:
+        data = json.load(f)
+    return data if isinstance(data, list) else data.get("items", data.get("data", []))
+
+
+def fetch_instantly_leads(campaign_id: str = None, page_size: int = 100):
+    """Yield every lead in the Instantly workspace (or one campaign) via the v2 list endpoint."""
+    import requests
+
+    api_key = os.getenv("INSTANTLY_API_KEY")
+    if not api_key:
+        raise ValueError("INSTANTLY_API_KEY not configured in .env")
+
+    url = f"{INSTANTLY_API_BASE}/leads/list"
+    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+    body = {"limit": page_size}
+    if campaign_id:
+        body["campaign"] = campaign_id
+
+    while True:
+        response = requests.post(url, headers=headers, json=body, timeout=60)
+        if response.status_code == 429:
+            time.sleep(10)
+            continue
+        response.raise_for_status()
+        data = response.json()
+        items = data.get("items", [])
+        yield from items
+        cursor = data.get("next_starting_after")
+        if not items or not cursor:
+            break
+        body["starting_after"] = cursor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the local contact suppression store")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_import = sub.add_parser("import", help="Import contacts from a CSV export or leads JSON")
+    p_import.add_argument("--csv", help="CSV file (e.g. Instantly campaign export)")
+    p_import.add_argument("--json", help="JSON list of lead records (e.g. a past upload)")
+    p_import.add_argument("--kind", choices=["email", "domain", "both"], default="both",
+                          help="What to suppress from each record (default: both, so enrichment skips the domains)")
+
+    p_sync = sub.add_parser("sync-instantly", help="Pull every lead already in Instantly")
+    p_sync.add_argument("--campaign_id", help="Only sync one campaign")
+    p_sync.add_argument("--emails_only", action="store_true", help="Don't suppress each lead's domain")
+    p_sync.add_argument("--with_domains", action="store_true", help=argparse.SUPPRESS)  # Now the default
+
+    p_check = sub.add_parser("check", help="Check emails or domains against the store")
+    p_check.add_argument("values", nargs="+")
+
+    sub.add_parser("stats", help="Show store size")
+    sub.add_parser("rebuild", help="Rebuild the Bloom filter from the exact set")
+
+    args = parser.parse_args()
+
+    with SuppressionStore() as store:
+        if args.command == "import":
+            path = args.csv or args.json
+            if not path:
+                parser.error("import needs --csv or --json")
+            records = read_records(path)
+            source = os.path.basename(path)
+            if args.kind == "domain":
+                added = store.add_domains(
+                    (next((r[c] for c in DOMAIN_COLUMNS if r.get(c)), "") for r in records), source
+                )
+            else:
+                added = store.add_records(records, source, include_domains=args.kind == "both")
+            print(f"Imported {len(records)} records from {path} ({added} new keys)")
+
+        elif args.command == "sync-instantly":
+            source = f"instantly:{args.campaign_id or 'workspace'}"
+            batch, seen, added = [], 0, 0
+            for lead in fetch_instantly_leads(args.campaign_id):
+                batch.append(lead)
+                if len(batch) >= 1000:
+                    added += store.add_records(batch, source, include_domains=not args.emails_only)
+                    seen += len(batch)
+                    batch = []
+            added += store.add_records(batch, source, include_domains=not args.emails_only)
+            seen += len(batch)
+            print(f"Synced {seen} Instantly leads ({added} new keys)")
+
+        elif args.command == "check":
+            for value in args.values:
+                hit = store.contains_email(value) if "@" in value else store.contains_domain(value)
+                print(f"{value}: {'SUPPRESSED' if hit else 'ok'}")
+
+        elif args.command == "stats":
+            print(json.dumps(store.stats(), indent=2))
+
+        elif args.command == "rebuild":
+            store.rebuild()
+            print(json.dumps(store.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Memoized results for read-only directive tools.
+
+Directive and agent loops call web_fetch, web_search, pagespeed_analyze and
+firecrawl_scrape with the same arguments within a run and again in runs a few
+minutes later, and every call went back to the network. ToolResultCache keeps
+results per (tool, canonical arguments) for a per-tool TTL:
+- arguments are canonicalized (sorted keys, JSON) so {"a": 1, "b": 2} and
+  {"b": 2, "a": 1} share an entry
+- only tools with a TTL are cached; side-effecting tools never are, even if
+  given one
+- error results ({"error": ...}) and exceptions are not cached
+- concurrent identical calls wait for the first one instead of repeating it
+- entries are evicted least-recently-used beyond max_entries
+
+The cache lives in process memory, so warm Modal containers share results
+across requests.
+
+Usage:
+    from tool_cache import get_tool_cache
+    result = get_tool_cache().call("web_fetch", {"url": url}, lambda: web_fetch_impl(url=url))
+
+    python3 execution/tool_cache.py
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict
+
+# Seconds a result stays valid; tools not listed are not cached
+TOOL_CACHE_TTLS = {
+    "web_search": 15 * 60,
+    "web_fetch": 10 * 60,
+    "pagespeed_analyze": 60 * 60,
+    "firecrawl_scrape": 30 * 60,
+    "analyze_social_presence": 60 * 60,
+    "scrape_competitors": 60 * 60,
+}
+
+# Tools with side effects: always executed
+SIDE_EFFECT_TOOLS = {
+    "send_email",
+    "update_sheet",
+    "create_proposal",
+    "instantly_send_reply",
+    "generate_toolkit",
+    "run_script",
+}
+
+MAX_ENTRIES = int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "500"))
+ENABLED = os.getenv("TOOL_CACHE", "1") != "0"
+
+
+def cache_key(tool_name: str, tool_input: dict) -> str:
+    return f"{tool_name}:{json.dumps(tool_input or {}, sort_keys=True, default=str, separators=(',', ':'))}"
+
+
+class ToolResultCache:
+    """In-memory TTL cache of tool results, keyed by tool name and canonical arguments."""
+
+    def __init__(self, ttls: Dict[str, int] = None, max_entries: int = MAX_ENTRIES, enabled: bool = ENABLED):
+        self.ttls = dict(TOOL_CACHE_TTLS if ttls is None else ttls)
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, result)
+        self._inflight: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "bypassed": 0, "coalesced": 0}
+
+    def ttl(self, tool_name: str) -> int:
+        if not self.enabled or tool_name in SIDE_EFFECT_TOOLS:
+            return 0
+        return self.ttls.get(tool_name, 0)
+
+    def get(self, key: str):
+        """Cached result for `key`, or None if missing or expired. Call with self._lock held."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def call(self, tool_name: str, tool_input: dict, run: Callable[[], dict]) -> dict:
+        """Return the cached result of this call, or run it (and cache a successful result)."""
+        ttl = self.ttl(tool_name)
+        if ttl <= 0:
+            with self._lock:
+                self.stats["bypassed"] += 1
+            return run()
+
+        key = cache_key(tool_name, tool_input)
+        while True:
+            with self._lock:
+                result = self.get(key)
+                if result is not None:
+                    self.stats["hits"] += 1
+                    return result
+                waiting = self._inflight.get(key)
+                if waiting is None:
+                    self._inflight[key] = threading.Event()
+                    self.stats["misses"] += 1
+                    break
+                self.stats["coalesced"] += 1
+            # Same call already running elsewhere: wait for it, then re-check the cache
+            # (if it failed, the next loop runs it here)
+            waiting.wait()
+
+        try:
+            result = run()
+            if not (isinstance(result, dict) and "error" in result):
+                with self._lock:
+                    self._entries[key] = (time.time() + ttl, result)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key).set()
+
+    def invalidate(self, tool_name: str = None):
+        """Drop cached results for one tool (or all)."""
+        with self._lock:
+            if tool_name is None:
+                self._entries.clear()
+            else:
+                for key in [k for k in self._entries if k.startswith(f"{tool_name}:")]:
+                    del self._entries[key]
+
+    def info(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), **self.stats}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_tool_cache() -> ToolResultCache:
+    """Process-wide tool result cache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ToolResultCache()
+        return _cache
+
+
+def main():
+    cache = ToolResultCache()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"status": 200, "content": "..."}
+
+    start = time.time()
+    cache.call("web_fetch", {"url": "https://example.com", "max_length": 5000}, fetch)
+    cold = time.time() - start
+    start = time.time()
+    cache.call("web_fetch", {"max_length": 5000, "url": "https://example.com"}, fetch)
+    warm = time.time() - start
+    cache.call("send_email", {"to": "a@example.com"}, lambda: {"sent": True})
+    print(json.dumps({"cold_seconds": round(cold, 4), "cached_seconds": round(warm, 6),
+                      "executions": len(calls), "stats": cache.info(),
+                      "ttls": {name: cache.ttl(name) for name in sorted(set(TOOL_CACHE_TTLS) | SIDE_EFFECT_TOOLS)}},
+                     indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -11,35 +11,21 @@ import os
 import json
 import logging
 import time
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from google.auth.transport.requests import Request
 from email.mime.text import MIMEText
 import base64
 
+try:
+    from execution.google_clients import get_service
+except ImportError:
+    from google_clients import get_service
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("welcome-client")
 
 
-def get_google_creds(token_data: dict) -> Credentials:
-    """Get Google credentials from token data."""
-    creds = Credentials(
-        token=token_data["token"],
-        refresh_token=token_data["refresh_token"],
-        token_uri=token_data["token_uri"],
-        client_id=token_data["client_id"],
-        client_secret=token_data["client_secret"],
-        scopes=token_data["scopes"]
-    )
-    if creds.expired:
-        creds.refresh(Request())
-    return creds
-
-
 def send_email(from_name: str, to: str, subject: str, body: str, token_data: dict) -> dict:
     """Send email via Gmail API as HTML."""
-    creds = get_google_creds(token_data)
-    service = build("gmail", "v1", credentials=creds)
+    service = get_service("gmail", "v1", token_data=token_data)
 
     # Convert plain text to HTML with proper line breaks
     html_body = body.replace('\n', '<br>')
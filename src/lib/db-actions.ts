@@ -15,7 +15,7 @@ export async function getRecentAnalysis(domain: string) {
     const { data, error } = await supabase
         .from('analyses')
         .select('*')
-        .ilike('domain', `%${normalizedDomain}%`)
+        .eq('domain', normalizedDomain)
         .gt('created_at', new Date(Date.now() - 10 * 24 * 60 * 60 * 1000).toISOString())
         .order('created_at', { ascending: false })
         .limit(1)
@@ -0,0 +1,11 @@
+-- Exact-domain analysis cache lookups
+-- getRecentAnalysis (src/lib/db-actions.ts) and check_recent_analysis (execution/modal_webhook.py)
+-- match the normalized domain with equality and take the newest row inside the freshness window.
+
+-- Normalize domains saved before both writers stripped scheme, www and trailing slash
+UPDATE analyses
+SET domain = regexp_replace(regexp_replace(lower(domain), '^(https?://)?(www\.)?', ''), '/$', '')
+WHERE domain <> regexp_replace(regexp_replace(lower(domain), '^(https?://)?(www\.)?', ''), '/$', '');
+
+-- One index serves "where domain = ? and created_at > ? order by created_at desc limit 1"
+CREATE INDEX IF NOT EXISTS analyses_domain_created_at_idx ON analyses (domain, created_at DESC);